@@ -0,0 +1,257 @@
+"""
+Streaming file writers for the data generators' offline mode.
+
+Rows are written as they are generated, so memory stays constant however
+many are written. One file per table (and per shard), in one of:
+
+* ``csv``: gzip-compressed CSV with a header row, in the dialect of
+  ``SELECT ... INTO OUTFILE`` with ``FIELDS TERMINATED BY ',' ENCLOSED BY '"'``
+  (strings quoted, backslash escapes, ``\\N`` for NULL, one line per row),
+  so ``LOAD_DATA_CSV`` loads it unchanged
+* ``sql``: gzip-compressed mysqldump-style data dump (extended INSERTs under
+  LOCK TABLES, keys disabled), for ``zcat file | mysql glpi``
+* ``parquet``: one row group per batch; needs pyarrow
+
+Output is byte-for-byte reproducible: gzip headers carry no timestamp or
+file name and the SQL dump has no dump date.
+"""
+
+import io
+import os
+import abc
+import re
+import gzip
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ('csv', 'sql', 'parquet')
+
+# Loads a CSVWriter file (after gunzip); format with path, table and column list
+LOAD_DATA_CSV = (
+    "LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+    "FIELDS TERMINATED BY ',' ENCLOSED BY '\"' ESCAPED BY '\\\\' "
+    "LINES TERMINATED BY '\\n' IGNORE 1 LINES ({columns})"
+)
+EXTENSIONS = {'csv': '.csv.gz', 'sql': '.sql.gz', 'parquet': '.parquet'}
+
+# Extended INSERT statements are cut at about this size, like mysqldump's net_buffer_length
+SQL_STATEMENT_BYTES = 1024 * 1024
+
+SQL_HEADER = """-- GLPI synthetic data dump
+--
+-- Table: {table}
+-- ------------------------------------------------------
+
+/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;
+/*!40101 SET @OLD_CHARACTER_SET_RESULTS=@@CHARACTER_SET_RESULTS */;
+/*!40101 SET @OLD_COLLATION_CONNECTION=@@COLLATION_CONNECTION */;
+/*!40101 SET NAMES utf8mb4 */;
+/*!40103 SET @OLD_TIME_ZONE=@@TIME_ZONE */;
+/*!40103 SET TIME_ZONE='+00:00' */;
+/*!40014 SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0 */;
+/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
+/*!40101 SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='NO_AUTO_VALUE_ON_ZERO' */;
+/*!40111 SET @OLD_SQL_NOTES=@@SQL_NOTES, SQL_NOTES=0 */;
+
+--
+-- Dumping data for table `{table}`
+--
+
+LOCK TABLES `{table}` WRITE;
+/*!40000 ALTER TABLE `{table}` DISABLE KEYS */;
+"""
+
+SQL_FOOTER = """/*!40000 ALTER TABLE `{table}` ENABLE KEYS */;
+UNLOCK TABLES;
+/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
+
+/*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
+/*!40014 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS */;
+/*!40014 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS */;
+/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
+/*!40101 SET CHARACTER_SET_RESULTS=@OLD_CHARACTER_SET_RESULTS */;
+/*!40101 SET COLLATION_CONNECTION=@OLD_COLLATION_CONNECTION */;
+/*!40111 SET SQL_NOTES=@OLD_SQL_NOTES */;
+
+-- Dump completed
+"""
+
+# mysqldump's string escapes, which LOAD DATA also understands
+_ESCAPES = {
+    '\\': '\\\\', "'": "\\'", '"': '\\"', '\0': '\\0',
+    '\n': '\\n', '\r': '\\r', '\x1a': '\\Z',
+}
+_SPECIAL = re.compile('[\\\\\'"\0\n\r\x1a]')
+_UNESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+_CSV_FIELD = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,]*)')
+
+def escape(text: str) -> str:
+    # str.translate with a dict is several times slower than this on generated text
+    if _SPECIAL.search(text) is None:
+        return text
+    return _SPECIAL.sub(lambda match: _ESCAPES[match.group()], text)
+
+def sql_literal(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + escape(str(value)) + "'"
+
+def csv_field(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + escape(str(value)) + '"'
+
+def _unescape(text: str) -> str:
+    return re.sub(r'\\(.)', lambda m: _UNESCAPES.get(m.group(1), m.group(1)), text)
+
+def parse_csv_line(line: str) -> list:
+    """Inverse of the CSVWriter encoding for one line (without the newline)"""
+    values = []
+    position = 0
+    while True:
+        match = _CSV_FIELD.match(line, position)
+        quoted, bare = match.groups()
+        values.append(_unescape(quoted) if quoted is not None else None if bare == '\\N' else bare)
+        position = match.end() + 1
+        if position > len(line):
+            return values
+
+class _GzipText:
+    """Text stream into a gzip file whose header has no file name or mtime, so equal rows give equal bytes"""
+
+    def __init__(self, path: str):
+        self._raw = open(path, 'wb')
+        compressed = gzip.GzipFile(filename='', mode='wb', fileobj=self._raw, mtime=0, compresslevel=6)
+        self._text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        self.write = self._text.write
+
+    def close(self):
+        self._text.close()
+        self._raw.close()
+
+class DatasetWriter(abc.ABC):
+    """Base class: ``write`` batches of row tuples in ``columns`` order, then ``close``"""
+
+    def __init__(self, path: str, table: str, columns: Sequence[str]):
+        self.path = path
+        self.table = table
+        self.columns = tuple(columns)
+        self.rows = 0
+
+    @abc.abstractmethod
+    def write(self, rows: Iterable[Sequence]):
+        """Append a batch of rows and count them in ``rows``"""
+
+    @abc.abstractmethod
+    def close(self):
+        """Finish the file"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CSVWriter(DatasetWriter):
+    def __init__(self, path: str, table: str, columns: Sequence[str]):
+        super().__init__(path, table, columns)
+        self._file = _GzipText(path)
+        self._file.write(",".join(csv_field(column) for column in self.columns) + "\n")
+
+    def write(self, rows: Iterable[Sequence]):
+        for row in rows:
+            self._file.write(",".join(csv_field(value) for value in row) + "\n")
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
+
+class SQLDumpWriter(DatasetWriter):
+    def __init__(self, path: str, table: str, columns: Sequence[str]):
+        super().__init__(path, table, columns)
+        self._file = _GzipText(path)
+        self._file.write(SQL_HEADER.format(table=table))
+        self._prefix = "INSERT INTO `{0}` ({1}) VALUES ".format(
+            table, ", ".join("`{0}`".format(column) for column in self.columns))
+        self._size = 0
+
+    def write(self, rows: Iterable[Sequence]):
+        for row in rows:
+            values = "(" + ",".join(sql_literal(value) for value in row) + ")"
+            if self._size and self._size + 1 + len(values) > SQL_STATEMENT_BYTES:
+                self._file.write(";\n")
+                self._size = 0
+            if self._size:
+                self._file.write("," + values)
+                self._size += 1 + len(values)
+            else:
+                self._file.write(self._prefix + values)
+                self._size = len(self._prefix) + len(values)
+            self.rows += 1
+
+    def close(self):
+        if self._size:
+            self._file.write(";\n")
+        self._file.write(SQL_FOOTER.format(table=self.table))
+        self._file.close()
+
+class ParquetWriter(DatasetWriter):
+    def __init__(self, path: str, table: str, columns: Sequence[str]):
+        if pa is None:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        super().__init__(path, table, columns)
+        self._writer = None
+        self._schema = None
+
+    def write(self, rows: Iterable[Sequence]):
+        rows = list(rows)
+        if not rows:
+            return
+        data = {column: [row[i] for row in rows] for i, column in enumerate(self.columns)}
+        if self._writer is None:
+            # The first batch fixes the column types for the whole file
+            batch = pa.Table.from_pydict(data)
+            self._schema = batch.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression='zstd')
+        else:
+            batch = pa.Table.from_pydict(data, schema=self._schema)
+        self._writer.write_table(batch)
+        self.rows += len(rows)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+WRITERS = {'csv': CSVWriter, 'sql': SQLDumpWriter, 'parquet': ParquetWriter}
+
+def dataset_path(directory: str, table: str, fmt: str, part: Optional[int] = None) -> str:
+    """``<directory>/<table>[.part-NNNNN]<ext>``"""
+    name = table if part is None else "{0}.part-{1:05d}".format(table, part)
+    return os.path.join(directory, name + EXTENSIONS[fmt])
+
+def open_dataset(fmt: str, directory: str, table: str, columns: Sequence[str],
+                 part: Optional[int] = None) -> DatasetWriter:
+    os.makedirs(directory, exist_ok=True)
+    return WRITERS[fmt](dataset_path(directory, table, fmt, part), table, columns)
+
+def read_csv_rows(path: str) -> Iterator[Dict[str, Optional[str]]]:
+    """Stream the rows of a CSV file written by CSVWriter (gzip or plain) as dicts of strings"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        columns = parse_csv_line(f.readline().rstrip('\n'))
+        for line in f:
+            yield dict(zip(columns, parse_csv_line(line.rstrip('\n'))))
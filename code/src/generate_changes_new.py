@@ -6,12 +6,16 @@ existing infrastructure like Azure VM, AKS, Azure SQL, GCP, GKE, etc.
 """
 
 import MySQLdb
+import MySQLdb.cursors
 import random
 import logging
+import argparse
 import datetime
-import gc
 import os
+import sys
 from datetime import timedelta
+from sharding import parse_base_date, plan_shards, report_progress, run_shards, written_id_ranges
+from dataset_writers import FORMATS, open_dataset, read_csv_rows
 
 # Configure logging - minimal output
 logging.basicConfig(
@@ -35,6 +39,13 @@ db_config = {
 TOTAL_CHANGES = 6000
 BATCH_SIZE = 100
 
+# Columns of each sampled incident: all that generate_change_data uses
+INCIDENT_SAMPLE_COLUMNS = ('id', 'name', 'entities_id', 'priority')
+SAMPLE_METHODS = ('range', 'reservoir')
+# Candidate ids per IN (...) probe when sampling by id range
+SAMPLE_PROBE_BATCH = 1000
+SAMPLE_MAX_ROUNDS = 8
+
 # GLPI status mappings
 STATUS_MAPPING = {
     'new': 1,
@@ -163,27 +174,99 @@ def get_db_connection():
         logger.error("Error connecting to database: %s", e)
         raise
 
-def get_random_date(days_back=365):
-    """Generate a random date within the specified days back from today"""
-    today = datetime.datetime.now()
-    random_days = random.randint(1, days_back)
+def get_random_date(days_back=365, rng=random, base_date=None):
+    """Generate a random date within the specified days back from ``base_date`` (default: today)"""
+    today = base_date or datetime.datetime.now()
+    random_days = rng.randint(1, days_back)
     random_date = today - datetime.timedelta(days=random_days)
     return random_date.strftime('%Y-%m-%d %H:%M:%S')
 
-def fetch_incidents(connection, limit=1000):
-    """Fetch existing incidents from the database to correlate with changes"""
+def _sample_by_id_range(cursor, rng, limit, low, high):
+    """Probe random primary keys in ``[low, high]`` until ``limit`` incidents are found.
+
+    Every candidate id is drawn at most once and kept if it is an incident,
+    so each incident is equally likely to be picked. Each round draws enough
+    new candidates for the hit rate seen so far. Returns None when the ids
+    are too sparse (or too few) for that to pay off.
+    """
+    span = high - low + 1
+    query = "SELECT {0} FROM glpi_tickets WHERE type = 1 AND id IN ({{0}})".format(
+        ", ".join(INCIDENT_SAMPLE_COLUMNS))
+    tried = set()
+    sample = []
+    for _ in range(SAMPLE_MAX_ROUNDS):
+        needed = limit - len(sample)
+        if needed <= 0:
+            break
+        hit_rate = max(len(sample) / len(tried), 0.01) if tried else 1.0
+        draw = int(needed / hit_rate * 1.2) + 16
+        if len(tried) + draw > span // 2:
+            # Rejection-drawing slows down past half the id space; a scan is as cheap by then
+            return None
+        candidates = []
+        while len(candidates) < draw:
+            candidate = rng.randint(low, high)
+            if candidate not in tried:
+                tried.add(candidate)
+                candidates.append(candidate)
+        found = {}
+        for start in range(0, len(candidates), SAMPLE_PROBE_BATCH):
+            chunk = candidates[start:start + SAMPLE_PROBE_BATCH]
+            cursor.execute(query.format(", ".join(["%s"] * len(chunk))), chunk)
+            found.update((row[0], tuple(row)) for row in cursor.fetchall())
+        # Keep draw order so a seed gives the same incidents in the same order
+        sample.extend(found[candidate] for candidate in candidates if candidate in found)
+    if len(sample) < limit:
+        return None
+    return sample[:limit]
+
+def _reservoir_sample(connection, rng, limit):
+    """Sample ``limit`` incidents in one streaming pass over the ticket table (algorithm R)"""
+    cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+    try:
+        # InnoDB returns primary key order without sorting; it keeps seeded runs repeatable
+        cursor.execute("SELECT {0} FROM glpi_tickets WHERE type = 1 ORDER BY id".format(
+            ", ".join(INCIDENT_SAMPLE_COLUMNS)))
+        sample = []
+        seen = 0
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for row in rows:
+                seen += 1
+                if len(sample) < limit:
+                    sample.append(tuple(row))
+                else:
+                    slot = rng.randrange(seen)
+                    if slot < limit:
+                        sample[slot] = tuple(row)
+        return sample
+    finally:
+        cursor.close()
+
+def fetch_incidents(connection, limit=1000, seed=None, method='range'):
+    """Sample incidents from the database to correlate with changes.
+
+    ``range`` probes random primary keys, so its cost follows ``limit``
+    rather than the size of glpi_tickets. It falls back to ``reservoir``,
+    one pass over the table on a server-side cursor, when the table holds
+    too few incidents or its ids are too sparse. Rows are
+    ``INCIDENT_SAMPLE_COLUMNS`` tuples. With a ``seed`` the same incidents
+    come back in the same order as long as the ticket table is unchanged.
+    """
+    rng = random.Random(seed)
     cursor = connection.cursor()
     
     try:
-        query = """
-        SELECT id, name, content, date, entities_id, priority 
-        FROM glpi_tickets 
-        WHERE type = 1 
-        ORDER BY RAND() 
-        LIMIT %s
-        """
-        cursor.execute(query, (limit,))
-        incidents = cursor.fetchall()
+        incidents = None
+        if method == 'range':
+            # Two subqueries: each is one primary key lookup on any engine
+            cursor.execute("SELECT (SELECT MIN(id) FROM glpi_tickets), (SELECT MAX(id) FROM glpi_tickets)")
+            low, high = cursor.fetchone()
+            incidents = [] if low is None else _sample_by_id_range(cursor, rng, limit, low, high)
+        if incidents is None:
+            incidents = _reservoir_sample(connection, rng, limit)
         logger.info("Fetched %d incidents for correlation", len(incidents))
         return incidents
     except MySQLdb.Error as e:
@@ -192,7 +275,7 @@ def fetch_incidents(connection, limit=1000):
     finally:
         cursor.close()
 
-def generate_change_content(change_type, activity, related_incidents):
+def generate_change_content(change_type, activity, related_incidents, rng=random):
     """Generate detailed content for the change."""
     incident_references = []
     for inc in related_incidents:
@@ -241,40 +324,40 @@ Implement {0} - {1}
         change_type, 
         activity, 
         incident_text, 
-        random.choice(objectives),
-        random.choice(implementation_plan),
-        random.choice(impact_assessment)
+        rng.choice(objectives),
+        rng.choice(implementation_plan),
+        rng.choice(impact_assessment)
     )
     
     return content
 
-def generate_change_data(incidents, index):
+def generate_change_data(incidents, index, rng=random, base_date=None):
     """Generate a single change record with correlation to incidents"""
     if not incidents:
         logger.warning("No incidents available for correlation")
         return None
     
     # Get random incident to correlate with
-    num_related_incidents = random.randint(1, min(3, len(incidents)))
-    related_incidents = random.sample(incidents, num_related_incidents)
+    num_related_incidents = rng.randint(1, min(3, len(incidents)))
+    related_incidents = rng.sample(incidents, num_related_incidents)
     primary_incident = related_incidents[0]
-    incident_id, incident_name, incident_content, incident_date, entities_id, incident_priority = primary_incident
+    incident_id, incident_name, entities_id, incident_priority = primary_incident
     
     # Select random change type and scenario
-    change_type_data = random.choice(CHANGE_TYPES)
+    change_type_data = rng.choice(CHANGE_TYPES)
     change_type = change_type_data["type"]
-    scenario = random.choice(change_type_data["scenarios"])
+    scenario = rng.choice(change_type_data["scenarios"])
     
     # Generate dates
-    creation_date = get_random_date()
+    creation_date = get_random_date(rng=rng, base_date=base_date)
     
     # Create change name and content
     name = "{0} - {1}".format(change_type, scenario)
-    content = generate_change_content(change_type, scenario, related_incidents)
+    content = generate_change_content(change_type, scenario, related_incidents, rng)
     
     # Select random status
     status_options = list(STATUS_MAPPING.keys())
-    status_text = random.choice(status_options)
+    status_text = rng.choice(status_options)
     status = STATUS_MAPPING.get(status_text, 1)  # Default to 'new' if not found
     
     # Select random priority, impact, urgency based on related incident
@@ -284,13 +367,13 @@ def generate_change_data(incidents, index):
     adjusted_priority_index = min(max(0, incident_priority - 1), len(priority_options) - 1)
     priority_range_start = max(0, adjusted_priority_index - 1)
     priority_range_end = min(len(priority_options), adjusted_priority_index + 2)
-    priority_text = random.choice(priority_options[priority_range_start:priority_range_end])
+    priority_text = rng.choice(priority_options[priority_range_start:priority_range_end])
     priority = PRIORITY_MAPPING.get(priority_text, 3)  # Default to medium
     
-    impact_text = random.choice(priority_options)
+    impact_text = rng.choice(priority_options)
     impact = PRIORITY_MAPPING.get(impact_text, 3)
     
-    urgency_text = random.choice(priority_options)
+    urgency_text = rng.choice(priority_options)
     urgency = PRIORITY_MAPPING.get(urgency_text, 3)
     
     # Global validation based on status
@@ -322,128 +405,321 @@ def generate_change_data(incidents, index):
     
     return change
 
-def insert_batch(connection, changes):
-    """Insert a batch of changes into the database"""
+# Columns of glpi_changes set by insert_batch, in statement order
+CHANGE_COLUMNS = (
+    'name', 'content', 'entities_id', 'date', 'date_mod', 'status',
+    'priority', 'urgency', 'impact', 'global_validation',
+    'users_id_recipient', 'users_id_lastupdater'
+)
+
+def get_auto_increment_step(connection):
+    """Distance between consecutive auto-increment ids (``auto_increment_increment``)"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT @@session.auto_increment_increment")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def insert_batch(connection, changes, id_step=1, first_id=None):
+    """Insert a batch of changes and their incident links in one transaction.
+
+    The changes go in as one multi-row INSERT. MySQL hands a single-statement
+    multi-row insert a contiguous block of auto-increment ids, ``id_step``
+    apart, and ``lastrowid`` is the first of them. The change ids are derived
+    from it, and every glpi_changes_tickets row is sent in one
+    ``executemany``. With ``first_id`` the changes get the explicit ids
+    ``first_id``, ``first_id + 1``, ... instead. On error the whole batch is
+    rolled back and 0 is returned.
+    """
     if not changes:
         return 0
     
     cursor = connection.cursor()
-    successful_inserts = 0
     
     try:
-        for change in changes:
-            # Insert the change record
-            insert_query = """
-            INSERT INTO glpi_changes 
-            (name, content, entities_id, date, date_mod, status, 
-            priority, urgency, impact, global_validation, 
-            users_id_recipient, users_id_lastupdater) 
-            VALUES 
-            (%(name)s, %(content)s, %(entities_id)s, %(date)s, %(date_mod)s, 
-            %(status)s, %(priority)s, %(urgency)s, %(impact)s, %(global_validation)s, 
-            %(users_id_recipient)s, %(users_id_lastupdater)s)
-            """
-            
-            cursor.execute(insert_query, {
-                'name': change['name'],
-                'content': change['content'],
-                'entities_id': change['entities_id'],
-                'date': change['date'],
-                'date_mod': change['date_mod'],
-                'status': change['status'],
-                'priority': change['priority'],
-                'urgency': change['urgency'],
-                'impact': change['impact'],
-                'global_validation': change['global_validation'],
-                'users_id_recipient': change['users_id_recipient'],
-                'users_id_lastupdater': change['users_id_lastupdater']
-            })
-            
-            change_id = cursor.lastrowid
-            
-            # Create relationship to incidents
-            for incident_id in change['related_incident_ids']:
-                relation_query = """
-                INSERT INTO glpi_changes_tickets 
-                (changes_id, tickets_id) 
-                VALUES (%s, %s)
-                """
-                cursor.execute(relation_query, (change_id, incident_id))
-            
-            successful_inserts += 1
+        columns = CHANGE_COLUMNS if first_id is None else ('id',) + CHANGE_COLUMNS
+        placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        insert_query = "INSERT INTO glpi_changes ({0}) VALUES {1}".format(
+            ", ".join(columns), ", ".join([placeholders] * len(changes))
+        )
+        if first_id is None:
+            values = [change[column] for change in changes for column in CHANGE_COLUMNS]
+        else:
+            id_step = 1
+            values = [value for position, change in enumerate(changes)
+                      for value in [first_id + position] + [change[column] for column in CHANGE_COLUMNS]]
+        cursor.execute(insert_query, values)
+        
+        if first_id is None:
+            first_id = cursor.lastrowid
+        relations = [
+            (first_id + position * id_step, incident_id)
+            for position, change in enumerate(changes)
+            for incident_id in change['related_incident_ids']
+        ]
+        cursor.executemany(
+            "INSERT INTO glpi_changes_tickets (changes_id, tickets_id) VALUES (%s, %s)",
+            relations
+        )
         
         connection.commit()
-        return successful_inserts
+        return len(changes)
     except MySQLdb.Error as e:
         connection.rollback()
         logger.error("Error inserting changes: %s", e)
-        return successful_inserts
+        return 0
     finally:
         cursor.close()
 
-def main():
-    """Main function to generate and insert changes"""
-    start_time = datetime.datetime.now()
-    logger.info("Starting change generation process for %d changes", TOTAL_CHANGES)
-    
+def sample_incidents_file(paths, limit=1000, seed=None):
+    """Reservoir-sample ``limit`` incidents from CSV files written by generate_incidents.py --output.
+
+    Streams the files, so memory stays at ``limit`` rows; returns tuples
+    shaped like fetch_incidents rows.
+    """
+    rng = random.Random(seed)
+    sample = []
+    seen = 0
+    for path in paths:
+        for row in read_csv_rows(path):
+            if int(row['type']) != 1:
+                continue
+            incident = (int(row['id']), row['name'], int(row['entities_id']), int(row['priority']))
+            seen += 1
+            if len(sample) < limit:
+                sample.append(incident)
+            else:
+                slot = rng.randrange(seen)
+                if slot < limit:
+                    sample[slot] = incident
+    logger.info("Sampled %d of %d incidents from %d file(s)", len(sample), seen, len(paths))
+    return sample
+
+def get_next_change_id(connection):
+    """First id after the current glpi_changes rows"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM glpi_changes")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def iter_change_batches(shard, incidents, base_date, batch_size):
+    """Generate a shard's changes in batches; yields each batch with the run position of its first change"""
+    rng = shard.rng()
+    for batch_start in range(0, shard.size, batch_size):
+        batch_end = min(batch_start + batch_size, shard.size)
+        yield shard.offset + batch_start, [
+            generate_change_data(incidents, shard.offset + i, rng, base_date)
+            for i in range(batch_start, batch_end)
+        ]
+
+def insert_shard(job):
+    """Generate and insert one shard of changes over its own connection.
+
+    Changes get the explicit ids ``first_id + shard.offset`` onwards, so the
+    shards can run concurrently and still produce the same rows and ids for
+    a given seed. The shard stops at its first failed batch, so the changes
+    it committed are the first ones of its id slice. Returns the changes,
+    incident links and batches inserted.
+    """
+    shard, incidents, first_id, base_date, batch_size = job
+    connection = get_db_connection()
+    inserted = 0
+    links = 0
+    batches = 0
     try:
-        # Connect to the database
+        for position, changes_batch in iter_change_batches(shard, incidents, base_date, batch_size):
+            if not insert_batch(connection, changes_batch, first_id=first_id + position):
+                logger.error("Shard %d stopped at change id %d; %d of its %d changes were inserted",
+                             shard.index, first_id + position, inserted, shard.size)
+                break
+            inserted += len(changes_batch)
+            links += sum(len(change['related_incident_ids']) for change in changes_batch)
+            batches += 1
+            report_progress(len(changes_batch))
+    finally:
+        connection.close()
+    return inserted, links, batches
+
+def run_sharded(args, base_date):
+    """Generate ``args.count`` changes as ``args.shards`` shards on a process pool"""
+    connection = get_db_connection()
+    try:
+        incidents = fetch_incidents(connection, seed=args.seed, method=args.sample_method)
+        first_id = get_next_change_id(connection)
+    finally:
+        connection.close()
+    if not incidents:
+        logger.error("No incidents found to correlate with changes. Exiting.")
+        return 0, 0, 0
+    logger.info("Found %d incidents for correlation; change ids start at %d", len(incidents), first_id)
+
+    shards = plan_shards(args.count, args.shards, args.seed)
+    jobs = [(shard, incidents, first_id, base_date, args.batch_size) for shard in shards]
+    results = run_shards(insert_shard, jobs, args.count, args.processes, label="changes", log=logger.info)
+    ids = ", ".join(f"{low}-{high}" for low, high in
+                    written_id_ranges(first_id, shards, [inserted for inserted, _, _ in results])) or "none"
+    logger.info("Inserted change ids: %s", ids)
+    return tuple(sum(column) for column in zip(*results))
+
+def write_shard(job):
+    """Generate one shard of changes into glpi_changes and glpi_changes_tickets files.
+
+    Ids are ``first_id + shard.offset`` onwards, as in insert_shard, so the
+    files load next to each other without conflicts. Returns the changes,
+    incident links and batches written.
+    """
+    shard, incidents, first_id, base_date, batch_size, directory, fmt, part = job
+    changes_file = open_dataset(fmt, directory, 'glpi_changes', ('id',) + CHANGE_COLUMNS, part)
+    links_file = open_dataset(fmt, directory, 'glpi_changes_tickets', ('changes_id', 'tickets_id'), part)
+    batches = 0
+    with changes_file, links_file:
+        for position, changes_batch in iter_change_batches(shard, incidents, base_date, batch_size):
+            ids = range(first_id + position, first_id + position + len(changes_batch))
+            changes_file.write(
+                (change_id,) + tuple(change[column] for column in CHANGE_COLUMNS)
+                for change_id, change in zip(ids, changes_batch)
+            )
+            links_file.write(
+                (change_id, incident_id)
+                for change_id, change in zip(ids, changes_batch)
+                for incident_id in change['related_incident_ids']
+            )
+            batches += 1
+            report_progress(len(changes_batch))
+    return changes_file.rows, links_file.rows, batches
+
+def run_offline(args, base_date):
+    """Generate changes into files under ``args.output``, one pair of files per shard"""
+    if args.incidents:
+        incidents = sample_incidents_file(args.incidents, seed=args.seed)
+    else:
         connection = get_db_connection()
-        
+        try:
+            incidents = fetch_incidents(connection, seed=args.seed, method=args.sample_method)
+        finally:
+            connection.close()
+    if not incidents:
+        logger.error("No incidents found to correlate with changes. Exiting.")
+        return 0, 0, 0
+
+    shards = plan_shards(args.count, args.shards, args.seed)
+    jobs = [(shard, incidents, args.first_id, base_date, args.batch_size, args.output, args.format,
+             shard.index if len(shards) > 1 else None)
+            for shard in shards]
+    if len(jobs) == 1:
+        return write_shard(jobs[0])
+    results = run_shards(write_shard, jobs, args.count, args.processes, label="changes", log=logger.info)
+    return tuple(sum(column) for column in zip(*results))
+
+def run_single(args, base_date):
+    """Generate and insert changes over one connection; returns the changes, links and batches inserted.
+
+    The rows come from the same generator as shard 0 of ``--shards`` or
+    ``--output``, so a seed gives the same changes on every path. Ids are
+    left to auto-increment, and the run stops at the first failed batch.
+    """
+    total_changes = args.count
+    shard = plan_shards(total_changes, 1, args.seed)[0]
+    total_inserted = 0
+    total_links = 0
+    batches = 0
+    
+    connection = get_db_connection()
+    try:
         # Fetch incidents to correlate with changes
-        incidents = fetch_incidents(connection)
+        incidents = fetch_incidents(connection, seed=args.seed, method=args.sample_method)
         if not incidents:
             logger.error("No incidents found to correlate with changes. Exiting.")
-            return
+            return total_inserted, total_links, batches
         
         logger.info("Found %d incidents for correlation", len(incidents))
+        id_step = get_auto_increment_step(connection)
         
-        # Generate and insert changes in batches
-        total_inserted = 0
-        
-        for batch_start in range(0, TOTAL_CHANGES, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, TOTAL_CHANGES)
-            current_batch_size = batch_end - batch_start
+        for batch_start, changes_batch in iter_change_batches(shard, incidents, base_date, args.batch_size):
+            batch_end = batch_start + len(changes_batch)
             
             # Only log at 10% intervals or first/last batch
-            progress_pct = (batch_start / TOTAL_CHANGES) * 100
-            if progress_pct % 10 == 0 or batch_start == 0 or batch_end == TOTAL_CHANGES:
+            progress_pct = (batch_start / total_changes) * 100
+            if progress_pct % 10 == 0 or batch_start == 0 or batch_end == total_changes:
                 logger.info("Generating batch %d-%d of %d changes (%.1f%%)", 
-                           batch_start + 1, batch_end, TOTAL_CHANGES, progress_pct)
-            
-            # Generate batch of changes
-            changes_batch = []
-            for i in range(current_batch_size):
-                change = generate_change_data(incidents, batch_start + i)
-                if change:
-                    changes_batch.append(change)
+                           batch_start + 1, batch_end, total_changes, progress_pct)
             
-            # Insert batch of changes
-            successful_inserts = insert_batch(connection, changes_batch)
-            total_inserted += successful_inserts
+            if not insert_batch(connection, changes_batch, id_step):
+                logger.error("Stopped at change %d; %d of %d changes were inserted",
+                             batch_start + 1, total_inserted, total_changes)
+                break
+            total_inserted += len(changes_batch)
+            total_links += sum(len(change['related_incident_ids']) for change in changes_batch)
+            batches += 1
             
             # Only log at 10% intervals or first/last batch
-            completion_percentage = (total_inserted / TOTAL_CHANGES) * 100
-            if completion_percentage % 10 < (BATCH_SIZE / TOTAL_CHANGES) * 100 or batch_end == TOTAL_CHANGES:
+            completion_percentage = (total_inserted / total_changes) * 100
+            if completion_percentage % 10 < (args.batch_size / total_changes) * 100 or batch_end == total_changes:
                 logger.info("Progress: %d/%d changes inserted (%.1f%%)", 
-                           total_inserted, TOTAL_CHANGES, completion_percentage)
-            
-            # Clean up memory
-            del changes_batch
-            gc.collect()
+                           total_inserted, total_changes, completion_percentage)
         
-        # Log final summary
-        end_time = datetime.datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        logger.info("Change generation complete: %d/%d changes in %.2f seconds (%.2f changes/sec)", 
-                   total_inserted, TOTAL_CHANGES, duration, total_inserted/duration if duration > 0 else 0)
-
-    except Exception as e:
-        logger.error("Error during change generation: %s", e)
+        return total_inserted, total_links, batches
     finally:
-        if 'connection' in locals():
-            connection.close()
-            logger.info("Database connection closed")
+        connection.close()
+        logger.info("Database connection closed")
+
+def main():
+    """Main function to generate and insert changes"""
+    parser = argparse.ArgumentParser(description="Generate GLPI changes correlated with existing incidents")
+    parser.add_argument('--count', type=int, default=TOTAL_CHANGES, help="changes to generate (default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help="changes per INSERT and per transaction (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible data")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split the run into this many shards, each with its own RNG and connection (default: 1)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes for the shards (default: CPU count)")
+    parser.add_argument('--base-date', default=None,
+                        help="YYYY-MM-DD the generated dates lead up to (default: today); fix it to reproduce a run")
+    parser.add_argument('--output', default=None,
+                        help="write glpi_changes and glpi_changes_tickets files to this directory instead of the database")
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="file format with --output: gzipped csv, gzipped sql dump or parquet (default: csv)")
+    parser.add_argument('--first-id', type=int, default=1, help="id of the first change with --output (default: 1)")
+    parser.add_argument('--incidents', action='append', default=[], metavar='FILE',
+                        help="with --output, sample incidents from glpi_tickets CSV files written by "
+                             "generate_incidents.py instead of the database (repeatable)")
+    parser.add_argument('--sample-method', choices=SAMPLE_METHODS, default='range',
+                        help="how incidents are sampled from the database: random primary-key probes, or one "
+                             "streaming pass over glpi_tickets (default: range, which falls back to reservoir)")
+    args = parser.parse_args()
+    base_date = parse_base_date(args.base_date)
+    total_changes = args.count
+
+    start_time = datetime.datetime.now()
+    logger.info("Starting change generation process for %d changes", total_changes)
+    
+    if args.output:
+        total_written, total_links, _ = run_offline(args, base_date)
+        duration = (datetime.datetime.now() - start_time).total_seconds()
+        logger.info("Change generation complete: %d/%d changes and %d incident links written to %s "
+                   "as %s in %.2f seconds (%.2f changes/sec)",
+                   total_written, total_changes, total_links, args.output, args.format,
+                   duration, total_written/duration if duration > 0 else 0)
+        if total_written < total_changes:
+            sys.exit(f"Only {total_written} of {total_changes} changes were written")
+        return
+    if args.shards > 1:
+        total_inserted, total_links, batches = run_sharded(args, base_date)
+    else:
+        total_inserted, total_links, batches = run_single(args, base_date)
+    
+    # Log final summary
+    end_time = datetime.datetime.now()
+    duration = (end_time - start_time).total_seconds()
+    logger.info("Change generation complete: %d/%d changes in %.2f seconds (%.2f changes/sec, "
+               "%d incident links, %d insert statements)",
+               total_inserted, total_changes, duration, total_inserted/duration if duration > 0 else 0,
+               total_links, 2 * batches)
+    if total_inserted < total_changes:
+        sys.exit(f"Only {total_inserted} of {total_changes} changes were inserted")
 
 if __name__ == "__main__":
     main()
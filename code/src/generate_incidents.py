@@ -1,7 +1,15 @@
 import mysql.connector
 from datetime import datetime, timedelta
+import os
+import sys
+import time
 import random
-from typing import List, Dict
+import argparse
+import tempfile
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from sharding import Shard, parse_base_date, plan_shards, report_progress, run_shards, written_id_ranges
+from dataset_writers import FORMATS, open_dataset
 
 # Database configuration
 db_config = {
@@ -12,6 +20,14 @@ db_config = {
     'auth_plugin': 'mysql_native_password'
 }
 
+# Column order of the rows yielded by iter_incidents
+INCIDENT_COLUMNS = (
+    'name', 'content', 'priority', 'urgency', 'impact', 'status',
+    'date_creation', 'date_mod', 'entities_id', 'type', 'itilcategories_id'
+)
+
+LOAD_METHODS = ('multirow', 'executemany', 'load-data')
+
 # Define cloud components and their common issues
 CLOUD_COMPONENTS = {
     'Azure': {
@@ -69,61 +85,141 @@ CLOUD_COMPONENTS = {
     }
 }
 
-def generate_random_date(start_date: datetime, end_date: datetime) -> datetime:
+def generate_random_date(start_date: datetime, end_date: datetime,
+                         rng: Optional[random.Random] = None) -> datetime:
     time_between = end_date - start_date
     days_between = time_between.days
-    random_days = random.randrange(days_between)
+    random_days = (rng or random).randrange(days_between)
     return start_date + timedelta(days=random_days)
 
-def generate_incidents(count: int) -> List[Dict]:
-    incidents = []
-    start_date = datetime.now() - timedelta(days=365)
-    end_date = datetime.now()
+def iter_incidents(count: int, rng: Optional[random.Random] = None,
+                   base_date: Optional[datetime] = None) -> Iterator[Tuple]:
+    """Yield ``count`` incidents as tuples in INCIDENT_COLUMNS order, one at a time.
+
+    Dates fall in the year before ``base_date`` (default: now); with a seeded
+    ``rng`` and a fixed ``base_date`` the rows are reproducible.
+    """
+    rng = rng or random.Random()
+    end_date = base_date or datetime.now()
+    start_date = end_date - timedelta(days=365)
+    clouds = list(CLOUD_COMPONENTS.keys())
+    components = {cloud: list(CLOUD_COMPONENTS[cloud].keys()) for cloud in clouds}
+    levels = [1, 2, 3, 4, 5]
 
     for _ in range(count):
-        cloud = random.choice(list(CLOUD_COMPONENTS.keys()))
-        component = random.choice(list(CLOUD_COMPONENTS[cloud].keys()))
-        issue = random.choice(CLOUD_COMPONENTS[cloud][component])
-
-        created_date = generate_random_date(start_date, end_date)
-        
-        incident = {
-            'name': f"{cloud} {component} - {issue}",
-            'content': f"Alert: {issue} detected in {component}.\n\nDetailed Analysis:\n- Service affected: {cloud} {component}\n- Issue Description: {issue}\n- Potential root cause identified\n- Mitigation steps initiated",
-            'priority': random.choice([1, 2, 3, 4, 5]),
-            'urgency': random.choice([1, 2, 3, 4, 5]),
-            'impact': random.choice([1, 2, 3, 4, 5]),
-            'status': random.choice([1, 2, 3, 4, 5]),
-            'date_creation': created_date.strftime('%Y-%m-%d %H:%M:%S'),
-            'date_mod': (created_date + timedelta(hours=random.randint(1, 48))).strftime('%Y-%m-%d %H:%M:%S'),
-            'entities_id': 0,
-            'type': 1,
-            'itilcategories_id': 0
-        }
-        incidents.append(incident)
-    
-    return incidents
-
-def insert_incidents(incidents: List[Dict]):
+        cloud = rng.choice(clouds)
+        component = rng.choice(components[cloud])
+        issue = rng.choice(CLOUD_COMPONENTS[cloud][component])
+
+        created_date = generate_random_date(start_date, end_date, rng)
+
+        yield (
+            f"{cloud} {component} - {issue}",
+            f"Alert: {issue} detected in {component}.\n\nDetailed Analysis:\n- Service affected: {cloud} {component}\n- Issue Description: {issue}\n- Potential root cause identified\n- Mitigation steps initiated",
+            rng.choice(levels),
+            rng.choice(levels),
+            rng.choice(levels),
+            rng.choice(levels),
+            created_date.strftime('%Y-%m-%d %H:%M:%S'),
+            (created_date + timedelta(hours=rng.randint(1, 48))).strftime('%Y-%m-%d %H:%M:%S'),
+            0,
+            1,
+            0
+        )
+
+def generate_incidents(count: int) -> List[Dict]:
+    return [dict(zip(INCIDENT_COLUMNS, row)) for row in iter_incidents(count)]
+
+def batched(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def insert_multirow(cursor, rows: List[Tuple], columns: Sequence[str] = INCIDENT_COLUMNS):
+    """One ``INSERT ... VALUES (...), (...), ...`` statement for the whole batch"""
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    cursor.execute(
+        f"INSERT INTO glpi_tickets ({', '.join(columns)}) VALUES "
+        + ", ".join([placeholders] * len(rows)),
+        [value for row in rows for value in row]
+    )
+
+def insert_executemany(cursor, rows: List[Tuple], columns: Sequence[str] = INCIDENT_COLUMNS):
+    """``executemany``; the connector rewrites a plain INSERT into one multi-row statement"""
+    cursor.executemany(
+        f"INSERT INTO glpi_tickets ({', '.join(columns)}) VALUES "
+        "(" + ", ".join(["%s"] * len(columns)) + ")",
+        rows
+    )
+
+def _tsv_field(value) -> str:
+    # LOAD DATA's default escaping: backslash, tab and newline are backslash-escaped
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+def load_data_infile(cursor, rows: List[Tuple], columns: Sequence[str] = INCIDENT_COLUMNS):
+    """Write the batch to a temporary tab-separated file and ``LOAD DATA LOCAL INFILE`` it.
+
+    Needs ``local_infile=1`` on the server; the connection is opened with
+    ``allow_local_infile``.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', delete=False) as f:
+        for row in rows:
+            f.write("\t".join(_tsv_field(value) for value in row) + "\n")
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE glpi_tickets "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})"
+        )
+    finally:
+        os.unlink(f.name)
 
-        insert_query = """
-        INSERT INTO glpi_tickets 
-        (name, content, priority, urgency, impact, status, 
-        date_creation, date_mod, entities_id, type, itilcategories_id) 
-        VALUES 
-        (%(name)s, %(content)s, %(priority)s, %(urgency)s, 
-        %(impact)s, %(status)s, %(date_creation)s, %(date_mod)s, 
-        %(entities_id)s, %(type)s, %(itilcategories_id)s)
-        """
+LOADERS = {
+    'multirow': insert_multirow,
+    'executemany': insert_executemany,
+    'load-data': load_data_infile,
+}
+
+def insert_incidents(incidents: Iterable, batch_size: int = 1000, method: str = 'multirow',
+                     total: Optional[int] = None, columns: Sequence[str] = INCIDENT_COLUMNS,
+                     progress: Optional[Callable[[int], None]] = None) -> int:
+    """Insert incidents in batches of ``batch_size``, one transaction per batch.
 
-        for incident in incidents:
-            cursor.execute(insert_query, incident)
+    ``incidents`` may be dicts or tuples in ``columns`` order and is consumed
+    lazily, so memory stays at one batch however many rows are inserted.
+    ``progress``, when given, is called with each committed batch size in
+    place of the progress lines. Returns the number of rows committed.
+    """
+    load = LOADERS[method]
+    rows = (
+        tuple(incident[column] for column in columns) if isinstance(incident, dict) else incident
+        for incident in incidents
+    )
+    inserted = 0
+    started = time.perf_counter()
+    next_report = 0.1
+    try:
+        conn = mysql.connector.connect(**db_config, allow_local_infile=(method == 'load-data'))
+        cursor = conn.cursor()
 
-        conn.commit()
-        print(f"Successfully inserted {len(incidents)} incidents")
+        for batch in batched(rows, batch_size):
+            try:
+                load(cursor, batch, columns)
+                conn.commit()
+            except mysql.connector.Error:
+                conn.rollback()
+                raise
+            inserted += len(batch)
+            if progress:
+                progress(len(batch))
+            elif total and inserted >= next_report * total:
+                elapsed = time.perf_counter() - started
+                print(f"Inserted {inserted}/{total} incidents ({inserted / total:.0%}, "
+                      f"{inserted / elapsed:.0f} rows/sec)")
+                next_report = int(inserted / total * 10 + 1) / 10
 
     except mysql.connector.Error as err:
         print(f"Error: {err}")
@@ -131,7 +227,106 @@ def insert_incidents(incidents: List[Dict]):
         if 'conn' in locals() and conn.is_connected():
             cursor.close()
             conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"Inserted {inserted} incidents in {elapsed:.2f} seconds "
+          f"({inserted / elapsed if elapsed > 0 else 0:.0f} rows/sec, method={method}, batch_size={batch_size})")
+    return inserted
+
+def next_incident_id() -> int:
+    """First id after the current glpi_tickets rows"""
+    conn = mysql.connector.connect(**db_config)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM glpi_tickets")
+        return int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+def insert_shard(job: Tuple[Shard, int, datetime, int, str]) -> int:
+    """Generate and insert one shard over its own connection, with ids ``first_id + offset`` onwards.
+
+    Returns the rows committed. Batches commit in order, so after an error
+    the shard's rows are the first ones of its id slice.
+    """
+    shard, first_id, base_date, batch_size, method = job
+    rows = (
+        (first_id + shard.offset + position,) + row
+        for position, row in enumerate(iter_incidents(shard.size, shard.rng(), base_date))
+    )
+    return insert_incidents(rows, batch_size=batch_size, method=method,
+                            columns=('id',) + INCIDENT_COLUMNS, progress=report_progress)
+
+def write_shard(job: Tuple[Shard, int, datetime, int, str, str, Optional[int]]) -> int:
+    """Generate one shard into a glpi_tickets file under ``directory``, with ids ``first_id + offset`` onwards"""
+    shard, first_id, base_date, batch_size, directory, fmt, part = job
+    rows = (
+        (first_id + shard.offset + position,) + row
+        for position, row in enumerate(iter_incidents(shard.size, shard.rng(), base_date))
+    )
+    with open_dataset(fmt, directory, 'glpi_tickets', ('id',) + INCIDENT_COLUMNS, part) as writer:
+        for batch in batched(rows, batch_size):
+            writer.write(batch)
+            report_progress(len(batch))
+    return writer.rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic cloud incidents and bulk-load them into GLPI")
+    parser.add_argument('--count', type=int, default=1000, help="incidents to generate (default: 1000)")
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help="rows per INSERT / LOAD DATA and per transaction (default: 1000)")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible data")
+    parser.add_argument('--method', choices=LOAD_METHODS, default='multirow',
+                        help="multi-row INSERT, executemany, or LOAD DATA LOCAL INFILE (default: multirow)")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="split the run into this many shards, each with its own RNG and connection (default: 1)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes for the shards (default: CPU count)")
+    parser.add_argument('--base-date', default=None,
+                        help="YYYY-MM-DD the generated dates lead up to (default: today); fix it to reproduce a run")
+    parser.add_argument('--output', default=None,
+                        help="write glpi_tickets files to this directory instead of the database")
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help="file format with --output: gzipped csv, gzipped sql dump or parquet (default: csv)")
+    parser.add_argument('--first-id', type=int, default=1, help="id of the first incident with --output (default: 1)")
+    args = parser.parse_args()
+    base_date = parse_base_date(args.base_date)
+
+    if args.output:
+        shards = plan_shards(args.count, args.shards, args.seed)
+        jobs = [(shard, args.first_id, base_date, args.batch_size, args.output, args.format,
+                 shard.index if len(shards) > 1 else None)
+                for shard in shards]
+        started = time.perf_counter()
+        if len(jobs) == 1:
+            written = write_shard(jobs[0])
+        else:
+            written = sum(run_shards(write_shard, jobs, args.count, args.processes, label="incidents"))
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {written} incidents (ids {args.first_id}-{args.first_id + written - 1}) to {args.output} "
+              f"as {args.format} in {elapsed:.2f} seconds ({written / elapsed if elapsed > 0 else 0:.0f} rows/sec)")
+        return
+
+    if args.shards <= 1:
+        # Same generator as shard 0 of --output or --shards, so a seed gives the same rows everywhere
+        incidents = iter_incidents(args.count, plan_shards(args.count, 1, args.seed)[0].rng(), base_date)
+        inserted = insert_incidents(incidents, batch_size=args.batch_size, method=args.method, total=args.count)
+        if inserted < args.count:
+            sys.exit(f"Only {inserted} of {args.count} incidents were inserted")
+        return
+
+    # Shards insert concurrently, so ids are assigned here rather than by auto-increment
+    first_id = next_incident_id()
+    shards = plan_shards(args.count, args.shards, args.seed)
+    jobs = [(shard, first_id, base_date, args.batch_size, args.method) for shard in shards]
+    started = time.perf_counter()
+    per_shard = run_shards(insert_shard, jobs, args.count, args.processes, label="incidents")
+    elapsed = time.perf_counter() - started
+    inserted = sum(per_shard)
+    ids = ", ".join(f"{low}-{high}" for low, high in written_id_ranges(first_id, shards, per_shard)) or "none"
+    print(f"Inserted {inserted} incidents (ids {ids}) in {elapsed:.2f} seconds "
+          f"({inserted / elapsed if elapsed > 0 else 0:.0f} rows/sec, {len(jobs)} shards)")
+    failed = [shard.index for shard, count in zip(shards, per_shard) if count < shard.size]
+    if failed:
+        sys.exit(f"Shards {', '.join(map(str, failed))} failed; only {inserted} of {args.count} incidents were inserted")
 
 if __name__ == "__main__":
-    incidents = generate_incidents(1000)
-    insert_incidents(incidents)
+    main()
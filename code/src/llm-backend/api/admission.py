@@ -0,0 +1,197 @@
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+from shared_state import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_TICKET_ACTION = 0
+PRIORITY_CHAT = 1
+
+# Shared-store lease prefix of the generation slots all workers draw from
+SLOT_LEASE = "llm_slot:"
+
+class Overloaded(Exception):
+    """Raised instead of queueing when the LLM cannot take the request in time"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class Slot:
+    """One admitted request; ``release`` is idempotent"""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+        self.started = time.monotonic()
+        self.lease: Optional[str] = None
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+class AdmissionController:
+    """Bounded scheduler in front of the LLM.
+
+    At most ``max_concurrency`` requests generate at once. Others wait in a
+    priority queue (ticket actions ahead of free-form chat, FIFO within a
+    priority) holding at most ``max_queue`` requests for at most ``max_wait``
+    seconds. Beyond either bound ``Overloaded`` is raised straight away with a
+    Retry-After estimate, so a burst sheds load instead of making every
+    request slow.
+
+    With a shared ``store`` the ``max_concurrency`` bound holds across
+    worker processes: an admitted request also takes one of the store's
+    slot leases, polling for it within the same ``max_wait``. Held leases
+    are renewed every ``slot_ttl / 3`` seconds, so the slots of a worker
+    that died free up after ``slot_ttl``.
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_queue: int = 32, max_wait: float = 30.0,
+                 store: Optional[SharedStore] = None, slot_ttl: float = 30.0, poll_interval: float = 0.1):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._store = store if store is not None and store.shared else None
+        self.slot_ttl = slot_ttl
+        self.poll_interval = poll_interval
+        self._leases: Set[str] = set()
+        self._renewer: Optional[asyncio.Task] = None
+        self.active = 0
+        self.waiting = 0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=1000)
+        self._service_s = None
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _admit(self, enqueued_at: float) -> Slot:
+        self.active += 1
+        self.admitted += 1
+        self._waits.append(time.monotonic() - enqueued_at)
+        return Slot(self)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        service_s = self._service_s or 1.0
+        return max(1, math.ceil(service_s * (self.waiting + 1) / self.max_concurrency))
+
+    async def acquire(self, priority: int = PRIORITY_CHAT) -> Slot:
+        enqueued_at = time.monotonic()
+        slot = await self._acquire_local(priority, enqueued_at)
+        if self._store is None:
+            return slot
+        try:
+            slot.lease = await self._acquire_shared(enqueued_at)
+        except BaseException:
+            slot.release()
+            raise
+        slot.started = time.monotonic()
+        return slot
+
+    async def _acquire_local(self, priority: int, enqueued_at: float) -> Slot:
+        if self.active < self.max_concurrency and not self.waiting:
+            return self._admit(enqueued_at)
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded("LLM queue is full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), enqueued_at, future))
+        self.waiting += 1
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded("Timed out waiting for the LLM", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the caller went away
+            if future.done() and not future.cancelled():
+                future.result().release()
+            raise
+        finally:
+            self.waiting -= 1
+
+    async def _acquire_shared(self, enqueued_at: float) -> str:
+        """Poll for one of the generation slots shared by all workers"""
+        deadline = enqueued_at + self.max_wait
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(
+                self._store.acquire_slot, SLOT_LEASE, self.max_concurrency, self.slot_ttl
+            ))
+            try:
+                lease = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # The lease may be granted after the caller went away
+                attempt.add_done_callback(self._drop_orphaned_lease)
+                raise
+            if lease is not None:
+                self._leases.add(lease)
+                if self._renewer is None or self._renewer.done():
+                    self._renewer = asyncio.ensure_future(self._renew_leases())
+                return lease
+            if time.monotonic() + self.poll_interval > deadline:
+                self.timed_out += 1
+                raise Overloaded("Timed out waiting for the LLM", self.retry_after())
+            await asyncio.sleep(self.poll_interval)
+
+    def _drop_orphaned_lease(self, attempt: asyncio.Future):
+        if not attempt.cancelled() and attempt.exception() is None and attempt.result() is not None:
+            self._store.submit(self._store.release_lease, attempt.result())
+
+    async def _renew_leases(self):
+        """Keep the shared slots of long generations from lapsing; ends once none are held"""
+        while self._leases:
+            await asyncio.sleep(self.slot_ttl / 3)
+            try:
+                await asyncio.to_thread(self._store.renew_leases, list(self._leases), self.slot_ttl)
+            except Exception as e:
+                logger.warning("Could not renew LLM slot leases: %s", e)
+
+    def _release(self, slot: Slot):
+        # A slot given up while polling for a shared lease never generated
+        if self._store is None or slot.lease is not None:
+            elapsed = time.monotonic() - slot.started
+            self._service_s = elapsed if self._service_s is None else 0.8 * self._service_s + 0.2 * elapsed
+        self.active -= 1
+        if slot.lease is not None:
+            self._leases.discard(slot.lease)
+            self._store.submit(self._store.release_lease, slot.lease)
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the highest-priority live waiters"""
+        while self._heap and self.active < self.max_concurrency:
+            _, _, enqueued_at, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(self._admit(enqueued_at))
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            "active": self.active,
+            "queued": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "shared": self._store is not None,
+            "shared_slots_held": len(self._leases),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "wait_p95_ms": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else None,
+            "avg_service_s": round(self._service_s, 3) if self._service_s is not None else None
+        }
@@ -0,0 +1,218 @@
+import os
+import abc
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Characters kept from each turn when it is folded into the running summary
+SUMMARY_TURN_CHARS = 160
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/Mistral)"""
+    return (len(text) + 3) // 4
+
+def summarize_turn(turn: Dict[str, str]) -> str:
+    """Condense one turn to its leading sentence for the running summary"""
+    content = " ".join(turn["content"].split())
+    sentence_end = content.find(". ")
+    if 0 < sentence_end < SUMMARY_TURN_CHARS:
+        content = content[:sentence_end + 1]
+    elif len(content) > SUMMARY_TURN_CHARS:
+        content = content[:SUMMARY_TURN_CHARS].rstrip() + "..."
+    return f"{turn['role']}: {content}"
+
+class ConversationStore(abc.ABC):
+    """Server-side chat history keyed by conversation_id.
+
+    The last ``max_turns`` turns are kept verbatim; older turns are folded into
+    a running summary. ``render_history`` fits summary plus recent turns into
+    ``history_token_budget`` so prompt size stays flat as a conversation grows.
+    Backends implement ``_load``/``_save``. Every method blocks on the backend,
+    so async callers run them with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, max_turns: int = 6, history_token_budget: int = 800):
+        self.max_turns = max_turns
+        self.history_token_budget = history_token_budget
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """State of a live conversation, or None if unknown or idle too long"""
+
+    @abc.abstractmethod
+    def _save(self, conversation_id: str, state: Dict[str, Any]):
+        """Persist state and mark the conversation as just used"""
+
+    def exists(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._load(conversation_id) is not None
+
+    def append(self, conversation_id: str, turns: List[Dict[str, str]]):
+        """Record new turns, folding the oldest into the summary beyond max_turns"""
+        with self._lock:
+            state = self._load(conversation_id) or {"summary": "", "turns": []}
+            state["turns"].extend({"role": t["role"], "content": t["content"]} for t in turns)
+            overflow = len(state["turns"]) - self.max_turns
+            if overflow > 0:
+                folded = [summarize_turn(t) for t in state["turns"][:overflow]]
+                state["summary"] = "\n".join(filter(None, [state["summary"]] + folded))
+                state["turns"] = state["turns"][overflow:]
+            state["summary"] = self._trim_summary(state["summary"])
+            self._save(conversation_id, state)
+
+    def _trim_summary(self, summary: str) -> str:
+        """Keep the most recent summary lines within half the history budget"""
+        budget = self.history_token_budget // 2
+        lines = summary.split("\n") if summary else []
+        while lines and estimate_tokens("\n".join(lines)) > budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def render_history(self, conversation_id: str) -> str:
+        """Render summary and recent turns within the history token budget"""
+        with self._lock:
+            state = self._load(conversation_id)
+        if not state:
+            return ""
+
+        summary = state["summary"]
+        recent = [f"{t['role']}: {t['content']}" for t in state["turns"]]
+        used = estimate_tokens(summary)
+        kept: List[str] = []
+        # Walk newest to oldest so the latest turns always survive
+        for line in reversed(recent):
+            cost = estimate_tokens(line)
+            if used + cost > self.history_token_budget:
+                break
+            kept.append(line)
+            used += cost
+        dropped = len(recent) - len(kept)
+        if dropped:
+            summary = "\n".join(filter(None, [summary] + [
+                summarize_turn(t) for t in state["turns"][:dropped]
+            ]))
+            summary = self._trim_summary(summary)
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        parts.extend(reversed(kept))
+        return "\n".join(parts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+    def close(self):
+        pass
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store with LRU eviction and an idle timeout"""
+
+    def __init__(self, max_conversations: int = 1000, idle_ttl: float = 6 * 3600, **kwargs):
+        super().__init__(**kwargs)
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def _load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(conversation_id)
+        if entry is None:
+            return None
+        touched_at, state = entry
+        if time.monotonic() - touched_at > self.idle_ttl:
+            del self._data[conversation_id]
+            self.evictions += 1
+            return None
+        return state
+
+    def _save(self, conversation_id: str, state: Dict[str, Any]):
+        self._data[conversation_id] = (time.monotonic(), state)
+        self._data.move_to_end(conversation_id)
+        while len(self._data) > self.max_conversations:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "conversations": len(self._data),
+            "max_conversations": self.max_conversations,
+            "evictions": self.evictions
+        }
+
+class SQLiteConversationStore(ConversationStore):
+    """On-disk store so conversations survive restarts.
+
+    Conversations idle for ``idle_ttl`` are deleted at startup and then after
+    every ``purge_every`` saves, so the file does not grow with dead rows.
+    """
+
+    def __init__(self, path: str, idle_ttl: float = 7 * 24 * 3600, purge_every: int = 500, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.purge_every = purge_every
+        self._saves_since_purge = 0
+        self.purged = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._purge()
+
+    def _purge(self):
+        cursor = self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.idle_ttl,))
+        self.purged += max(cursor.rowcount, 0)
+        self._saves_since_purge = 0
+
+    def _load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT summary, turns FROM conversations WHERE id = ? AND updated_at >= ?",
+            (conversation_id, time.time() - self.idle_ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"summary": row[0], "turns": json.loads(row[1])}
+
+    def _save(self, conversation_id: str, state: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversations (id, summary, turns, updated_at) VALUES (?, ?, ?, ?)",
+            (conversation_id, state["summary"], json.dumps(state["turns"]), time.time())
+        )
+        self._saves_since_purge += 1
+        if self._saves_since_purge >= self.purge_every:
+            self._purge()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "conversations": count, "purged": self.purged}
+
+    def close(self):
+        self._conn.close()
+
+def create_conversation_store() -> ConversationStore:
+    """Build the store selected by the CONVERSATION_* environment variables"""
+    options = {
+        "max_turns": int(os.getenv('CONVERSATION_MAX_TURNS', '6')),
+        "history_token_budget": int(os.getenv('CONVERSATION_HISTORY_TOKENS', '800'))
+    }
+    if os.getenv('CONVERSATION_STORE', 'memory') == 'sqlite':
+        path = os.getenv('CONVERSATION_DB_PATH', 'conversations.db')
+        logger.info("Using SQLite conversation store at %s", path)
+        return SQLiteConversationStore(path, **options)
+    return InMemoryConversationStore(
+        max_conversations=int(os.getenv('CONVERSATION_MAX_ACTIVE', '1000')),
+        **options
+    )
@@ -0,0 +1,235 @@
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INT32_MAX = 2 ** 31 - 1
+
+# Incidents and changes name the same component differently
+COMPONENT_ALIASES = {
+    "GCP Compute Engine": "GCP VM",
+}
+
+def component_of(name: Optional[str]) -> str:
+    """Component tag of a change or incident title ("Azure AKS - Node pool expansion" -> "Azure AKS")"""
+    head, sep, _ = (name or "").partition(" - ")
+    if not sep:
+        return ""
+    head = " ".join(head.split())
+    return COMPONENT_ALIASES.get(head, head)
+
+def _to_seconds(dates: List[str]) -> np.ndarray:
+    """GLPI "YYYY-MM-DD HH:MM:SS" strings as epoch seconds (0 when missing)"""
+    parsed = np.array([d or "NaT" for d in dates], dtype="datetime64[s]")
+    seconds = parsed.astype(np.int64)
+    seconds[np.isnat(parsed)] = 0
+    return seconds
+
+class _Snapshot(NamedTuple):
+    """Immutable column store; readers use whichever snapshot is current without locking"""
+    # One row per change, sorted by change id
+    ids: np.ndarray          # int32
+    names: np.ndarray        # int32 code into _Interner.values
+    components: np.ndarray   # int16 code into _Interner.values, 0 = untagged
+    statuses: np.ndarray     # int8
+    dates: np.ndarray        # int64 epoch seconds
+    # Rows grouped by component, newest change first within a group
+    by_component: np.ndarray       # int32 row numbers
+    component_starts: np.ndarray   # int32 offsets into by_component, indexed by component code
+    # Change_Ticket links sorted by ticket id
+    link_tickets: np.ndarray  # int32
+    link_changes: np.ndarray  # int32
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self)
+
+def _empty_snapshot() -> _Snapshot:
+    i32 = np.zeros(0, dtype=np.int32)
+    return _Snapshot(i32, i32, np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int8),
+                     np.zeros(0, dtype=np.int64), i32, np.zeros(1, dtype=np.int32), i32, i32)
+
+class _Interner:
+    """Maps repeated strings to small integer codes; code 0 is the empty string"""
+
+    def __init__(self):
+        self.values: List[str] = [""]
+        self._codes: Dict[str, int] = {"": 0}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+class ChangeCorrelationIndex:
+    """In-memory correlation of GLPI changes with incidents.
+
+    Answers "which changes are linked to ticket #N" and "which changes were
+    recently made to this component" without a round-trip to GLPI. Changes
+    are kept as parallel numpy columns with interned names and component
+    tags (a few dozen bytes per change, see ``stats()``), ticket links as two
+    int32 columns sorted by ticket, and per-component rows pre-sorted by date,
+    so both lookups are a ``searchsorted`` and a slice.
+
+    ``update`` upserts changes modified since ``last_date_mod`` and links
+    newer than ``last_link_id``, then swaps in a rebuilt snapshot; lookups
+    never block on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = _Interner()
+        self._components = _Interner()
+        self._snapshot = _empty_snapshot()
+        self.last_date_mod = ""
+        self.last_link_id = 0
+        self.ready = False
+
+    def update(self, changes: Iterable[Dict], links: Iterable[Dict] = ()) -> Tuple[int, int]:
+        """Upsert changes and add Change_Ticket links; returns how many of each were applied"""
+        changes = [
+            change for change in changes
+            if str(change.get('date_mod') or "") >= self.last_date_mod
+        ]
+        links = [link for link in links if int(link['id']) > self.last_link_id]
+        with self._lock:
+            if changes or links:
+                self._snapshot = self._rebuild(changes, links)
+                if changes:
+                    self.last_date_mod = max([self.last_date_mod] + [str(c.get('date_mod') or "") for c in changes])
+                if links:
+                    self.last_link_id = max(int(link['id']) for link in links)
+            self.ready = True
+        if changes or links:
+            logger.info("Correlation index updated with %s changes and %s links", len(changes), len(links))
+        return len(changes), len(links)
+
+    def _rebuild(self, changes: List[Dict], links: List[Dict]) -> _Snapshot:
+        old = self._snapshot
+        if changes:
+            new_ids = np.array([int(c['id']) for c in changes], dtype=np.int32)
+            # Later copies of a change win: keep the last occurrence of every id
+            ids = np.concatenate([old.ids, new_ids])
+            names = np.concatenate([old.names, np.array(
+                [self._names.code(str(c.get('name') or "")) for c in changes], dtype=np.int32)])
+            components = np.concatenate([old.components, np.array(
+                [self._components.code(component_of(c.get('name'))) for c in changes], dtype=np.int16)])
+            statuses = np.concatenate([old.statuses, np.array(
+                [int(c.get('status') or 0) for c in changes], dtype=np.int8)])
+            dates = np.concatenate([old.dates, _to_seconds(
+                [str(c.get('date') or c.get('date_mod') or "") for c in changes])])
+            _, last = np.unique(ids[::-1], return_index=True)
+            keep = len(ids) - 1 - last
+            ids, names, components, statuses, dates = (
+                column[keep] for column in (ids, names, components, statuses, dates)
+            )
+            by_component = np.lexsort((-dates, components)).astype(np.int32)
+            component_starts = np.searchsorted(
+                components[by_component], np.arange(len(self._components.values) + 1)
+            ).astype(np.int32)
+        else:
+            ids, names, components, statuses, dates = old.ids, old.names, old.components, old.statuses, old.dates
+            by_component, component_starts = old.by_component, old.component_starts
+
+        if links:
+            pairs = np.concatenate([
+                old.link_tickets.astype(np.int64) << 32 | old.link_changes.astype(np.int64),
+                np.array([int(l['tickets_id']) << 32 | int(l['changes_id']) for l in links], dtype=np.int64)
+            ])
+            pairs = np.unique(pairs)
+            link_tickets = (pairs >> 32).astype(np.int32)
+            link_changes = (pairs & 0xFFFFFFFF).astype(np.int32)
+        else:
+            link_tickets, link_changes = old.link_tickets, old.link_changes
+
+        return _Snapshot(ids, names, components, statuses, dates,
+                         by_component, component_starts, link_tickets, link_changes)
+
+    def _row(self, snapshot: _Snapshot, row: int) -> Dict:
+        return {
+            "id": int(snapshot.ids[row]),
+            "name": self._names.values[snapshot.names[row]],
+            "component": self._components.values[snapshot.components[row]],
+            "status": int(snapshot.statuses[row]),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(snapshot.dates[row]))),
+        }
+
+    def _rows_of(self, snapshot: _Snapshot, change_ids: np.ndarray) -> np.ndarray:
+        """Row numbers of the given change ids, skipping links to changes not (yet) indexed"""
+        rows = np.searchsorted(snapshot.ids, change_ids)
+        found = rows < len(snapshot.ids)
+        rows, change_ids = rows[found], change_ids[found]
+        return rows[snapshot.ids[rows] == change_ids]
+
+    def changes_for_ticket(self, ticket_id: int) -> List[Dict]:
+        """Changes linked to a ticket, newest first"""
+        snapshot = self._snapshot
+        if not 0 < ticket_id <= _INT32_MAX:
+            return []
+        # Same dtype as the column, otherwise numpy casts the whole column per call
+        key = np.int32(ticket_id)
+        lo = snapshot.link_tickets.searchsorted(key, side="left")
+        hi = snapshot.link_tickets.searchsorted(key, side="right")
+        rows = self._rows_of(snapshot, snapshot.link_changes[lo:hi])
+        rows = rows[np.argsort(-snapshot.dates[rows], kind="stable")]
+        return [self._row(snapshot, row) for row in rows]
+
+    def recent_changes(self, component: str, limit: int = 5, since: Optional[float] = None,
+                       exclude: Iterable[int] = ()) -> List[Dict]:
+        """Most recent changes made to a component, optionally only those dated at or after ``since`` (epoch)"""
+        snapshot = self._snapshot
+        code = self._components.find(COMPONENT_ALIASES.get(component, component))
+        if not code or code + 1 >= len(snapshot.component_starts):
+            return []
+        exclude = set(exclude)
+        # Newest first, so only the first limit + len(exclude) rows can qualify
+        start = snapshot.component_starts[code]
+        end = min(snapshot.component_starts[code + 1], start + limit + len(exclude))
+        rows = snapshot.by_component[start:end]
+        results = []
+        for row, change_id, date in zip(rows.tolist(), snapshot.ids[rows].tolist(), snapshot.dates[rows].tolist()):
+            if since is not None and date < since:
+                break
+            if change_id not in exclude:
+                results.append(self._row(snapshot, row))
+        return results[:limit]
+
+    def correlate(self, ticket_id: int, ticket_name: Optional[str] = None,
+                  limit: int = 5, since: Optional[float] = None) -> Dict[str, List[Dict]]:
+        """Linked changes of a ticket plus recent changes to its components.
+
+        Components come from the linked changes and, when given, the ticket
+        title; changes already linked to the ticket are not repeated.
+        """
+        linked = self.changes_for_ticket(ticket_id)
+        components = [component_of(ticket_name)] if ticket_name else []
+        components += [change["component"] for change in linked]
+        seen_ids = {change["id"] for change in linked}
+        recent: Dict[str, List[Dict]] = {}
+        for component in dict.fromkeys(c for c in components if c):
+            changes = self.recent_changes(component, limit, since, exclude=seen_ids)
+            if changes:
+                recent[COMPONENT_ALIASES.get(component, component)] = changes
+        return {"linked": linked[:limit], "recent_by_component": recent}
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "ready": self.ready,
+            "changes": len(snapshot.ids),
+            "links": len(snapshot.link_tickets),
+            "components": len(self._components.values) - 1,
+            "distinct_names": len(self._names.values) - 1,
+            "array_bytes": snapshot.nbytes,
+            "string_bytes": sum(len(v) for v in self._names.values) + sum(len(v) for v in self._components.values),
+            "last_date_mod": self.last_date_mod,
+            "last_link_id": self.last_link_id
+        }
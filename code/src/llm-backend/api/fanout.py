@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+async def gather_within(sources: Dict[str, Awaitable[Any]],
+                        deadline: float) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Run independent lookups concurrently under one shared deadline.
+
+    Returns the results of the sources that finished in time and, for the
+    others, why they were dropped (``"timeout"`` or ``"error"``). Sources still
+    running at the deadline are cancelled, so one slow backend cannot stall
+    the caller.
+    """
+    if not sources:
+        return {}, {}
+    tasks = {asyncio.ensure_future(awaitable): name for name, awaitable in sources.items()}
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    results: Dict[str, Any] = {}
+    dropped: Dict[str, str] = {}
+    for task in pending:
+        dropped[tasks[task]] = "timeout"
+    for task in done:
+        name = tasks[task]
+        error = task.exception()
+        if error is not None:
+            logger.warning("Context source %s failed: %s", name, error)
+            dropped[name] = "error"
+        else:
+            results[name] = task.result()
+    if dropped:
+        logger.info("Dropped context sources after %ss: %s", deadline, dropped)
+    return results, dropped
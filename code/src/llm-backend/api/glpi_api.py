@@ -1,11 +1,170 @@
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from typing import Dict, List, Optional, Any
-from datetime import datetime
-import re
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+from intent_classifier import Classification, classify
+
+logger = logging.getLogger(__name__)
+
+# GLPI answers 401 with one of these codes once a session token has expired
+# or been killed server-side
+SESSION_ERROR_CODES = ("ERROR_SESSION_TOKEN_INVALID", "ERROR_SESSION_TOKEN_MISSING")
+# Returned when a requested range starts past the last ticket
+RANGE_EXCEEDED = "ERROR_RANGE_EXCEED_TOTAL"
+
+def build_http_session(pool_size: int = 10) -> requests.Session:
+    """Create a keep-alive HTTP session with a bounded connection pool"""
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    return http
+
+# Search option IDs of the Ticket itemtype, used for projection, sorting and criteria
+TICKET_SEARCH_OPTIONS = {
+    'name': 1,
+    'id': 2,
+    'priority': 3,
+    'itilcategories_id': 7,
+    'urgency': 10,
+    'impact': 11,
+    'status': 12,
+    'type': 14,
+    'date': 15,
+    'closedate': 16,
+    'date_mod': 19,
+    'content': 21,
+    'entities_id': 80,
+    'locations_id': 83,
+}
+TICKET_FIELDS_BY_OPTION = {str(v): k for k, v in TICKET_SEARCH_OPTIONS.items()}
+
+def build_ticket_query(filters: Optional[Dict] = None, start: int = 0, limit: Optional[int] = None,
+                       fields: Optional[List[str]] = None, sort: Optional[str] = None,
+                       order: str = "DESC", criteria: Optional[List[Dict]] = None) -> Tuple[str, Dict]:
+    """Translate ticket listing options into a GLPI REST path and query parameters.
+
+    Plain listings go to ``Ticket``. Field projection and server-side criteria
+    need the search engine, so those go to ``search/Ticket`` with field names
+    mapped to search option IDs.
+    """
+    params: Dict[str, Any] = {}
+    if limit is not None:
+        params['range'] = f"{start}-{start + limit - 1}"
+
+    if not fields and not criteria:
+        params['expand_dropdowns'] = True
+        if sort:
+            params['sort'] = sort
+            params['order'] = order
+        if filters:
+            params.update(filters)
+        return "Ticket", params
+
+    for i, field in enumerate(fields or TICKET_SEARCH_OPTIONS):
+        params[f'forcedisplay[{i}]'] = TICKET_SEARCH_OPTIONS.get(field, field)
+    for i, criterion in enumerate(criteria or []):
+        field = criterion['field']
+        params[f'criteria[{i}][field]'] = TICKET_SEARCH_OPTIONS.get(field, field)
+        params[f'criteria[{i}][searchtype]'] = criterion.get('searchtype', 'equals')
+        params[f'criteria[{i}][value]'] = criterion['value']
+        if i:
+            params[f'criteria[{i}][link]'] = criterion.get('link', 'AND')
+    if sort:
+        params['sort'] = TICKET_SEARCH_OPTIONS.get(sort, sort)
+        params['order'] = order
+    if filters:
+        params.update(filters)
+    return "search/Ticket", params
+
+def parse_ticket_page(path: str, body: Any, content_range: Optional[str]) -> Tuple[List[Dict], Optional[int]]:
+    """Return the rows of a listing response and the total count if GLPI sent it"""
+    total = None
+    if content_range and '/' in content_range:
+        try:
+            total = int(content_range.rsplit('/', 1)[1])
+        except ValueError:
+            pass
+    if not path.startswith("search/"):
+        return (body if isinstance(body, list) else []), total
+    if not isinstance(body, dict):
+        return [], total
+    rows = [
+        {TICKET_FIELDS_BY_OPTION.get(key, key): value for key, value in row.items()}
+        for row in body.get('data', [])
+    ]
+    return rows, body.get('totalcount', total)
+
+# Tickets sent per array-form POST/PUT by the bulk methods
+BULK_CHUNK_SIZE = 50
+
+def chunked(items: List[Dict], size: int) -> Iterator[Tuple[int, List[Dict]]]:
+    """Yield ``(offset, chunk)`` slices of at most ``size`` items"""
+    size = max(1, size)
+    for offset in range(0, len(items), size):
+        yield offset, items[offset:offset + size]
+
+def failed_bulk_results(chunk: List[Dict], offset: int, error: str) -> List[Dict]:
+    return [
+        {"index": offset + i, "id": item.get('id'), "ok": False, "error": error}
+        for i, item in enumerate(chunk)
+    ]
+
+def parse_bulk_results(action: str, chunk: List[Dict], offset: int,
+                       status_code: int, body: Any) -> List[Dict]:
+    """Per-item results of an array-form POST/PUT, in input order.
+
+    GLPI answers a list with one entry per input item: ``{"id": .., "message": ..}``
+    for creations and ``{"<id>": true|false, "message": ..}`` for updates, with
+    207 Multi-Status when only some items failed.
+    """
+    if status_code not in (200, 201, 207) or not isinstance(body, list) or len(body) != len(chunk):
+        error = " ".join(str(part) for part in body) if isinstance(body, list) else str(body or "")
+        return failed_bulk_results(chunk, offset, error or f"HTTP {status_code}")
+    results = []
+    for i, (item, row) in enumerate(zip(chunk, body)):
+        row = row if isinstance(row, dict) else {}
+        if action == "create":
+            ticket_id = row.get('id') or None
+            ok = ticket_id is not None
+        else:
+            ticket_id = item.get('id')
+            ok = bool(row.get(str(ticket_id)))
+        results.append({
+            "index": offset + i,
+            "id": ticket_id,
+            "ok": ok,
+            "error": None if ok else (row.get('message') or "Rejected by GLPI")
+        })
+    return results
+
+def build_ticket_from_message(message: str, priority: int = 3,
+                              classification: Optional[Classification] = None) -> Dict:
+    """Build the ticket input for a free-text user message"""
+    # Category and location come from the shared single-pass classifier
+    if classification is None:
+        classification = classify(message)
+
+    # Create ticket data
+    title = message[:50] + ('...' if len(message) > 50 else '')
+    ticket_data = {
+        'name': title,
+        'content': message,
+        'priority': priority,
+        'type': 1,  # Incident
+        'status': 1,  # New
+        'itilcategories_id': classification.category_id
+    }
+
+    # Add location if found
+    if classification.location:
+        ticket_data['locations_id'] = classification.location
+
+    return ticket_data
 
 class GLPI:
-    def __init__(self, url: str, apptoken: str, usertoken: str):
+    def __init__(self, url: str, apptoken: str, usertoken: str,
+                 http: Optional[requests.Session] = None, pool_size: int = 10):
         self.url = url
         self.app_token = apptoken
         self.user_token = usertoken
@@ -14,11 +173,31 @@ class GLPI:
             'App-Token': self.app_token,
             'Authorization': f'user_token {self.user_token}'
         }
+        self.http = http or build_http_session(pool_size)
+
+    def _is_session_error(self, response: requests.Response) -> bool:
+        """Check whether GLPI rejected the request because of the session token"""
+        if response.status_code == 401:
+            return True
+        if response.status_code == 400:
+            return any(code in response.text for code in SESSION_ERROR_CODES)
+        return False
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request on the pooled connection, re-authenticating once if the session expired"""
+        response = self.http.request(method, f"{self.url}/{path}", headers=self.headers, **kwargs)
+        if self.session_token and self._is_session_error(response):
+            logger.info("GLPI session expired, re-authenticating")
+            self.session_token = None
+            self.headers.pop('Session-Token', None)
+            if self.init_session():
+                response = self.http.request(method, f"{self.url}/{path}", headers=self.headers, **kwargs)
+        return response
 
     def init_session(self) -> bool:
         """Initialize a session with GLPI"""
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.url}/initSession",
                 headers=self.headers
             )
@@ -26,11 +205,11 @@ class GLPI:
             self.session_token = response.json().get('session_token')
             if self.session_token:
                 self.headers['Session-Token'] = self.session_token
-                logging.info("Session initialized successfully")
+                logger.info("Session initialized successfully")
                 return True
             return False
         except Exception as e:
-            logging.error(f"Failed to initialize GLPI session: {e}")
+            logger.error("Failed to initialize GLPI session: %s", e)
             return False
 
     def kill_session(self) -> bool:
@@ -38,16 +217,23 @@ class GLPI:
         if not self.session_token:
             return True
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.url}/killSession",
                 headers=self.headers
             )
             response.raise_for_status()
-            self.session_token = None
             return True
         except Exception as e:
-            logging.error(f"Failed to kill GLPI session: {e}")
+            logger.error("Failed to kill GLPI session: %s", e)
             return False
+        finally:
+            self.session_token = None
+            self.headers.pop('Session-Token', None)
+
+    def close(self):
+        """Kill the session and release pooled connections"""
+        self.kill_session()
+        self.http.close()
 
     def create_ticket(self, data: Dict) -> Dict:
         """Create a new ticket"""
@@ -60,10 +246,10 @@ class GLPI:
             if 'input' not in ticket_data:
                 ticket_data = {'input': data}
 
-            logging.info(f"Creating ticket with data: {ticket_data}")
-            response = requests.post(
-                f"{self.url}/Ticket",
-                headers=self.headers,
+            logger.debug("Creating ticket", extra={"payload": ticket_data})
+            response = self._request(
+                "POST",
+                "Ticket",
                 json=ticket_data
             )
             response.raise_for_status()
@@ -72,92 +258,89 @@ class GLPI:
                 return {"error": "Empty response from server"}
                 
             result = response.json()
-            logging.info(f"Create ticket result: {result}")
+            logger.info("Created ticket %s", result.get('id') if isinstance(result, dict) else result)
             return result
         except requests.exceptions.RequestException as e:
-            logging.error(f"Request error creating ticket: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                logging.error(f"Response content: {e.response.content}")
+            response = getattr(e, 'response', None)
+            logger.error("Request error creating ticket: %s", e,
+                         extra={"payload": response.content if response is not None else None})
             return {"error": str(e)}
         except Exception as e:
-            logging.error(f"Error creating ticket: {e}")
+            logger.error("Error creating ticket: %s", e)
             return {"error": str(e)}
 
-    def create_ticket_from_message(self, message: str, priority: int = 3) -> Dict:
+    def create_ticket_from_message(self, message: str, priority: int = 3,
+                                   classification: Optional[Classification] = None) -> Dict:
         """Create a ticket from a user message"""
         try:
-            # Extract location if mentioned
-            location = None
-            if "room" in message.lower():
-                room_match = re.search(r'room\s+(\d+)', message.lower())
-                if room_match:
-                    location = int(room_match.group(1))
-
-            # Extract category based on keywords
-            category = 0  # Default category
-            if any(word in message.lower() for word in ["printer", "printing", "scanner"]):
-                category = 1  # Printers & Scanners
-            elif any(word in message.lower() for word in ["monitor", "screen", "display"]):
-                category = 2  # Monitors & Displays
-            elif any(word in message.lower() for word in ["network", "internet", "wifi", "connection"]):
-                category = 3  # Network
-
-            # Create ticket data
-            title = message[:50] + ('...' if len(message) > 50 else '')
-            ticket_data = {
-                'name': title,
-                'content': message,
-                'priority': priority,
-                'type': 1,  # Incident
-                'status': 1,  # New
-                'itilcategories_id': category
-            }
-
-            # Add location if found
-            if location:
-                ticket_data['locations_id'] = location
-
-            logging.info(f"Creating ticket with data: {ticket_data}")
-            result = self.create_ticket(ticket_data)
-            logging.info(f"Create ticket result: {result}")
-            return result
+            ticket_data = build_ticket_from_message(message, priority, classification)
+            return self.create_ticket(ticket_data)
         except Exception as e:
-            logging.error(f"Error creating ticket from message: {e}")
+            logger.error("Error creating ticket from message: %s", e)
             return {"error": str(e)}
 
-    def get_tickets(self, filters: Optional[Dict] = None) -> List[Dict]:
-        """Get tickets based on filters"""
+    def _fetch_page(self, path: str, params: Dict) -> Tuple[List[Dict], Optional[int]]:
+        response = self._request(
+            "GET",
+            path,
+            params=params
+        )
+        if response.status_code == 400 and RANGE_EXCEEDED in response.text:
+            return [], None
+        response.raise_for_status()
+        return parse_ticket_page(path, response.json(), response.headers.get('Content-Range'))
+
+    def get_tickets(self, filters: Optional[Dict] = None, start: int = 0, limit: Optional[int] = None,
+                    fields: Optional[List[str]] = None, sort: Optional[str] = None,
+                    order: str = "DESC", criteria: Optional[List[Dict]] = None) -> List[Dict]:
+        """Get tickets based on filters.
+
+        ``start``/``limit`` select a GLPI range, ``fields`` projects the columns
+        returned, ``sort``/``order`` order server-side (e.g. ``sort="date_mod"``)
+        and ``criteria`` is a list of ``{'field', 'searchtype', 'value'}`` filters.
+        """
         if not self.session_token:
             return []
         try:
-            params = {'expand_dropdowns': True}
-            if filters:
-                params.update(filters)
-            
-            response = requests.get(
-                f"{self.url}/Ticket",
-                headers=self.headers,
-                params=params
-            )
-            response.raise_for_status()
-            return response.json()
+            path, params = build_ticket_query(filters, start, limit, fields, sort, order, criteria)
+            tickets, _ = self._fetch_page(path, params)
+            return tickets
         except Exception as e:
-            logging.error(f"Error fetching tickets: {e}")
+            logger.error("Error fetching tickets: %s", e)
             return []
 
+    def iter_tickets(self, page_size: int = 100, filters: Optional[Dict] = None,
+                     fields: Optional[List[str]] = None, sort: Optional[str] = "id",
+                     order: str = "ASC", criteria: Optional[List[Dict]] = None) -> Iterator[Dict]:
+        """Walk the whole ticket table page by page without holding it in memory"""
+        if not self.session_token:
+            return
+        start = 0
+        while True:
+            path, params = build_ticket_query(filters, start, page_size, fields, sort, order, criteria)
+            try:
+                page, total = self._fetch_page(path, params)
+            except Exception as e:
+                logger.error("Error fetching tickets %s-%s: %s", start, start + page_size - 1, e)
+                return
+            yield from page
+            start += len(page)
+            if len(page) < page_size or (total is not None and start >= total):
+                return
+
     def get_ticket_by_id(self, ticket_id: int) -> Dict:
         """Get a specific ticket by ID"""
         if not self.session_token:
             return {}
         try:
-            response = requests.get(
-                f"{self.url}/Ticket/{ticket_id}",
-                headers=self.headers
+            response = self._request(
+                "GET",
+                f"Ticket/{ticket_id}"
             )
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            logging.error(f"Error fetching ticket {ticket_id}: {e}")
+            logger.error("Error fetching ticket %s: %s", ticket_id, e)
             return {}
 
     def update_ticket(self, ticket_id: int, data: Dict) -> Dict:
@@ -165,13 +348,13 @@ class GLPI:
         if not self.session_token:
             return {"error": "No active session"}
         try:
-            response = requests.put(
-                f"{self.url}/Ticket/{ticket_id}",
-                headers=self.headers,
+            response = self._request(
+                "PUT",
+                f"Ticket/{ticket_id}",
                 json={'input': data}
             )
             response.raise_for_status()
             return response.json()
         except Exception as e:
-            logging.error(f"Error updating ticket {ticket_id}: {e}")
+            logger.error("Error updating ticket %s: %s", ticket_id, e)
             return {"error": str(e)}
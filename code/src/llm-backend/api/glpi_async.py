@@ -0,0 +1,435 @@
+import asyncio
+import httpx
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from glpi_api import (
+    BULK_CHUNK_SIZE, RANGE_EXCEEDED, SESSION_ERROR_CODES, build_ticket_from_message,
+    build_ticket_query, chunked, failed_bulk_results, parse_bulk_results, parse_ticket_page
+)
+from intent_classifier import Classification
+from metrics import GLPI_ERRORS, STAGE_SECONDS
+from shared_state import SharedStore
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Where worker processes publish the GLPI session token they share
+SESSION_NAMESPACE = "glpi_session"
+SESSION_TOKEN_TTL = 24 * 3600
+
+class AsyncGLPI:
+    """Non-blocking counterpart of glpi_api.GLPI built on httpx.AsyncClient.
+
+    When a ``cache`` is given, ticket reads are served from it and entries are
+    invalidated by ``create_ticket``/``update_ticket``. With a shared ``store``
+    the session token is published there, so worker processes reuse one GLPI
+    session instead of opening one each, and adopt the replacement when one
+    of them re-authenticates.
+    """
+
+    def __init__(self, url: str, apptoken: str, usertoken: str,
+                 http: Optional[httpx.AsyncClient] = None,
+                 max_connections: int = 10, timeout: float = 10.0,
+                 cache: Optional[TTLCache] = None, list_ttl: float = 15.0,
+                 store: Optional[SharedStore] = None):
+        self.url = url
+        self.app_token = apptoken
+        self.user_token = usertoken
+        self.session_token = None
+        self.headers = {
+            'App-Token': self.app_token,
+            'Authorization': f'user_token {self.user_token}'
+        }
+        self.http = http or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=timeout
+        )
+        self._auth_lock = asyncio.Lock()
+        # Bulk chunks beyond the pool size would only queue for a connection and risk pool timeouts
+        self._bulk_slots = asyncio.Semaphore(max_connections)
+        self.cache = cache
+        self.list_ttl = list_ttl
+        self.store = store if store is not None and store.shared else None
+
+    def _invalidate(self, ticket_id: Optional[int] = None):
+        """Drop cached ticket listings and, if given, the cached ticket itself"""
+        if self.cache is None:
+            return
+        if ticket_id is not None:
+            self.cache.discard(("ticket", int(ticket_id)))
+            self.cache.discard(("ticket_changes", int(ticket_id)))
+        self.cache.discard_matching(lambda key: key[0] == "tickets")
+
+    def _is_session_error(self, response: httpx.Response) -> bool:
+        """Check whether GLPI rejected the request because of the session token"""
+        if response.status_code == 401:
+            return True
+        if response.status_code == 400:
+            return any(code in response.text for code in SESSION_ERROR_CODES)
+        return False
+
+    async def _adopt_shared_session(self, stale_token: Optional[str] = None) -> bool:
+        """Use the session token another worker published, unless it is the one that just failed"""
+        if self.store is None:
+            return False
+        token = await asyncio.to_thread(self.store.get, SESSION_NAMESPACE, "token")
+        if not token or token == stale_token:
+            return False
+        self.session_token = token
+        self.headers['Session-Token'] = token
+        logger.info("Reusing shared GLPI session")
+        return True
+
+    async def _reauthenticate(self, stale_token: Optional[str]) -> bool:
+        """Open a new session unless a concurrent caller already replaced the stale one"""
+        async with self._auth_lock:
+            if self.session_token and self.session_token != stale_token:
+                return True
+            if await self._adopt_shared_session(stale_token):
+                return True
+            logger.info("GLPI session expired, re-authenticating")
+            self.session_token = None
+            self.headers.pop('Session-Token', None)
+            return await self._open_session(stale_token)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request on the pooled connection, re-authenticating once if the session expired"""
+        token = self.session_token
+        try:
+            response = await self.http.request(method, f"{self.url}/{path}", headers=self.headers, **kwargs)
+            if token and self._is_session_error(response):
+                if await self._reauthenticate(token):
+                    response = await self.http.request(method, f"{self.url}/{path}", headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            GLPI_ERRORS.inc()
+            raise
+        if response.status_code >= 400 and RANGE_EXCEEDED not in response.text:
+            GLPI_ERRORS.inc()
+        return response
+
+    async def _open_session(self, stale_token: Optional[str] = None) -> bool:
+        try:
+            with STAGE_SECONDS.time("glpi_init_session"):
+                response = await self.http.get(
+                    f"{self.url}/initSession",
+                    headers=self.headers
+                )
+            response.raise_for_status()
+            self.session_token = response.json().get('session_token')
+            if self.session_token:
+                self.headers['Session-Token'] = self.session_token
+                if self.store is not None:
+                    await self._publish_session(stale_token)
+                logger.info("Session initialized successfully")
+                return True
+            return False
+        except Exception as e:
+            GLPI_ERRORS.inc()
+            logger.error("Failed to initialize GLPI session: %s", e)
+            return False
+
+    async def _publish_session(self, stale_token: Optional[str]):
+        """Share the new session, or switch to the one another worker opened at the same time"""
+        winner = await asyncio.to_thread(
+            self.store.claim, SESSION_NAMESPACE, "token", self.session_token, SESSION_TOKEN_TTL, stale_token
+        )
+        if winner == self.session_token:
+            return
+        try:
+            await self.http.get(f"{self.url}/killSession", headers=self.headers)
+        except httpx.HTTPError as e:
+            logger.warning("Failed to kill duplicate GLPI session: %s", e)
+        self.session_token = winner
+        self.headers['Session-Token'] = winner
+
+    async def init_session(self) -> bool:
+        """Initialize a session with GLPI"""
+        async with self._auth_lock:
+            if self.session_token or await self._adopt_shared_session():
+                return True
+            return await self._open_session()
+
+    async def kill_session(self) -> bool:
+        """Kill the current session"""
+        if not self.session_token:
+            return True
+        try:
+            with STAGE_SECONDS.time("glpi_kill_session"):
+                response = await self.http.get(
+                    f"{self.url}/killSession",
+                    headers=self.headers
+                )
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            GLPI_ERRORS.inc()
+            logger.error("Failed to kill GLPI session: %s", e)
+            return False
+        finally:
+            self.session_token = None
+            self.headers.pop('Session-Token', None)
+
+    async def close(self, keep_session: bool = False):
+        """Kill the session (unless other workers still share it) and release pooled connections"""
+        if keep_session:
+            self.session_token = None
+            self.headers.pop('Session-Token', None)
+        else:
+            await self.kill_session()
+            if self.store is not None:
+                await asyncio.to_thread(self.store.delete, SESSION_NAMESPACE, "token")
+        await self.http.aclose()
+
+    async def create_ticket(self, data: Dict) -> Dict:
+        """Create a new ticket"""
+        if not self.session_token:
+            return {"error": "No active session"}
+
+        try:
+            # Make sure data is formatted correctly
+            ticket_data = data
+            if 'input' not in ticket_data:
+                ticket_data = {'input': data}
+
+            logger.debug("Creating ticket", extra={"payload": ticket_data})
+            response = await self._request(
+                "POST",
+                "Ticket",
+                json=ticket_data
+            )
+            response.raise_for_status()
+
+            if not response.content:
+                return {"error": "Empty response from server"}
+
+            result = response.json()
+            logger.info("Created ticket %s", result.get('id') if isinstance(result, dict) else result)
+            self._invalidate()
+            return result
+        except httpx.HTTPStatusError as e:
+            logger.error("Request error creating ticket: %s", e, extra={"payload": e.response.content})
+            return {"error": str(e)}
+        except Exception as e:
+            logger.error("Error creating ticket: %s", e)
+            return {"error": str(e)}
+
+    async def _send_chunk(self, method: str, action: str, offset: int, chunk: List[Dict]) -> List[Dict]:
+        try:
+            async with self._bulk_slots:
+                response = await self._request(method, "Ticket", json={'input': chunk})
+            body = response.json() if response.content else None
+            return parse_bulk_results(action, chunk, offset, response.status_code, body)
+        except Exception as e:
+            logger.error("Error in bulk ticket %s of items %s-%s: %s", action, offset, offset + len(chunk) - 1, e)
+            return failed_bulk_results(chunk, offset, str(e))
+
+    async def _send_bulk(self, method: str, action: str, items: List[Dict], chunk_size: int) -> List[Dict]:
+        if not self.session_token:
+            return failed_bulk_results(items, 0, "No active session")
+        # Chunks are independent, so they share the connection pool concurrently (at most pool-size at once)
+        chunk_results = await asyncio.gather(*[
+            self._send_chunk(method, action, offset, chunk)
+            for offset, chunk in chunked(items, chunk_size)
+        ])
+        return [result for results in chunk_results for result in results]
+
+    async def create_tickets_bulk(self, tickets: List[Dict], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict]:
+        """Create many tickets with one POST per chunk.
+
+        Returns one ``{"index", "id", "ok", "error"}`` result per input ticket,
+        in input order.
+        """
+        results = await self._send_bulk("POST", "create", tickets, chunk_size)
+        if any(result["ok"] for result in results):
+            self._invalidate()
+        return results
+
+    async def update_tickets_bulk(self, updates: List[Dict], chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict]:
+        """Update many tickets with one PUT per chunk; each update must carry the ticket ``id``"""
+        results = await self._send_bulk("PUT", "update", updates, chunk_size)
+        for result in results:
+            if result["ok"] and self.cache is not None:
+                self.cache.discard(("ticket", int(result["id"])))
+        if any(result["ok"] for result in results):
+            self._invalidate()
+        return results
+
+    async def create_ticket_from_message(self, message: str, priority: int = 3,
+                                         classification: Optional[Classification] = None) -> Dict:
+        """Create a ticket from a user message"""
+        try:
+            ticket_data = build_ticket_from_message(message, priority, classification)
+            return await self.create_ticket(ticket_data)
+        except Exception as e:
+            logger.error("Error creating ticket from message: %s", e)
+            return {"error": str(e)}
+
+    async def _fetch_page(self, path: str, params: Dict) -> Tuple[List[Dict], Optional[int]]:
+        response = await self._request(
+            "GET",
+            path,
+            params=params
+        )
+        if response.status_code == 400 and RANGE_EXCEEDED in response.text:
+            return [], None
+        response.raise_for_status()
+        return parse_ticket_page(path, response.json(), response.headers.get('Content-Range'))
+
+    async def get_tickets(self, filters: Optional[Dict] = None, start: int = 0, limit: Optional[int] = None,
+                          fields: Optional[List[str]] = None, sort: Optional[str] = None,
+                          order: str = "DESC", criteria: Optional[List[Dict]] = None) -> List[Dict]:
+        """Get tickets based on filters (see GLPI.get_tickets for the paging options)"""
+        if not self.session_token:
+            return []
+        try:
+            path, params = build_ticket_query(filters, start, limit, fields, sort, order, criteria)
+
+            cache_key = ("tickets", path, tuple(sorted((k, str(v)) for k, v in params.items())))
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            tickets, _ = await self._fetch_page(path, params)
+            if self.cache is not None and tickets:
+                self.cache.set(cache_key, tickets, ttl=self.list_ttl)
+            return tickets
+        except Exception as e:
+            logger.error("Error fetching tickets: %s", e)
+            return []
+
+    async def iter_tickets(self, page_size: int = 100, filters: Optional[Dict] = None,
+                           fields: Optional[List[str]] = None, sort: Optional[str] = "id",
+                           order: str = "ASC", criteria: Optional[List[Dict]] = None) -> AsyncIterator[Dict]:
+        """Walk the whole ticket table page by page without holding it in memory"""
+        if not self.session_token:
+            return
+        start = 0
+        while True:
+            path, params = build_ticket_query(filters, start, page_size, fields, sort, order, criteria)
+            try:
+                page, total = await self._fetch_page(path, params)
+            except Exception as e:
+                logger.error("Error fetching tickets %s-%s: %s", start, start + page_size - 1, e)
+                return
+            for ticket in page:
+                yield ticket
+            start += len(page)
+            if len(page) < page_size or (total is not None and start >= total):
+                return
+
+    async def get_itil_categories(self) -> List[Dict]:
+        """Get the ITIL categories used to classify new tickets"""
+        if not self.session_token:
+            return []
+        try:
+            response = await self._request(
+                "GET",
+                "ITILCategory",
+                params={'range': '0-999'}
+            )
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error("Error fetching ITIL categories: %s", e)
+            return []
+
+    async def get_knowbase_items(self, start: int = 0, limit: int = 100) -> List[Dict]:
+        """Get knowledge base articles, most recently modified first.
+
+        Errors are raised rather than returned as an empty page, which a
+        pager would take for the end of the list.
+        """
+        if not self.session_token:
+            raise RuntimeError("No active GLPI session")
+        page, _ = await self._fetch_page("KnowbaseItem", {
+            'range': f"{start}-{start + limit - 1}",
+            'sort': 'date_mod',
+            'order': 'DESC'
+        })
+        return page
+
+    async def get_changes(self, start: int = 0, limit: int = 100) -> List[Dict]:
+        """Get changes, most recently modified first; errors are raised (see get_knowbase_items)"""
+        if not self.session_token:
+            raise RuntimeError("No active GLPI session")
+        page, _ = await self._fetch_page("Change", {
+            'range': f"{start}-{start + limit - 1}",
+            'sort': 'date_mod',
+            'order': 'DESC'
+        })
+        return page
+
+    async def get_change_links(self, start: int = 0, limit: int = 100) -> List[Dict]:
+        """Get change-ticket links (glpi_changes_tickets), newest first; errors are raised (see get_knowbase_items)"""
+        if not self.session_token:
+            raise RuntimeError("No active GLPI session")
+        page, _ = await self._fetch_page("Change_Ticket", {
+            'range': f"{start}-{start + limit - 1}",
+            'sort': 'id',
+            'order': 'DESC'
+        })
+        return page
+
+    async def get_ticket_changes(self, ticket_id: int) -> List[Dict]:
+        """Get the changes linked to a ticket (glpi_changes_tickets), with change names expanded"""
+        if not self.session_token:
+            return []
+        try:
+            cache_key = ("ticket_changes", int(ticket_id))
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            changes, _ = await self._fetch_page(f"Ticket/{ticket_id}/Change_Ticket", {'expand_dropdowns': True})
+            if self.cache is not None and changes:
+                self.cache.set(cache_key, changes, ttl=self.list_ttl)
+            return changes
+        except Exception as e:
+            logger.error("Error fetching changes of ticket %s: %s", ticket_id, e)
+            return []
+
+    async def get_ticket_by_id(self, ticket_id: int) -> Dict:
+        """Get a specific ticket by ID"""
+        if not self.session_token:
+            return {}
+        try:
+            cache_key = ("ticket", int(ticket_id))
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
+            response = await self._request(
+                "GET",
+                f"Ticket/{ticket_id}"
+            )
+            response.raise_for_status()
+            ticket = response.json()
+            if self.cache is not None and ticket:
+                self.cache.set(cache_key, ticket)
+            return ticket
+        except Exception as e:
+            logger.error("Error fetching ticket %s: %s", ticket_id, e)
+            return {}
+
+    async def update_ticket(self, ticket_id: int, data: Dict) -> Dict:
+        """Update an existing ticket"""
+        if not self.session_token:
+            return {"error": "No active session"}
+        try:
+            response = await self._request(
+                "PUT",
+                f"Ticket/{ticket_id}",
+                json={'input': data}
+            )
+            response.raise_for_status()
+            self._invalidate(ticket_id)
+            return response.json()
+        except Exception as e:
+            logger.error("Error updating ticket %s: %s", ticket_id, e)
+            return {"error": str(e)}
@@ -24,7 +24,7 @@ class GLPIConfig:
             logger.error("GLPI_USER_TOKEN environment variable not set")
             raise ValueError("GLPI_USER_TOKEN environment variable not set")
         
-        logger.info(f"GLPI Configuration loaded. URL: {self.url}")
+        logger.info("GLPI Configuration loaded. URL: %s", self.url)
 
     def get_config(self) -> Dict[str, str]:
         return {
@@ -0,0 +1,104 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+from glpi_async import AsyncGLPI
+from shared_state import SharedStore
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the per-worker leases that mark who still uses the shared GLPI session
+MEMBER_LEASE = "glpi_session_user:"
+
+class AsyncGLPISessionManager:
+    """Process-wide owner of a single long-lived GLPI session for the FastAPI app.
+
+    The session token and the pooled keep-alive connections are shared by
+    every request; the client re-authenticates on its own when GLPI expires
+    the token. With a shared ``store`` all worker processes use one GLPI
+    session and the last worker to shut down kills it. Each worker holds a
+    lease for ``member_ttl`` seconds, renewed as it uses the client, so a
+    worker that was killed without shutting down stops counting once its
+    lease lapses.
+    """
+
+    def __init__(self, config: Dict[str, str], max_connections: int = 10,
+                 cache: Optional[TTLCache] = None, list_ttl: float = 15.0,
+                 store: Optional[SharedStore] = None, retry_interval: float = 10.0,
+                 member_ttl: float = 300.0):
+        self._config = config
+        self._max_connections = max_connections
+        self.cache = cache
+        self._list_ttl = list_ttl
+        self._store = store if store is not None and store.shared else None
+        self._retry_interval = retry_interval
+        self._member_ttl = member_ttl
+        self._member_renew_at = 0.0
+        self._client: Optional[AsyncGLPI] = None
+        self._lock = asyncio.Lock()
+        self._opening: Optional[asyncio.Future] = None
+        self._retry_at = 0.0
+
+    async def get_client(self) -> Optional[AsyncGLPI]:
+        """Return the shared client, opening a session on first use.
+
+        Concurrent callers share one initSession attempt. After a failed
+        attempt callers get None straight away for ``retry_interval`` seconds,
+        so requests do not queue behind login timeouts while GLPI is down.
+        """
+        async with self._lock:
+            if self._client is None:
+                self._client = AsyncGLPI(
+                    **self._config,
+                    max_connections=self._max_connections,
+                    cache=self.cache,
+                    list_ttl=self._list_ttl,
+                    store=self._store
+                )
+            client = self._client
+        if self._store is not None and time.monotonic() >= self._member_renew_at:
+            await self._renew_membership()
+        if client.session_token:
+            return client
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._opening is None:
+            self._opening = asyncio.ensure_future(self._open_session(client))
+        # Shielded so a caller that gives up (e.g. at its deadline) does not cancel it for the others
+        return client if await asyncio.shield(self._opening) else None
+
+    @property
+    def _member_lease(self) -> str:
+        return MEMBER_LEASE + self._store.owner
+
+    async def _renew_membership(self):
+        """Extend this worker's lease once half of it has run out"""
+        self._member_renew_at = time.monotonic() + self._member_ttl / 2
+        try:
+            await asyncio.to_thread(self._store.acquire_lease, self._member_lease, self._member_ttl)
+        except Exception as e:
+            self._member_renew_at = 0.0
+            logger.warning("Could not renew GLPI session membership: %s", e)
+
+    async def _open_session(self, client: AsyncGLPI) -> bool:
+        try:
+            if await client.init_session():
+                return True
+            self._retry_at = time.monotonic() + self._retry_interval
+            logger.error("Could not open a GLPI session; retrying in %ss", self._retry_interval)
+            return False
+        finally:
+            self._opening = None
+
+    async def close(self):
+        """Kill the shared session and drop pooled connections"""
+        async with self._lock:
+            if self._client is not None:
+                others = 0
+                if self._store is not None:
+                    await asyncio.to_thread(self._store.release_lease, self._member_lease)
+                    others = await asyncio.to_thread(self._store.count_leases, MEMBER_LEASE)
+                await self._client.close(keep_session=others > 0)
+                self._client = None
+                logger.info("GLPI session left open for other workers" if others > 0 else "GLPI session closed")
@@ -0,0 +1,49 @@
+"""
+Production serving: gunicorn master with uvicorn worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The master imports the heavy libraries once before forking, so workers
+start quickly and share those pages copy-on-write. The app itself is
+imported in each worker after the fork (no ``preload_app``) because main.py
+opens SQLite connections, memory maps and HTTP pools that must not be
+shared across processes. Workers coordinate through the SQLite file at
+SHARED_STATE_PATH.
+
+Graceful restart (new workers start before old ones finish their requests):
+``kill -HUP $(cat server.pid)``. Graceful stop: ``kill -TERM``.
+"""
+
+import os
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+try:
+    import uvicorn_worker  # noqa: F401
+    worker_class = "uvicorn_worker.UvicornWorker"
+except ImportError:
+    worker_class = "uvicorn.workers.UvicornWorker"
+pidfile = os.getenv('PID_FILE', 'server.pid')
+
+# Streamed generations can run for minutes; give them time to finish on reload/stop
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '120'))
+timeout = int(os.getenv('WORKER_TIMEOUT', '180'))
+keepalive = 5
+# Recycle workers now and then to bound memory growth; 0 disables
+max_requests = int(os.getenv('MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+preload_app = False
+
+# Workers only share state through these
+os.environ.setdefault('SHARED_STATE_PATH', os.path.abspath('shared_state.db'))
+os.environ.setdefault('CONVERSATION_STORE', 'sqlite')
+
+# Pre-load heavy imports in the master before workers are forked
+import numpy  # noqa: E402,F401
+import httpx  # noqa: E402,F401
+import fastapi  # noqa: E402,F401
+import pydantic  # noqa: E402,F401
+import langchain.llms  # noqa: E402,F401
+import langchain.chains  # noqa: E402,F401
@@ -0,0 +1,165 @@
+import re
+import logging
+from typing import Dict, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Words that make a chat message ticket-related
+TICKET_WORDS = ["ticket", "issue", "problem"]
+
+INTENT_WORDS = {
+    "create": ["create", "new", "open"],
+    "show": ["show", "get", "find", "search"],
+}
+
+# Matched phrase -> GLPI priority; "high" wins over "low" when both appear
+PRIORITY_PHRASES = {
+    "high priority": 4,
+    "urgent": 4,
+    "low priority": 2,
+}
+DEFAULT_PRIORITY = 3
+
+CATEGORY_WORDS = {
+    "printers": ["printer", "printing", "scanner"],
+    "monitors": ["monitor", "screen", "display"],
+    "network": ["network", "internet", "wifi", "connection"],
+}
+# Used until the ITIL categories have been loaded from GLPI
+DEFAULT_CATEGORY_IDS = {
+    "printers": 1,  # Printers & Scanners
+    "monitors": 2,  # Monitors & Displays
+    "network": 3,   # Network
+}
+
+class Classification(NamedTuple):
+    is_ticket_query: bool
+    intent: Optional[str]
+    priority: int
+    category: Optional[str]
+    category_id: int
+    location: Optional[int]
+    ticket_id: Optional[int]
+
+class IntentClassifier:
+    """Single-pass keyword classifier for chat messages.
+
+    Every keyword (ticket words, intents, priorities, categories and the
+    "room" trigger) is compiled into one alternation, longest keyword first,
+    and the lowercased message is scanned once with it. The ticket
+    reference and room-number patterns only run when their trigger is
+    present, so the cost does not grow with the number of keywords.
+
+    Results match the legacy ``any(word in message.lower() ...)`` scans
+    except where noted:
+
+    * Keywords match at the start of a word, with any ending: "networking",
+      "urgently" and "tickets" still count, but "renew" is not "new",
+      "forget" is not "get", "reopen" is not "open" and "touchscreen" is
+      not "screen".
+    * ``ticket_id`` is read from a "#123" reference whatever the intent,
+      so "what is the status of ticket #12?" looks the ticket up.
+    * ``priority`` is set from the message whatever the intent; it is only
+      used when a ticket is created.
+    """
+
+    _TICKET_REF = re.compile(r"#(\d+)")
+    _ROOM = re.compile(r"room\s+(\d+)")
+
+    def __init__(self, category_ids: Optional[Dict[str, int]] = None):
+        self.category_ids = dict(category_ids or DEFAULT_CATEGORY_IDS)
+        keywords: Dict[str, tuple] = {}
+        for word in TICKET_WORDS:
+            keywords[word] = ("ticket", True)
+        for intent, words in INTENT_WORDS.items():
+            for word in words:
+                keywords[word] = ("intent", intent)
+        for phrase, priority in PRIORITY_PHRASES.items():
+            # Multi-word phrases are triggered by their last word and then checked in full
+            keywords[phrase.split()[-1]] = ("priority", None) if " " in phrase else ("priority", priority)
+        for category, words in CATEGORY_WORDS.items():
+            for word in words:
+                keywords[word] = ("category", category)
+        keywords["room"] = ("room", None)
+
+        self._vocabulary = keywords
+        self._keywords = re.compile(r"\b(?:%s)" % "|".join(
+            re.escape(word) for word in sorted(keywords, key=len, reverse=True)
+        ))
+        self._phrases = [(phrase, priority) for phrase, priority in PRIORITY_PHRASES.items() if " " in phrase]
+        self._category_rank = {category: rank for rank, category in enumerate(CATEGORY_WORDS)}
+
+    def classify(self, message: str) -> Classification:
+        text = message.lower()
+        hits = set(self._keywords.findall(text))
+
+        is_ticket_query = False
+        intents = set()
+        priority = None
+        category = None
+        location = None
+        ticket_id = None
+
+        for word in hits:
+            kind, value = self._vocabulary[word]
+            if kind == "ticket":
+                is_ticket_query = True
+            elif kind == "intent":
+                intents.add(value)
+            elif kind == "priority":
+                if value is None:
+                    for phrase, phrase_priority in self._phrases:
+                        if phrase in text:
+                            priority = max(priority or 0, phrase_priority)
+                else:
+                    priority = max(priority or 0, value)
+            elif kind == "category":
+                # Keep the original precedence: printers, then monitors, then network
+                if category is None or self._category_rank[value] < self._category_rank[category]:
+                    category = value
+            elif kind == "room":
+                room_match = self._ROOM.search(text)
+                if room_match:
+                    location = int(room_match.group(1))
+
+        if "#" in text:
+            ticket_match = self._TICKET_REF.search(text)
+            if ticket_match:
+                ticket_id = int(ticket_match.group(1))
+
+        # Creation takes precedence over lookup, as in the original keyword scans
+        intent = "create" if "create" in intents else ("show" if "show" in intents else None)
+        return Classification(
+            is_ticket_query,
+            intent,
+            priority or DEFAULT_PRIORITY,
+            category,
+            self.category_ids.get(category, 0) if category else 0,
+            location,
+            ticket_id,
+        )
+
+    def load_categories(self, categories: Iterable[Dict]) -> Dict[str, int]:
+        """Map keyword categories onto GLPI ITIL categories by name.
+
+        ``categories`` are ITILCategory rows from the GLPI API; the first
+        category whose (complete) name mentions one of a group's keywords wins.
+        Groups with no match keep their current ID.
+        """
+        mapping = dict(self.category_ids)
+        matched: Dict[str, int] = {}
+        for row in categories:
+            name = row.get("completename") or row.get("name") or ""
+            found = self.classify(name).category
+            if found and found not in matched:
+                matched[found] = int(row["id"])
+        mapping.update(matched)
+        self.category_ids = mapping
+        logger.info("ITIL category mapping: %s", mapping)
+        return mapping
+
+# Shared instance used by the API and ticket creation
+classifier = IntentClassifier()
+
+def classify(message: str) -> Classification:
+    return classifier.classify(message)
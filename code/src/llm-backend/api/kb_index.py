@@ -0,0 +1,329 @@
+import os
+import re
+import json
+import html
+import zlib
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its me my
+no not of on or our please so that the their there this to was what when where
+which who why will with you your
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_TAG = re.compile(r"<[^>]+>")
+
+def clean_text(text: str) -> str:
+    """Strip the HTML GLPI stores in KB answers"""
+    return " ".join(_TAG.sub(" ", html.unescape(html.unescape(text or ""))).split())
+
+class HashingEmbedder:
+    """CPU-only, dependency-free text embedder.
+
+    Unigrams and bigrams are hashed (CRC32, stable across processes) into a
+    fixed number of signed buckets with sublinear term frequency, then
+    L2-normalised so a dot product is the cosine similarity.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 2048):
+        self.dim = dim
+
+    def _features(self, text: str) -> Dict[int, float]:
+        words = [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+        counts: Dict[int, float] = {}
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(term.encode())
+            bucket = h % self.dim
+            counts[bucket] = counts.get(bucket, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+        return counts
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for bucket, count in self._features(text).items():
+                matrix[row, bucket] = np.sign(count) * (1.0 + np.log(abs(count))) if count else 0.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model, used when EMBEDDING_MODEL is set and the package is installed"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+def create_embedder():
+    model_name = os.getenv('EMBEDDING_MODEL')
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            logger.warning("Embedding model %s unavailable, using hashing embedder: %s", model_name, e)
+    return HashingEmbedder(int(os.getenv('KB_EMBEDDING_DIM', '2048')))
+
+def chunk_article(item: Dict, words_per_chunk: int = 120, overlap: int = 20) -> List[str]:
+    """Split a KB article into overlapping word windows, each prefixed with the title"""
+    name = clean_text(item.get('name', ''))
+    words = clean_text(item.get('answer', '')).split()
+    if not words:
+        return [name] if name else []
+    step = max(1, words_per_chunk - overlap)
+    return [
+        f"{name}. " + " ".join(words[start:start + words_per_chunk])
+        for start in range(0, max(1, len(words) - overlap), step)
+    ]
+
+class KBIndex:
+    """Vector index over glpi_knowbaseitems for prompt context.
+
+    Chunk vectors live in a memory-mapped float32 matrix (``vectors.f32``) that
+    grows by doubling; chunk metadata and the ``date_mod`` high-water mark
+    live in ``meta.json``. ``update`` re-embeds only articles modified since
+    the last run and tombstones their old chunks; ``search`` scores a batch of
+    queries with one matrix product.
+
+    With several worker processes one of them writes (``update``) and the
+    others call ``reload`` to pick up its changes. Files are only ever
+    replaced, never rewritten in place under rows a reader may have mapped.
+    """
+
+    def __init__(self, directory: str, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or create_embedder()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self.chunks: List[Dict] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.last_date_mod = ""
+        self.capacity = 0
+        self.vectors: Optional[np.ndarray] = None
+        self._loaded_mtime = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self._meta_path):
+            return
+        self._loaded_mtime = os.path.getmtime(self._meta_path)
+        with open(self._meta_path) as f:
+            meta = json.load(f)
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim:
+            logger.info("KB index was built with a different embedder, rebuilding")
+            return
+        self.chunks = meta["chunks"]
+        self.alive = np.array([c.pop("alive", True) for c in self.chunks], dtype=bool)
+        self.last_date_mod = meta.get("last_date_mod", "")
+        self.capacity = meta["capacity"]
+        if self.capacity:
+            self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                     shape=(self.capacity, self.embedder.dim))
+
+    def _save(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+        meta = {
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "capacity": self.capacity,
+            "last_date_mod": self.last_date_mod,
+            "chunks": [dict(c, alive=bool(a)) for c, a in zip(self.chunks, self.alive)],
+        }
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+        self._loaded_mtime = os.path.getmtime(self._meta_path)
+
+    def reload(self) -> bool:
+        """Re-read the index if another process saved a newer version; returns whether it did"""
+        try:
+            mtime = os.path.getmtime(self._meta_path)
+        except FileNotFoundError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        with self._lock:
+            self.chunks = []
+            self.alive = np.zeros(0, dtype=bool)
+            self.last_date_mod = ""
+            self.capacity = 0
+            self.vectors = None
+            self._load()
+        logger.info("Reloaded KB index (%s chunks)", int(self.alive.sum()))
+        return True
+
+    def _ensure_capacity(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 256)
+        tmp = self._vectors_path + ".tmp"
+        grown = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(capacity, self.embedder.dim))
+        if self.vectors is not None:
+            grown[:len(self.chunks)] = self.vectors[:len(self.chunks)]
+        grown.flush()
+        del grown
+        os.replace(tmp, self._vectors_path)
+        self.capacity = capacity
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(capacity, self.embedder.dim))
+
+    def _compact(self):
+        """Drop tombstoned chunks once they outnumber live ones"""
+        keep = np.flatnonzero(self.alive)
+        tmp = self._vectors_path + ".tmp"
+        compacted = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(self.capacity, self.embedder.dim))
+        compacted[:len(keep)] = self.vectors[keep]
+        compacted.flush()
+        del compacted
+        os.replace(tmp, self._vectors_path)
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(self.capacity, self.embedder.dim))
+        self.chunks = [self.chunks[i] for i in keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+
+    def update(self, items: Iterable[Dict]) -> int:
+        """Index new or modified articles; returns the number of articles (re)embedded.
+
+        Articles at the high-water mark are considered too, since several can
+        share the same ``date_mod`` second; they are upserted by id and only
+        re-embedded when their ``date_mod`` differs from the indexed one.
+        """
+        with self._lock:
+            indexed = {c["item_id"]: c.get("date_mod") for c, alive in zip(self.chunks, self.alive) if alive}
+        changed = [
+            item for item in items
+            if (not self.last_date_mod or str(item.get('date_mod') or "") >= self.last_date_mod)
+            and indexed.get(int(item['id'])) != str(item.get('date_mod') or "")
+        ]
+        if not changed:
+            return 0
+
+        new_chunks: List[Dict] = []
+        texts: List[str] = []
+        for item in changed:
+            for text in chunk_article(item):
+                new_chunks.append({"item_id": int(item['id']), "name": clean_text(item.get('name', '')),
+                                   "date_mod": str(item.get('date_mod') or ""), "text": text})
+                texts.append(text)
+        embedded = self.embedder.embed(texts) if texts else np.zeros((0, self.embedder.dim), np.float32)
+
+        with self._lock:
+            changed_ids = {int(item['id']) for item in changed}
+            for i, chunk in enumerate(self.chunks):
+                if chunk["item_id"] in changed_ids:
+                    self.alive[i] = False
+            start = len(self.chunks)
+            self._ensure_capacity(start + len(new_chunks))
+            self.vectors[start:start + len(new_chunks)] = embedded
+            self.chunks.extend(new_chunks)
+            self.alive = np.concatenate([self.alive, np.ones(len(new_chunks), dtype=bool)])
+            self.last_date_mod = max([self.last_date_mod] + [str(i.get('date_mod') or "") for i in changed])
+            if (~self.alive).sum() > max(256, self.alive.sum()):
+                self._compact()
+            self._save()
+        logger.info("Indexed %s KB articles (%s chunks)", len(changed), len(new_chunks))
+        return len(changed)
+
+    def search(self, queries: List[str], k: int = 3, min_score: float = 0.15) -> List[List[Tuple[float, Dict]]]:
+        """Top-k chunks for each query, at most one chunk per article"""
+        with self._lock:
+            count = len(self.chunks)
+            if not count or not queries:
+                return [[] for _ in queries]
+            scores = self.embedder.embed(queries) @ self.vectors[:count].T
+            scores[:, ~self.alive[:count]] = -1.0
+            chunks = self.chunks
+
+        results = []
+        # Over-fetch so duplicates from the same article can be skipped
+        fetch = min(count, k * 4)
+        top = np.argpartition(-scores, fetch - 1, axis=1)[:, :fetch]
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            hits, seen = [], set()
+            for idx in ordered:
+                score = float(scores[row, idx])
+                if score < min_score or len(hits) == k:
+                    break
+                if chunks[idx]["item_id"] in seen:
+                    continue
+                seen.add(chunks[idx]["item_id"])
+                hits.append((score, chunks[idx]))
+            results.append(hits)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "articles": len({c["item_id"] for c, a in zip(self.chunks, self.alive) if a}),
+            "chunks": int(self.alive.sum()),
+            "embedder": self.embedder.name,
+            "last_date_mod": self.last_date_mod,
+        }
+
+def _split_sql_values(values: str) -> Iterator[List[Optional[str]]]:
+    """Parse the ``(..),(..)`` tuples of a mysqldump INSERT statement"""
+    escapes = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', 'Z': '\x1a'}
+    row: List[Optional[str]] = []
+    i, n = 0, len(values)
+    while i < n:
+        ch = values[i]
+        if ch == "'":
+            buf = []
+            i += 1
+            while values[i] != "'":
+                if values[i] == "\\":
+                    i += 1
+                    buf.append(escapes.get(values[i], values[i]))
+                else:
+                    buf.append(values[i])
+                i += 1
+            row.append("".join(buf))
+            i += 1
+        elif ch in "(, \n":
+            i += 1
+        elif ch == ")":
+            yield row
+            row = []
+            i += 1
+        elif ch == ";":
+            return
+        else:
+            end = i
+            while values[end] not in ",)":
+                end += 1
+            token = values[i:end]
+            row.append(None if token == "NULL" else token)
+            i = end
+
+def read_kb_dump(path: str) -> List[Dict]:
+    """Read glpi_knowbaseitems rows from a mysqldump file such as knowledge_base_backup.sql"""
+    with open(path, encoding="utf-8") as f:
+        dump = f.read()
+    table = re.search(r"CREATE TABLE `glpi_knowbaseitems` \((.*?)\n\)", dump, re.S)
+    columns = re.findall(r"^\s*`(\w+)`", table.group(1), re.M)
+    items = []
+    for insert in re.finditer(r"INSERT INTO `glpi_knowbaseitems` VALUES (.*?);\n", dump, re.S):
+        for row in _split_sql_values(insert.group(1) + ";"):
+            items.append(dict(zip(columns, row)))
+    return items
+
+def format_kb_context(hits: List[Tuple[float, Dict]], max_chars: int = 600) -> str:
+    return "\n".join(
+        f"[KB #{chunk['item_id']}] {chunk['text'][:max_chars]}"
+        for _, chunk in hits
+    )
@@ -0,0 +1,91 @@
+import os
+import logging
+from typing import Optional
+import httpx
+
+# LangChain imports
+from langchain.llms import Ollama
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.manager import CallbackManager
+
+logger = logging.getLogger(__name__)
+token_logger = logging.getLogger(__name__ + ".tokens")
+
+CHAT_TEMPLATE = """Assistant: I'm an IT support assistant with access to GLPI ticket system.
+
+        GLPI Context: {glpi_context}
+        Knowledge Base: {kb_context}
+        Chat History: {history}
+        User Message: {message}
+
+        Keep responses brief and direct. If ticket information is available, reference it specifically.
+        If a knowledge base article applies, base your answer on it and cite it as [KB #id]."""
+
+class TokenLogHandler(BaseCallbackHandler):
+    """Log generated tokens at DEBUG on ``llm_service.tokens``, through the logging queue"""
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        token_logger.debug("%s", token)
+
+class LLMService:
+    """Ollama client, chat prompt and chain built once and shared by all requests"""
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None,
+                 temperature: float = 0.7, keep_alive: Optional[str] = None):
+        self.model = model or os.getenv('OLLAMA_MODEL', 'mistral')
+        self.base_url = base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+        self.keep_alive = keep_alive or os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        self.temperature = temperature
+
+        # Tokens used to be echoed to stdout one write per token on the event
+        # loop; they are only logged now when llm_service.tokens is at DEBUG
+        handlers = [TokenLogHandler()] if token_logger.isEnabledFor(logging.DEBUG) else []
+        callback_manager = CallbackManager(handlers)
+        self.llm = Ollama(
+            model=self.model,
+            base_url=self.base_url,
+            callback_manager=callback_manager,
+            temperature=self.temperature,
+            keep_alive=self.keep_alive
+        )
+        self.prompt = PromptTemplate(
+            template=CHAT_TEMPLATE,
+            input_variables=["glpi_context", "kb_context", "history", "message"]
+        )
+        self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
+        self.http = httpx.AsyncClient(base_url=self.base_url, timeout=300.0)
+        self.warmed_up = False
+
+    async def warm_up(self) -> bool:
+        """Load the model into Ollama with a one-token generation so the first user skips the cold start"""
+        try:
+            response = await self.http.post("/api/generate", json={
+                "model": self.model,
+                "prompt": "Hello",
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {"num_predict": 1}
+            })
+            response.raise_for_status()
+            self.warmed_up = True
+            logger.info("Model %s warmed up (keep_alive=%s)", self.model, self.keep_alive)
+            return True
+        except Exception as e:
+            logger.error("Failed to warm up model %s: %s", self.model, e)
+            return False
+
+    async def is_model_resident(self) -> bool:
+        """Ask Ollama whether the model is currently loaded in memory"""
+        try:
+            response = await self.http.get("/api/ps", timeout=2.0)
+            response.raise_for_status()
+            wanted = self.model if ':' in self.model else f"{self.model}:latest"
+            return any(m.get('name') == wanted for m in response.json().get('models', []))
+        except Exception as e:
+            logger.warning("Could not query Ollama for loaded models: %s", e)
+            return False
+
+    async def close(self):
+        await self.http.aclose()
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from typing import Any, Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Loggers whose INFO records arrive once per request or faster
+DEFAULT_SAMPLE = "httpx=0.1"
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """``"httpx=0.1,glpi_async=0.5"`` -> ``{"httpx": 0.1, "glpi_async": 0.5}``"""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, rate = part.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+def summarize_payload(payload: Any) -> Dict[str, Any]:
+    """What is safe to log about a request or response body: its shape, not its content"""
+    if isinstance(payload, dict):
+        inner = payload.get("input", payload)
+        if isinstance(inner, list):
+            return {"redacted": True, "items": len(inner)}
+        if isinstance(inner, dict):
+            return {"redacted": True, "fields": sorted(inner)}
+    if isinstance(payload, (list, tuple)):
+        return {"redacted": True, "items": len(payload)}
+    return {"redacted": True, "type": type(payload).__name__}
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records below WARNING from selected loggers.
+
+    Rates apply to a logger and its children ("httpx" covers "httpx._client");
+    the most specific configured name wins. Kept records carry
+    ``sample_rate`` so counts can be scaled back up.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        rate = self._resolved.get(name, -1.0)
+        if rate != -1.0:
+            return rate
+        rate = None
+        probe = name
+        while probe:
+            if probe in self.rates:
+                rate = self.rates[probe]
+                break
+            probe = probe.rpartition(".")[0]
+        self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+class RedactingFilter(logging.Filter):
+    """Replace a record's ``payload`` extra with its shape unless payload logging is enabled"""
+
+    def __init__(self, enabled: bool = True):
+        super().__init__()
+        self.enabled = enabled
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.enabled and hasattr(record, "payload"):
+            record.payload = summarize_payload(record.payload)
+        return True
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, then any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting them or waiting.
+
+    Unlike the stdlib QueueHandler, ``%`` arguments are merged into the
+    message only when the listener writes the record, so the calling thread
+    pays for a queue put and nothing else. Arguments should therefore not
+    be mutated after the call. When the queue is full the record is dropped
+    and counted instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Tracebacks hold frames that may not outlive the caller; render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self.queue.qsize(), "dropped": self.dropped}
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    """Flush and stop a listener; safe to call more than once"""
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+def setup_logging(level: Optional[str] = None, json_format: Optional[bool] = None,
+                  sample: Optional[str] = None, redact: Optional[bool] = None,
+                  stream=None) -> NonBlockingQueueHandler:
+    """Route all logging through a queue to a background writer thread.
+
+    Replaces ``logging.basicConfig``. Settings default to the LOG_LEVEL,
+    LOG_FORMAT (``json`` or ``text``), LOG_SAMPLE, LOG_PAYLOADS and
+    LOG_QUEUE_SIZE environment variables. uvicorn's loggers are routed
+    through the same queue so access logs stop writing on the event loop.
+    Returns the installed handler; its ``listener`` is the writer thread.
+    """
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    if json_format is None:
+        json_format = os.getenv('LOG_FORMAT', 'json') == 'json'
+    rates = parse_sample_rates(os.getenv('LOG_SAMPLE', DEFAULT_SAMPLE) if sample is None else sample)
+    if redact is None:
+        redact = os.getenv('LOG_PAYLOADS', '0') != '1'
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JSONFormatter() if json_format else
+                        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    output.addFilter(RedactingFilter(redact))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    handler = NonBlockingQueueHandler(log_queue)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+        if getattr(existing, "listener", None) is not None:
+            _stop_listener(existing.listener)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    handler.listener = listener
+    return handler
@@ -1,27 +1,42 @@
-cat main.py 
 import os
 import sys
+import hmac
+import asyncio
 import json
-import re
+import time
+import uuid
 from datetime import datetime
 import logging
-from typing import List, Dict, Any, Optional, Union
-from fastapi import FastAPI, HTTPException, Depends, status
+from typing import List, Dict, Any, Optional, Awaitable, Callable
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
-from glpi_api import GLPI
+from glpi_async import AsyncGLPI
 from glpi_config import GLPIConfig
+from glpi_session import AsyncGLPISessionManager
+from llm_service import LLMService
+from ttl_cache import TTLCache
+from conversation_store import create_conversation_store, estimate_tokens
+from intent_classifier import Classification, classifier, classify
+from kb_index import KBIndex, format_kb_context, read_kb_dump
+from correlation_index import ChangeCorrelationIndex
+from response_cache import ResponseCache
+from shared_state import RateLimiter, SharedStore, SharedTTLCache
+from single_flight import SingleFlight
+from fanout import gather_within
+from admission import AdmissionController, Overloaded, PRIORITY_CHAT, PRIORITY_TICKET_ACTION
+from profiling import ProfileStore, ProfilingMiddleware
+from log_pipeline import setup_logging
+from metrics import (
+    CHAT_REQUESTS, GLPI_DATA, LLM_ERRORS, REQUEST_SECONDS, STAGE_SECONDS,
+    TIME_TO_FIRST_TOKEN_SECONDS, TOKENS_OUT, registry
+)
 
-# LangChain imports
-from langchain.llms import Ollama
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from langchain.callbacks.manager import CallbackManager
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Queue-backed logging: records are written by a background thread, not on the event loop
+log_handler = setup_logging()
 logger = logging.getLogger(__name__)
 
 # Model definitions
@@ -34,6 +49,8 @@ class ChatRequest(BaseModel):
     message: str
     history: Optional[List[ChatMessage]] = []
     conversation_id: Optional[str] = None
+    # Skip the response cache and generate a fresh reply
+    bypass_cache: bool = False
 
 class ChatResponse(BaseModel):
     response: str
@@ -41,16 +58,242 @@ class ChatResponse(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
     source: str = "langchain"
 
+# Bounds on one /tickets/bulk request, so a caller cannot fan out unbounded GLPI traffic
+BULK_MAX_ITEMS = int(os.getenv('GLPI_BULK_MAX_ITEMS', '500'))
+BULK_MAX_CHUNK_SIZE = int(os.getenv('GLPI_BULK_MAX_CHUNK_SIZE', '100'))
+
+class BulkTicketRequest(BaseModel):
+    # Ticket fields for new tickets
+    create: List[Dict[str, Any]] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+    # Ticket fields to change, each including the ticket "id"
+    update: List[Dict[str, Any]] = Field(default_factory=list, max_length=BULK_MAX_ITEMS)
+    chunk_size: Optional[int] = Field(default=None, ge=1, le=BULK_MAX_CHUNK_SIZE)
+
+class BulkTicketResponse(BaseModel):
+    created: List[Dict[str, Any]]
+    updated: List[Dict[str, Any]]
+    errors: int
+
 # Initialize GLPI config
 try:
     glpi_config = GLPIConfig()
     logger.info("GLPI configuration loaded successfully")
 except ValueError as e:
-    logger.error(f"Failed to load GLPI configuration: {e}")
+    logger.error("Failed to load GLPI configuration: %s", e)
     sys.exit(1)
 
+# State shared by worker processes (GLPI session, caches, rate limits); process-local when unset
+shared_store = SharedStore(os.getenv('SHARED_STATE_PATH') or ':memory:')
+
+# Where each worker publishes its metrics registry for /metrics to sum
+METRICS_NAMESPACE = "metrics"
+
+def create_cache(namespace: str, maxsize: int, ttl: float):
+    if shared_store.shared:
+        return SharedTTLCache(shared_store, namespace, maxsize=maxsize, ttl=ttl,
+                              local_ttl=float(os.getenv('SHARED_CACHE_LOCAL_TTL', '1')))
+    return TTLCache(maxsize=maxsize, ttl=ttl)
+
+# One GLPI session shared by all requests (and all workers when the store is shared)
+glpi_sessions = AsyncGLPISessionManager(
+    glpi_config.get_config(),
+    max_connections=int(os.getenv('GLPI_MAX_CONNECTIONS', '10')),
+    cache=create_cache(
+        "glpi",
+        maxsize=int(os.getenv('GLPI_CACHE_SIZE', '512')),
+        ttl=float(os.getenv('GLPI_TICKET_CACHE_TTL', '30'))
+    ),
+    list_ttl=float(os.getenv('GLPI_LIST_CACHE_TTL', '15')),
+    store=shared_store,
+    retry_interval=float(os.getenv('GLPI_SESSION_RETRY', '10')),
+    member_ttl=float(os.getenv('GLPI_SESSION_MEMBER_TTL', '300'))
+)
+
+# Server-side chat history keyed by conversation_id
+conversations = create_conversation_store()
+
+# Knowledge base articles retrieved into the prompt
+kb_index = KBIndex(os.getenv('VECTOR_STORE_PATH', './vector_store'))
+KB_TOP_K = int(os.getenv('KB_TOP_K', '3'))
+KB_MIN_SCORE = float(os.getenv('KB_MIN_SCORE', '0.15'))
+KB_DUMP_PATH = os.getenv(
+    'KB_DUMP_PATH',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'knowledge_base_backup.sql')
+)
+
+# Changes linked to tickets and recent changes per component, answered without GLPI joins
+correlation_index = ChangeCorrelationIndex()
+CHANGE_CORRELATION_LIMIT = int(os.getenv('CHANGE_CORRELATION_LIMIT', '5'))
+
+async def refresh_ticket_categories(interval: float):
+    """Keep the classifier's category IDs in sync with GLPI's ITIL categories"""
+    while True:
+        try:
+            client = await glpi_sessions.get_client()
+            if client:
+                categories = await client.get_itil_categories()
+                if categories:
+                    classifier.load_categories(categories)
+        except Exception:
+            logger.exception("ITIL category refresh failed; retrying in %ss", interval)
+        await asyncio.sleep(interval)
+
+# Replies reused for repeated questions asked against the same context
+response_cache = ResponseCache(
+    maxsize=int(os.getenv('LLM_CACHE_SIZE', '256')),
+    ttl=float(os.getenv('LLM_CACHE_TTL', '600')),
+    context_ttl=float(os.getenv('LLM_CACHE_CONTEXT_TTL', os.getenv('GLPI_TICKET_CACHE_TTL', '30'))),
+    similarity=float(os.environ['LLM_CACHE_SIMILARITY']) if os.getenv('LLM_CACHE_SIMILARITY') else None,
+    cache=create_cache(
+        "llm_replies",
+        maxsize=int(os.getenv('LLM_CACHE_SIZE', '256')),
+        ttl=float(os.getenv('LLM_CACHE_TTL', '600'))
+    )
+)
+
+# Per-client chat requests per window, counted across workers; 0 disables the limit
+chat_rate_limit = RateLimiter(
+    shared_store,
+    limit=int(os.getenv('CHAT_RATE_LIMIT', '0')),
+    window=float(os.getenv('CHAT_RATE_WINDOW', '60'))
+)
+# Bulk ticket calls fan out to GLPI, so they have their own, tighter limit
+bulk_rate_limit = RateLimiter(
+    shared_store,
+    limit=int(os.getenv('BULK_RATE_LIMIT', '10')),
+    window=float(os.getenv('BULK_RATE_WINDOW', '60')),
+    name="bulk_rate"
+)
+
+# Identical concurrent GLPI reads and prompts share one in-flight call
+glpi_flights = SingleFlight(timeout=float(os.getenv('GLPI_COALESCE_TIMEOUT', '10')))
+llm_flights = SingleFlight(timeout=float(os.getenv('LLM_COALESCE_TIMEOUT', '300')))
+
+# Shared deadline for the concurrent context lookups of one chat turn
+CONTEXT_DEADLINE = float(os.getenv('CONTEXT_DEADLINE', '2.0'))
+
+# Bounded, prioritised access to the LLM so bursts are shed instead of queued forever;
+# the concurrency bound holds across workers when the store is shared
+llm_admission = AdmissionController(
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', os.getenv('OLLAMA_CONCURRENCY', '2'))),
+    max_queue=int(os.getenv('LLM_MAX_QUEUE', '32')),
+    max_wait=float(os.getenv('LLM_MAX_QUEUE_WAIT', '30')),
+    store=shared_store,
+    slot_ttl=float(os.getenv('LLM_SLOT_TTL', '30'))
+)
+
+async def refresh_kb_index(interval: float, page_size: int = 100):
+    """Embed KB articles modified in GLPI since the last run.
+
+    With several workers only the holder of the "kb_index" lease writes the
+    index; the others reload what it saved.
+    """
+    while True:
+        if not await asyncio.to_thread(shared_store.acquire_lease, "kb_index", interval * 2 + 60):
+            await asyncio.to_thread(kb_index.reload)
+            await asyncio.sleep(min(interval, 60))
+            continue
+        try:
+            client = await glpi_sessions.get_client()
+            if client:
+                items, start = [], 0
+                # Newest first, so stop at the first page that reaches already indexed articles.
+                # A failed page raises, so a partial pass never moves the high-water mark.
+                while True:
+                    page = await client.get_knowbase_items(start, page_size)
+                    items.extend(page)
+                    start += len(page)
+                    if len(page) < page_size or \
+                            min(str(i.get('date_mod') or "") for i in page) < kb_index.last_date_mod:
+                        break
+                if items:
+                    await asyncio.to_thread(kb_index.update, items)
+        except Exception:
+            logger.exception("KB index refresh failed; retrying in %ss", interval)
+        await asyncio.sleep(interval)
+
+async def refresh_correlation_index(interval: float, page_size: int = 500):
+    """Load changes and change-ticket links on the first run, then only what is new since.
+
+    A failed page raises and the whole pass is dropped, so the high-water
+    marks only move once every page down to them has been read.
+    """
+    while True:
+        try:
+            client = await glpi_sessions.get_client()
+            if client:
+                changes, start = [], 0
+                # Newest first; rows at the high-water mark are re-read so same-second edits are not lost
+                while True:
+                    page = await client.get_changes(start, page_size)
+                    changes.extend(page)
+                    start += len(page)
+                    if len(page) < page_size or \
+                            min(str(c.get('date_mod') or "") for c in page) < correlation_index.last_date_mod:
+                        break
+                links, start = [], 0
+                while True:
+                    page = await client.get_change_links(start, page_size)
+                    links.extend(page)
+                    start += len(page)
+                    if len(page) < page_size or min(int(l['id']) for l in page) <= correlation_index.last_link_id:
+                        break
+                await asyncio.to_thread(correlation_index.update, changes, links)
+        except Exception:
+            logger.exception("Change correlation refresh failed; retrying in %ss", interval)
+        await asyncio.sleep(interval)
+
+async def publish_metrics(interval: float):
+    """Share this worker's metrics so /metrics on any worker can report all of them"""
+    while True:
+        shared_store.submit(shared_store.set, METRICS_NAMESPACE, shared_store.owner,
+                            registry.snapshot(), interval * 3)
+        await asyncio.sleep(interval)
+
+def seed_kb_index():
+    """Build the index from the SQL dump on first start, before GLPI is reachable"""
+    if kb_index.stats()["chunks"] or not os.path.exists(KB_DUMP_PATH):
+        return
+    if not shared_store.acquire_lease("kb_index", 600):
+        return
+    try:
+        kb_index.update(read_kb_dump(KB_DUMP_PATH))
+    except Exception as e:
+        logger.error("Failed to seed KB index from %s: %s", KB_DUMP_PATH, e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.llm_service = LLMService()
+    # Load the model in the background so startup is not held up by Ollama
+    warm_up = asyncio.create_task(app.state.llm_service.warm_up())
+    category_refresh = asyncio.create_task(
+        refresh_ticket_categories(float(os.getenv('ITIL_CATEGORY_REFRESH', '600')))
+    )
+    await asyncio.to_thread(seed_kb_index)
+    kb_refresh = asyncio.create_task(
+        refresh_kb_index(float(os.getenv('KB_REFRESH_INTERVAL', '900')))
+    )
+    correlation_refresh = asyncio.create_task(
+        refresh_correlation_index(float(os.getenv('CHANGE_REFRESH_INTERVAL', '300')))
+    )
+    metrics_publish = asyncio.create_task(
+        publish_metrics(float(os.getenv('METRICS_PUBLISH_INTERVAL', '15')))
+    ) if shared_store.shared else None
+    yield
+    warm_up.cancel()
+    category_refresh.cancel()
+    kb_refresh.cancel()
+    correlation_refresh.cancel()
+    if metrics_publish is not None:
+        metrics_publish.cancel()
+    await app.state.llm_service.close()
+    await glpi_sessions.close()
+    conversations.close()
+    await asyncio.to_thread(shared_store.release_lease, "kb_index")
+    await asyncio.to_thread(shared_store.close)
+
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -61,132 +304,507 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_llm():
-    callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
-    return Ollama(
-        model="mistral",
-        callback_manager=callback_manager,
-        temperature=0.7
+# Guards the admin endpoints (profiling, bulk ticket changes); PROFILE_ADMIN_TOKEN is the older name
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or os.getenv('PROFILE_ADMIN_TOKEN')
+
+# Opt-in per-request profiling; unless it is enabled and an admin token is set the middleware is not installed at all
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+if PROFILING_ENABLED and not ADMIN_TOKEN:
+    logger.warning("PROFILING_ENABLED is set but ADMIN_TOKEN is not; profiling stays off")
+profile_store = None
+if PROFILING_ENABLED and ADMIN_TOKEN:
+    profile_store = ProfileStore(
+        os.getenv('PROFILE_DIR', './profiles'),
+        max_profiles=int(os.getenv('PROFILE_MAX_FILES', '50'))
+    )
+    app.add_middleware(ProfilingMiddleware, admin_token=ADMIN_TOKEN, store=profile_store)
+
+def get_llm_service() -> LLMService:
+    return app.state.llm_service
+
+# Only the rows and columns the prompt actually shows, most recently modified first
+RECENT_TICKETS_QUERY = {
+    "limit": 5,
+    "fields": ["id", "name", "status"],
+    "sort": "date_mod",
+    "order": "DESC"
+}
+
+async def get_recent_tickets(glpi_client: AsyncGLPI) -> List[Dict]:
+    return await glpi_flights.do(
+        ("recent_tickets",),
+        lambda: glpi_client.get_tickets(**RECENT_TICKETS_QUERY)
     )
 
-async def handle_ticket_action(message: str, glpi_client: GLPI) -> str:
-    """Handle ticket-related actions"""
-    # Check for ticket creation intent
-    if any(word in message.lower() for word in ["create", "new", "open"]):
-        # Get priority from message
-        priority = 3  # Default to normal priority
-        if "high priority" in message.lower() or "urgent" in message.lower():
-            priority = 4
-        elif "low priority" in message.lower():
-            priority = 2
-
-        # Create ticket
-        result = glpi_client.create_ticket_from_message(message, priority)
-        if "error" not in result:
-            return f"Created new ticket #{result.get('id')} successfully."
+def format_ticket(ticket_id: int, ticket: Dict) -> str:
+    return f"Ticket #{ticket_id}:\n" + \
+        f"Title: {ticket.get('name')}\n" + \
+        f"Status: {ticket.get('status')}\n" + \
+        f"Priority: {ticket.get('priority')}\n" + \
+        f"Description: {ticket.get('content')}"
+
+def format_recent_tickets(tickets: List[Dict]) -> str:
+    return "Recent tickets:\n" + "\n".join([
+        f"#{t.get('id')}: {t.get('name')} ({t.get('status')})"
+        for t in tickets[:5]
+    ])
+
+def format_changes(changes: List[Dict]) -> str:
+    return "Related changes:\n" + "\n".join(
+        f"- {c.get('changes_id')}" for c in changes[:5]
+    )
+
+def format_change(change: Dict) -> str:
+    return f"- Change #{change['id']}: {change['name']} (status {change['status']}, {change['date']})"
+
+def format_correlated_changes(correlation: Dict[str, List[Dict]]) -> str:
+    parts = []
+    if correlation["linked"]:
+        parts.append("Related changes:\n" + "\n".join(format_change(c) for c in correlation["linked"]))
+    for component, changes in correlation["recent_by_component"].items():
+        parts.append(f"Recent changes to {component}:\n" + "\n".join(format_change(c) for c in changes))
+    return "\n\n".join(parts)
+
+async def glpi_source(fetch: Callable[[AsyncGLPI], Awaitable[Any]]) -> Any:
+    """Run a GLPI lookup, acquiring the session inside the caller's deadline"""
+    client = await glpi_sessions.get_client()
+    if client is None:
+        raise RuntimeError("GLPI session unavailable")
+    return await fetch(client)
+
+async def create_ticket_action(message: str, classification: Classification) -> str:
+    """Create the ticket the user asked for and describe the outcome"""
+    glpi_client = await glpi_sessions.get_client()
+    if glpi_client is None:
+        return "Failed to create ticket: GLPI session unavailable"
+    result = await glpi_client.create_ticket_from_message(
+        message, classification.priority, classification
+    )
+    if "error" not in result:
+        return f"Created new ticket #{result.get('id')} successfully."
+    return "Failed to create ticket: " + result["error"]
+
+async def search_kb(message: str):
+    with STAGE_SECONDS.time("kb_search"):
+        return (await asyncio.to_thread(
+            kb_index.search, [message], KB_TOP_K, KB_MIN_SCORE
+        ))[0]
+
+async def gather_context(message: str, classification: Classification):
+    """Fetch every independent context source at once under CONTEXT_DEADLINE.
+
+    Returns the merged GLPI context text, the KB hits and a mapping of
+    contributing and dropped sources for the response metadata. Ticket
+    creation is an action rather than a lookup, so it runs alongside the
+    lookups but is always awaited to completion.
+    """
+    sources = {"kb": search_kb(message)}
+    create = None
+    if classification.is_ticket_query:
+        ticket_id = classification.ticket_id
+        if classification.intent == "create":
+            create = asyncio.ensure_future(create_ticket_action(message, classification))
         else:
-            return "Failed to create ticket: " + result["error"]
-
-    # Check for ticket query intent
-    elif any(word in message.lower() for word in ["show", "get", "find", "search"]):
-        if "ticket #" in message.lower() or "#" in message:
-            # Extract ticket number
-            ticket_match = re.search(r'#(\d+)', message)
-            if ticket_match:
-                ticket_id = int(ticket_match.group(1))
-                ticket = glpi_client.get_ticket_by_id(ticket_id)
-                if ticket and not isinstance(ticket, dict):
-                    return f"Ticket #{ticket_id}:\n" + \
-                        f"Title: {ticket.get('name')}\n" + \
-                        f"Status: {ticket.get('status')}\n" + \
-                        f"Priority: {ticket.get('priority')}\n" + \
-                        f"Description: {ticket.get('content')}"
-                return f"Could not find ticket #{ticket_id}"
-
-        # General ticket listing
-        tickets = glpi_client.get_tickets()
-        if tickets and isinstance(tickets, list):
-            return "Recent tickets:\n" + "\n".join([
-                f"#{t.get('id')}: {t.get('name')} ({t.get('status')})"
-                for t in tickets[:5]
-            ])
-
-    return None
-
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, llm: Any = Depends(get_llm)):
+            if ticket_id is not None:
+                sources["ticket"] = glpi_source(lambda client: glpi_flights.do(
+                    ("ticket", ticket_id), lambda: client.get_ticket_by_id(ticket_id)
+                ))
+                # The correlation index answers from memory once loaded
+                if not correlation_index.ready:
+                    sources["changes"] = glpi_source(lambda client: glpi_flights.do(
+                        ("ticket_changes", ticket_id), lambda: client.get_ticket_changes(ticket_id)
+                    ))
+            # Fetched speculatively so a missing ticket does not cost a second round-trip
+            sources["recent_tickets"] = glpi_source(get_recent_tickets)
+
+    with STAGE_SECONDS.time("context"):
+        results, dropped = await gather_within(sources, CONTEXT_DEADLINE)
+        parts = [await create] if create else []
+
+    contributed = ["ticket_create"] if create else []
+    ticket = results.get("ticket")
+    if ticket:
+        parts.append(format_ticket(classification.ticket_id, ticket))
+        contributed.append("ticket")
+    elif "ticket" in results:
+        parts.append(f"Could not find ticket #{classification.ticket_id}")
+    if results.get("changes"):
+        parts.append(format_changes(results["changes"]))
+        contributed.append("changes")
+    elif "ticket" in sources and correlation_index.ready:
+        with STAGE_SECONDS.time("change_correlation"):
+            correlation = correlation_index.correlate(
+                classification.ticket_id, (ticket or {}).get('name'), CHANGE_CORRELATION_LIMIT
+            )
+        if correlation["linked"] or correlation["recent_by_component"]:
+            parts.append(format_correlated_changes(correlation))
+            contributed.append("changes")
+    if not ticket and not create and results.get("recent_tickets"):
+        parts.append(format_recent_tickets(results["recent_tickets"]))
+        contributed.append("recent_tickets")
+    if results.get("kb"):
+        contributed.append("kb")
+    return "\n\n".join(parts), results.get("kb") or [], {
+        "sources": contributed,
+        "dropped_sources": dropped
+    }
+
+def load_history(conversation_id: str, client_history: Optional[List[ChatMessage]]) -> str:
+    """Prompt history for a turn; blocks on the conversation store"""
+    # Seed the store from clients that still send the full history
+    if client_history and not conversations.exists(conversation_id):
+        conversations.append(conversation_id, [
+            {"role": msg.role, "content": msg.content}
+            for msg in client_history
+        ])
+    return conversations.render_history(conversation_id)
+
+async def prepare_chat(request: ChatRequest):
+    """Resolve the conversation id and gather the prompt inputs for a chat turn"""
+    conversation_id = request.conversation_id or \
+        f"conv_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    with STAGE_SECONDS.time("history"):
+        history = await asyncio.to_thread(load_history, conversation_id, request.history)
+
+    with STAGE_SECONDS.time("intent"):
+        classification = classify(request.message)
+    glpi_context, kb_hits, sources = await gather_context(request.message, classification)
+    if glpi_context:
+        GLPI_DATA.inc()
+
+    inputs = {
+        "message": request.message,
+        "history": history,
+        "glpi_context": glpi_context or "No relevant ticket information found.",
+        "kb_context": format_kb_context(kb_hits) or "No relevant knowledge base articles found."
+    }
+    context = {
+        "intent": classification.intent,
+        "glpi_data": bool(glpi_context),
+        "kb_articles": [chunk["item_id"] for _, chunk in kb_hits],
+        **sources
+    }
+    return conversation_id, inputs, context
+
+def lookup_cached_response(request: ChatRequest, inputs: Dict[str, str],
+                           llm_service: LLMService):
+    """Return the cached reply (or None) and the cache metadata for the response"""
+    if request.bypass_cache:
+        response_cache.record_bypass()
+        return None, {"hit": False, "bypassed": True}
+    cached = response_cache.lookup(inputs, llm_service.model, llm_service.temperature)
+    if cached is None:
+        return None, {"hit": False}
+    return cached, {
+        "hit": True,
+        "match": cached["match"],
+        "similarity": cached["similarity"],
+        "age_s": cached["age_s"]
+    }
+
+def llm_priority(context: Dict[str, Any]) -> int:
+    """Replies to ticket actions are generated ahead of free-form chat"""
+    return PRIORITY_TICKET_ACTION if context.get("intent") == "create" else PRIORITY_CHAT
+
+def rate_limited(limiter: RateLimiter, detail: str):
+    """Dependency that answers 429 with Retry-After once a client exceeds ``limiter``"""
+    # Sync so FastAPI runs it in its threadpool: the shared counter write stays off the event loop
+    def enforce(http_request: Request):
+        client = http_request.client.host if http_request.client else "unknown"
+        retry_after = limiter.check(client)
+        if retry_after is not None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=detail,
+                headers={"Retry-After": str(int(retry_after) + 1)}
+            )
+    return enforce
+
+enforce_rate_limit = rate_limited(chat_rate_limit, "Too many chat requests")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    logger.warning("Shedding chat request: %s", e.reason)
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=e.reason,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def generate_reply(llm_service: LLMService, inputs: Dict[str, str], priority: int) -> Dict:
+    slot = await llm_admission.acquire(priority)
     try:
-        history = "\n".join([
-            f"{msg.role}: {msg.content}"
-            for msg in request.history
-        ]) if request.history else ""
-
-        conversation_id = request.conversation_id or f"conv_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-        # Handle ticket-related queries
-        glpi_context = ""
-        if any(word in request.message.lower() for word in ["ticket", "issue", "problem"]):
-            config = glpi_config.get_config()
-            client = GLPI(**config)
-            if client.init_session():
-                # Try to handle specific ticket action
-                action_result = await handle_ticket_action(request.message, client)
-                if action_result:
-                    glpi_context = action_result
-                else:
-                    # Fall back to general ticket listing
-                    tickets = client.get_tickets()
-                    if tickets and isinstance(tickets, list):
-                        glpi_context = "Recent tickets:\n" + "\n".join([
-                            f"#{t.get('id')}: {t.get('name')} ({t.get('status')})"
-                            for t in tickets[:5]
-                        ])
-                client.kill_session()
-
-        # Create prompt with GLPI context
-        template = """Assistant: I'm an IT support assistant with access to GLPI ticket system.
-        
-        GLPI Context: {glpi_context}
-        Chat History: {history}
-        User Message: {message}
-        
-        Keep responses brief and direct. If ticket information is available, reference it specifically."""
-
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["glpi_context", "history", "message"]
-        )
+        with STAGE_SECONDS.time("llm_generation"):
+            response = await llm_service.chain.ainvoke(inputs)
+        TOKENS_OUT.observe(estimate_tokens(response["text"]))
+        return response
+    except Exception:
+        LLM_ERRORS.inc()
+        raise
+    finally:
+        slot.release()
 
-        chain = LLMChain(llm=llm, prompt=prompt)
-        response = chain.invoke({
-            "message": request.message,
-            "history": history,
-            "glpi_context": glpi_context or "No relevant ticket information found."
-        })
+@app.post("/chat", response_model=ChatResponse, dependencies=[Depends(enforce_rate_limit)])
+async def chat(request: ChatRequest, llm_service: LLMService = Depends(get_llm_service)):
+    started = time.perf_counter()
+    CHAT_REQUESTS.inc(label="chat")
+    try:
+        conversation_id, inputs, context = await prepare_chat(request)
+
+        cached, cache_info = lookup_cached_response(request, inputs, llm_service)
+        if cached:
+            text = cached["text"]
+        else:
+            with STAGE_SECONDS.time("prompt_build"):
+                prompt = llm_service.prompt.format(**inputs)
+            response = await llm_flights.do(
+                ("prompt", llm_service.model, llm_service.temperature, prompt),
+                lambda: generate_reply(llm_service, inputs, llm_priority(context))
+            )
+            text = response["text"]
+            response_cache.store(inputs, llm_service.model, llm_service.temperature, text,
+                                 ticket_context=context["glpi_data"])
+        await asyncio.to_thread(conversations.append, conversation_id, [
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": text}
+        ])
 
+        REQUEST_SECONDS.observe(time.perf_counter() - started, "chat")
         return ChatResponse(
-            response=response["text"],
+            response=text,
             conversation_id=conversation_id,
             metadata={
                 "timestamp": datetime.now().isoformat(),
-                "glpi_data": bool(glpi_context)
+                **context,
+                "cache": cache_info
             }
         )
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {str(e)}")
+        logger.error("Error in chat endpoint: %s", str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream", dependencies=[Depends(enforce_rate_limit)])
+async def chat_stream(request: ChatRequest, llm_service: LLMService = Depends(get_llm_service)):
+    """Stream the assistant reply token by token as server-sent events.
+
+    Events: ``metadata`` (same envelope as ChatResponse, sent before generation),
+    ``token`` (one per generated chunk), ``done`` (full text plus timing) and
+    ``error``.
+    """
+    request_started = time.perf_counter()
+    CHAT_REQUESTS.inc(label="chat_stream")
+    try:
+        conversation_id, inputs, context = await prepare_chat(request)
+    except Exception as e:
+        logger.error("Error in chat stream endpoint: %s", str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    cached, cache_info = lookup_cached_response(request, inputs, llm_service)
+    metadata = {
+        "timestamp": datetime.now().isoformat(),
+        **context,
+        "cache": cache_info
+    }
+
+    # Take the LLM slot before the response starts so an overload is still a plain 503
+    slot = None
+    if not cached:
+        try:
+            slot = await llm_admission.acquire(llm_priority(context))
+        except Overloaded as e:
+            raise overloaded_error(e)
+
+    async def events():
+        yield sse_event("metadata", {
+            "conversation_id": conversation_id,
+            "metadata": metadata,
+            "source": "langchain"
+        })
+        parts = []
+        first_token_at = None
+        started = time.perf_counter()
+        if cached:
+            # Cached replies are sent as a single token
+            first_token_at = time.perf_counter()
+            parts.append(cached["text"])
+            yield sse_event("token", {"token": cached["text"]})
+        else:
+            with STAGE_SECONDS.time("prompt_build"):
+                prompt = llm_service.prompt.format(**inputs)
+            try:
+                async for token in llm_service.llm.astream(prompt):
+                    if not token:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(token)
+                    yield sse_event("token", {"token": token})
+            except Exception as e:
+                LLM_ERRORS.inc()
+                logger.error("Error in chat stream endpoint: %s", str(e))
+                yield sse_event("error", {"detail": str(e)})
+                return
+            finally:
+                slot.release()
+            finished = time.perf_counter()
+            STAGE_SECONDS.observe(finished - started, "llm_generation")
+            if first_token_at is not None:
+                TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token_at - started)
+            TOKENS_OUT.observe(len(parts))
+            response_cache.store(inputs, llm_service.model, llm_service.temperature, "".join(parts),
+                                 ticket_context=context["glpi_data"])
+
+        finished = time.perf_counter()
+        generation_s = finished - (first_token_at or finished)
+        stats = {
+            "time_to_first_token_ms": round(((first_token_at or finished) - started) * 1000, 1),
+            "tokens": len(parts),
+            "tokens_per_second": round(len(parts) / generation_s, 2) if generation_s > 0 else None,
+            "total_ms": round((finished - started) * 1000, 1)
+        }
+        REQUEST_SECONDS.observe(time.perf_counter() - request_started, "chat_stream")
+        logger.info("Streamed %s: %s", conversation_id, stats)
+        await asyncio.to_thread(conversations.append, conversation_id, [
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": "".join(parts)}
+        ])
+        yield sse_event("done", {
+            "response": "".join(parts),
+            "conversation_id": conversation_id,
+            "metadata": {**metadata, **stats},
+            "source": "langchain"
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also frees the slot if the client disconnects before the stream starts
+        background=BackgroundTask(slot.release) if slot else None
+    )
+
+@app.post("/tickets/bulk", response_model=BulkTicketResponse, dependencies=[
+    Depends(require_admin), Depends(rate_limited(bulk_rate_limit, "Too many bulk ticket requests"))
+])
+async def tickets_bulk(request: BulkTicketRequest):
+    """Create and update many tickets with GLPI's array-form input.
+
+    Needs the admin token. Results are per item, in request order; one
+    failing item does not fail the rest of the batch.
+    """
+    missing_ids = [i for i, item in enumerate(request.update) if 'id' not in item]
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Updates without an id at positions {missing_ids}"
+        )
+    client = await glpi_sessions.get_client()
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="GLPI session unavailable"
+        )
+
+    chunk_size = request.chunk_size or int(os.getenv('GLPI_BULK_CHUNK_SIZE', '50'))
+    created, updated = await asyncio.gather(
+        client.create_tickets_bulk(request.create, chunk_size),
+        client.update_tickets_bulk(request.update, chunk_size)
+    )
+    return BulkTicketResponse(
+        created=created,
+        updated=updated,
+        errors=sum(1 for result in created + updated if not result["ok"])
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms and error counters in Prometheus text format.
+
+    With a shared store the values are summed over every worker: this one's
+    live, the others' as last published.
+    """
+    snapshots = []
+    if shared_store.shared:
+        snapshots = [
+            snapshot for owner, snapshot in await asyncio.to_thread(shared_store.items, METRICS_NAMESPACE)
+            if owner != shared_store.owner
+        ]
+    return PlainTextResponse(registry.render(snapshots), media_type="text/plain; version=0.0.4")
+
+def require_profile_admin(x_admin_token: Optional[str] = Header(None)) -> ProfileStore:
+    if profile_store is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    require_admin(x_admin_token)
+    return profile_store
+
+@app.get("/debug/profiles")
+async def list_profiles(store: ProfileStore = Depends(require_profile_admin)):
+    return {"profiles": store.list()}
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+async def show_profile(profile_id: str, sort: str = "cumulative", limit: int = 40,
+                       store: ProfileStore = Depends(require_profile_admin)):
+    """Per-function time breakdown of one profiled request"""
+    try:
+        return store.summary(profile_id, sort=sort, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
+    llm_service = app.state.llm_service
     return {
         "status": "healthy",
-        "glpi_config": "loaded" if glpi_config else "not loaded"
+        "glpi_config": "loaded" if glpi_config else "not loaded",
+        "glpi_cache": glpi_sessions.cache.stats(),
+        "conversations": await asyncio.to_thread(conversations.stats),
+        "knowledge_base": kb_index.stats(),
+        "change_correlation": correlation_index.stats(),
+        "response_cache": response_cache.stats(),
+        "llm_queue": llm_admission.stats(),
+        "worker_pid": os.getpid(),
+        "shared_state": shared_store.stats(),
+        "rate_limit": chat_rate_limit.stats(),
+        "bulk_rate_limit": bulk_rate_limit.stats(),
+        "logging": log_handler.stats(),
+        "coalescing": {
+            "glpi": glpi_flights.stats(),
+            "llm": llm_flights.stats()
+        },
+        "llm": {
+            "model": llm_service.model,
+            "warmed_up": llm_service.warmed_up,
+            "resident": await llm_service.is_model_resident()
+        }
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # For production use gunicorn -c gunicorn.conf.py main:app (preloading, graceful reloads)
+    workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+    if workers > 1:
+        # Workers are separate processes and only see each other's state through these
+        os.environ.setdefault('SHARED_STATE_PATH', 'shared_state.db')
+        os.environ.setdefault('CONVERSATION_STORE', 'sqlite')
+    # log_config=None keeps uvicorn from replacing the queue handler set up above
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0",
+                port=int(os.getenv('PORT', '8000')), workers=workers, log_config=None)
@@ -3,6 +3,9 @@
 # Configuration
 PID_FILE="server.pid"
 LOG_FILE="logs/server.log"
+# Worker processes in production mode; DEV=1 runs a single auto-reloading uvicorn instead
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-$(nproc)}"
+export PID_FILE
 
 # Function to check if server is running
 is_running() {
@@ -22,9 +25,16 @@ start() {
         exit 1
     fi
     
-    echo "Starting server..."
-    nohup uvicorn main:app --reload --host 0.0.0.0 --port 8000 > "$LOG_FILE" 2>&1 &
-    echo $! > "$PID_FILE"
+    mkdir -p "$(dirname "$LOG_FILE")"
+    if [ "$DEV" = "1" ]; then
+        echo "Starting development server..."
+        nohup uvicorn main:app --reload --host 0.0.0.0 --port 8000 > "$LOG_FILE" 2>&1 &
+        echo $! > "$PID_FILE"
+    else
+        echo "Starting server with $WEB_CONCURRENCY workers..."
+        # gunicorn writes $PID_FILE itself (see gunicorn.conf.py)
+        nohup gunicorn -c gunicorn.conf.py main:app > "$LOG_FILE" 2>&1 &
+    fi
     sleep 2
     
     if is_running; then
@@ -42,6 +52,10 @@ stop() {
         pid=$(cat "$PID_FILE")
         echo "Stopping server (PID: $pid)..."
         kill -TERM "$pid"
+        # Workers finish in-flight requests first (graceful_timeout in gunicorn.conf.py)
+        while ps -p "$pid" > /dev/null 2>&1; do
+            sleep 1
+        done
         rm -f "$PID_FILE"
         echo "Server stopped."
     else
@@ -50,6 +64,17 @@ stop() {
     fi
 }
 
+# Replace the workers without dropping in-flight requests
+reload() {
+    if is_running; then
+        echo "Gracefully restarting workers..."
+        kill -HUP "$(cat "$PID_FILE")"
+    else
+        echo "Server is not running."
+        exit 1
+    fi
+}
+
 # Get server status
 status() {
     if is_running; then
@@ -72,11 +97,14 @@ case "$1" in
         sleep 2
         start
         ;;
+    reload)
+        reload
+        ;;
     status)
         status
         ;;
     *)
-        echo "Usage: $0 {start|stop|restart|status}"
+        echo "Usage: $0 {start|stop|restart|reload|status}"
         exit 1
         ;;
 esac
@@ -0,0 +1,214 @@
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans a sub-millisecond keyword match up to a slow CPU generation
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+class Counter:
+    """Monotonic counter, optionally split by one label"""
+
+    def __init__(self, name: str, documentation: str, labelname: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelname = labelname
+        self._values: Dict[Optional[str], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, label: Optional[str] = None):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0.0) + amount
+
+    def value(self, label: Optional[str] = None) -> float:
+        return self._values.get(label, 0.0)
+
+    def snapshot(self) -> List[list]:
+        """JSON-encodable ``[[label, value], ...]``"""
+        with self._lock:
+            return [[label, value] for label, value in self._values.items()]
+
+    def render(self, snapshots: Sequence[List[list]] = ()) -> List[str]:
+        """Exposition lines, with other processes' ``snapshots`` added in"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            merged = dict(self._values)
+        for snapshot in snapshots:
+            for label, value in snapshot:
+                merged[label] = merged.get(label, 0.0) + value
+        values = sorted(merged.items(), key=lambda item: item[0] or "")
+        if not values and self.labelname is None:
+            values = [(None, 0.0)]
+        for label, value in values:
+            labels = ((self.labelname, label),) if self.labelname else ()
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class _Timer:
+    """Context manager and decorator that observes elapsed seconds into a histogram"""
+
+    __slots__ = ("histogram", "label", "start")
+
+    def __init__(self, histogram: "Histogram", label: Optional[str]):
+        self.histogram = histogram
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.label)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        histogram, label = self.histogram, self.label
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(histogram, label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram, label):
+                return fn(*args, **kwargs)
+        return wrapper
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus model, optionally split by one label.
+
+    ``observe`` is a bisect and three additions under a lock (~1 µs), so
+    timers can stay on in production.
+    """
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelname: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelname = labelname
+        # label -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Optional[str], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label: Optional[str] = None):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, label: Optional[str] = None) -> _Timer:
+        """``with histogram.time("stage"):`` or ``@histogram.time("stage")``"""
+        return _Timer(self, label)
+
+    def count(self, label: Optional[str] = None) -> int:
+        series = self._series.get(label)
+        return series[2] if series else 0
+
+    def snapshot(self) -> List[list]:
+        """JSON-encodable ``[[label, bucket counts, sum, count], ...]``"""
+        with self._lock:
+            return [[label, list(series[0]), series[1], series[2]] for label, series in self._series.items()]
+
+    def render(self, snapshots: Sequence[List[list]] = ()) -> List[str]:
+        """Exposition lines, with other processes' ``snapshots`` added in"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        merged: Dict[Optional[str], list] = {}
+        for snapshot in [self.snapshot(), *snapshots]:
+            for label, counts, total, count in snapshot:
+                if len(counts) != len(self.buckets) + 1:
+                    continue  # published by a process with other bucket bounds
+                series = merged.setdefault(label, [[0] * len(counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+        snapshot = sorted(
+            ((label, series[0], series[1], series[2]) for label, series in merged.items()),
+            key=lambda item: item[0] or ""
+        )
+        for label, counts, total, count in snapshot:
+            base = ((self.labelname, label),) if self.labelname else ()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(base + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every metric's values, for another process to merge into its ``render``"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots: Sequence[Dict[str, Any]] = ()) -> str:
+        """Prometheus text exposition format (version 0.0.4), summed with other processes' ``snapshots``"""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render([s[metric.name] for s in snapshots if metric.name in s]))
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "chat_stage_seconds",
+    "Time spent in each stage of the chat pipeline",
+    labelname="stage"
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "chat_request_seconds",
+    "End-to-end chat request latency",
+    labelname="endpoint"
+))
+TIME_TO_FIRST_TOKEN_SECONDS = registry.register(Histogram(
+    "chat_llm_time_to_first_token_seconds",
+    "Time from starting generation to the first streamed token"
+))
+TOKENS_OUT = registry.register(Histogram(
+    "chat_llm_tokens_out",
+    "Tokens generated per reply (streamed chunks, or estimated from length for /chat)",
+    buckets=TOKEN_BUCKETS
+))
+CHAT_REQUESTS = registry.register(Counter(
+    "chat_requests_total",
+    "Chat requests handled",
+    labelname="endpoint"
+))
+GLPI_DATA = registry.register(Counter(
+    "chat_glpi_data_total",
+    "Chat requests whose prompt included GLPI ticket data; divide by chat_requests_total for the hit rate"
+))
+GLPI_ERRORS = registry.register(Counter(
+    "glpi_errors_total",
+    "Failed GLPI API calls (transport errors and error responses)"
+))
+LLM_ERRORS = registry.register(Counter(
+    "llm_errors_total",
+    "Failed LLM generations"
+))
@@ -0,0 +1,140 @@
+import io
+import os
+import asyncio
+import re
+import hmac
+import time
+import pstats
+import cProfile
+import logging
+import threading
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID = re.compile(r"^[\w.-]+$")
+
+class ProfileStore:
+    """Bounded on-disk ring buffer of cProfile dumps.
+
+    Each profile is a ``<id>.prof`` file readable with ``pstats``/snakeviz;
+    once ``max_profiles`` are stored the oldest is deleted.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._seq = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def new_id(self, path: str) -> str:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        slug = re.sub(r"[^\w]+", "_", path).strip("_") or "root"
+        return f"{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}_{seq:04d}_{slug}"
+
+    def _path(self, profile_id: str) -> str:
+        if not _PROFILE_ID.match(profile_id):
+            raise KeyError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.prof")
+
+    def save(self, profile_id: str, profiler: cProfile.Profile):
+        profiler.dump_stats(self._path(profile_id))
+        with self._lock:
+            files = sorted(
+                (os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.endswith(".prof")),
+                key=os.path.getmtime
+            )
+            for stale in files[:max(0, len(files) - self.max_profiles)]:
+                os.remove(stale)
+
+    def list(self) -> List[Dict]:
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".prof"):
+                path = os.path.join(self.directory, name)
+                entries.append({"id": name[:-len(".prof")], "bytes": os.path.getsize(path),
+                                "created": os.path.getmtime(path)})
+        return sorted(entries, key=lambda entry: entry["created"], reverse=True)
+
+    def summary(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> str:
+        """Per-function breakdown of a stored profile as pstats text"""
+        path = self._path(profile_id)
+        if not os.path.exists(path):
+            raise KeyError(profile_id)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+class ProfilingMiddleware:
+    """Profile single requests on demand with cProfile.
+
+    A request is profiled only when it carries ``X-Profile: 1`` (or
+    ``?profile=1``) together with ``X-Admin-Token`` matching ``admin_token``.
+    The response gets an ``X-Profile-Id`` header; the profile is kept in the
+    ``ProfileStore`` until it rotates out. The app only installs this
+    middleware when profiling is enabled and an admin token is configured,
+    and other requests pass straight through after a header check.
+
+    cProfile covers the event loop thread for the duration of the request
+    (including the streamed body), so with concurrent traffic other requests'
+    coroutines can appear in the profile. Only one request is profiled at a
+    time; a concurrent opt-in gets ``X-Profile-Id: busy``.
+    """
+
+    def __init__(self, app, admin_token: str, store: ProfileStore):
+        self.app = app
+        self.admin_token = admin_token.encode()
+        self.store = store
+        self._busy = threading.Lock()
+
+    def _opted_in(self, scope) -> bool:
+        flag = token = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                flag = value
+            elif name == b"x-admin-token":
+                token = value
+        if flag is None and b"profile=" in scope.get("query_string", b""):
+            flag = parse_qs(scope["query_string"].decode()).get("profile", [""])[0].encode()
+        if flag not in (b"1", b"true") or token is None:
+            return False
+        return hmac.compare_digest(token, self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._opted_in(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_header(send, b"busy"))
+            return
+
+        profile_id = self.store.new_id(scope["path"])
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, self._with_header(send, profile_id.encode()))
+            finally:
+                profiler.disable()
+        finally:
+            self._busy.release()
+        try:
+            # Dumping and rotating the files is disk I/O; keep it off the event loop
+            await asyncio.to_thread(self.store.save, profile_id, profiler)
+            logger.info("Stored profile %s for %s %s", profile_id, scope['method'], scope['path'])
+        except Exception as e:
+            logger.error("Failed to store profile %s: %s", profile_id, e)
+
+    @staticmethod
+    def _with_header(send, profile_id: bytes):
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"x-profile-id", profile_id)])
+            await send(message)
+        return send_with_header
@@ -0,0 +1,142 @@
+import re
+import time
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, Optional
+import numpy as np
+from kb_index import HashingEmbedder
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s#]")
+
+def normalize_message(message: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a chat message"""
+    return " ".join(_PUNCTUATION.sub(" ", message.lower()).split())
+
+class ResponseCache:
+    """Cache of LLM replies for repeated questions.
+
+    Entries are keyed on the normalized message plus a fingerprint of
+    everything else that shapes the reply: model, temperature, GLPI context,
+    KB context and conversation history. A reply is only reused when that
+    context is identical, so it can never mix in stale ticket data; replies
+    built on ticket data also expire after ``context_ttl`` instead of ``ttl``.
+
+    With ``similarity`` set, a miss falls back to a cosine search over the
+    cached messages that share the same context fingerprint, so
+    "is the AKS cluster down?" can answer "AKS cluster down??".
+
+    ``cache`` swaps the in-process store for another with the TTLCache
+    interface (e.g. a SharedTTLCache across workers); the similarity
+    embeddings stay per process.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0, context_ttl: float = 30.0,
+                 similarity: Optional[float] = None, embedder=None, cache=None):
+        self.cache = cache if cache is not None else TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.context_ttl = context_ttl
+        self.similarity = similarity
+        self.embedder = embedder or (HashingEmbedder(1024) if similarity else None)
+        # context fingerprint -> normalized message -> embedding
+        self._vectors: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def fingerprint(inputs: Dict[str, str], model: str, temperature: float) -> str:
+        digest = hashlib.sha256()
+        for part in (model, repr(temperature), inputs.get("glpi_context", ""),
+                     inputs.get("kb_context", ""), inputs.get("history", "")):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, inputs: Dict[str, str], model: str, temperature: float) -> Optional[Dict[str, Any]]:
+        """Return ``{"text", "match", "similarity", "age_s"}`` for a cached reply, or None"""
+        context = self.fingerprint(inputs, model, temperature)
+        message = normalize_message(inputs["message"])
+
+        entry = self.cache.get((context, message))
+        if entry is not None:
+            self.exact_hits += 1
+            return self._hit(entry, "exact", 1.0)
+
+        if self.similarity:
+            with self._lock:
+                candidates = self._vectors.get(context)
+                if candidates:
+                    messages = list(candidates)
+                    matrix = np.stack(list(candidates.values()))
+                else:
+                    messages = []
+            if messages:
+                scores = matrix @ self.embedder.embed([message])[0]
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    entry = self.cache.get((context, messages[best]))
+                    if entry is not None:
+                        self.similar_hits += 1
+                        return self._hit(entry, "similar", float(scores[best]))
+
+        self.misses += 1
+        return None
+
+    def _hit(self, entry: Dict[str, Any], match: str, similarity: float) -> Dict[str, Any]:
+        return {
+            "text": entry["text"],
+            "match": match,
+            "similarity": round(similarity, 3),
+            "age_s": round(time.time() - entry["created_at"], 1)
+        }
+
+    def store(self, inputs: Dict[str, str], model: str, temperature: float, text: str,
+              ticket_context: bool = False):
+        """Cache a reply; replies that quote GLPI ticket data get the shorter ``context_ttl``"""
+        if not text:
+            return
+        context = self.fingerprint(inputs, model, temperature)
+        message = normalize_message(inputs["message"])
+        self.cache.set(
+            (context, message),
+            {"text": text, "created_at": time.time()},
+            ttl=self.context_ttl if ticket_context else self.ttl
+        )
+        if self.similarity:
+            vector = self.embedder.embed([message])[0]
+            with self._lock:
+                self._vectors.setdefault(context, {})[message] = vector
+                if sum(len(v) for v in self._vectors.values()) > self.cache.maxsize:
+                    self._prune()
+
+    def _prune(self):
+        """Forget embeddings whose reply has been evicted or has expired"""
+        for context in list(self._vectors):
+            candidates = self._vectors[context]
+            for message in [m for m in candidates if (context, m) not in self.cache]:
+                del candidates[message]
+            if not candidates:
+                del self._vectors[context]
+
+    def record_bypass(self):
+        self.bypassed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "size": len(self.cache),
+            "maxsize": self.cache.maxsize,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.cache.evictions,
+            "similarity_threshold": self.similarity,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else None
+        }
@@ -0,0 +1,459 @@
+import os
+import json
+import time
+import queue
+import sqlite3
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Local marker for an entry deleted here whose shared delete is still queued
+_DISCARDED = object()
+
+class SharedStore:
+    """Key-value entries, counters and leases shared by every worker process.
+
+    Backed by one local SQLite file in WAL mode, so readers never block and a
+    write is a single short transaction (well under a millisecond on local
+    disk). Reads use their own connection and never wait behind a write;
+    writes can wait up to the busy timeout when another worker holds the
+    write lock, so async callers run them with ``asyncio.to_thread`` or hand
+    them to ``submit``. With ``path=":memory:"`` the store is private to the
+    process, which keeps single-process mode free of disk I/O and threads
+    while the callers stay the same.
+
+    Each process opens its own connections and writer thread after the fork;
+    never create the store in a gunicorn master.
+    """
+
+    def __init__(self, path: str = ":memory:", max_pending_writes: int = 10000):
+        self.path = path
+        self.shared = path != ":memory:"
+        self.owner = f"{os.getpid()}-{id(self):x}"
+        self._slot_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        if self.shared:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key));"
+            "CREATE INDEX IF NOT EXISTS kv_expiry ON kv (namespace, expires_at);"
+            "CREATE TABLE IF NOT EXISTS kv_sizes (namespace TEXT PRIMARY KEY, entries INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO kv_sizes (namespace, entries) SELECT namespace, COUNT(*) FROM kv GROUP BY namespace;"
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " name TEXT NOT NULL, window INTEGER NOT NULL, value REAL NOT NULL,"
+            " PRIMARY KEY (name, window));"
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);"
+        )
+        if self.shared:
+            self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            self._read_lock = threading.Lock()
+        else:
+            self._reader = self._conn
+            self._read_lock = self._lock
+        self.dropped_writes = 0
+        self._writes: "queue.Queue" = queue.Queue(maxsize=max_pending_writes)
+        self._writer: Optional[threading.Thread] = None
+        if self.shared:
+            self._writer = threading.Thread(target=self._write_loop, name="shared-state-writer", daemon=True)
+            self._writer.start()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            try:
+                if item is None:
+                    return
+                fn, args = item
+                fn(*args)
+            except Exception:
+                logger.exception("Shared state write failed")
+            finally:
+                self._writes.task_done()
+
+    def submit(self, fn: Callable[..., Any], *args):
+        """Run ``fn(*args)`` on the writer thread and return at once.
+
+        Meant for best-effort writes such as cache fills: writes run in
+        submission order, and when the queue is full the write is dropped and
+        counted instead of blocking the caller. In-memory stores run it inline.
+        Returns False if the write was dropped.
+        """
+        if self._writer is None:
+            fn(*args)
+            return True
+        try:
+            self._writes.put_nowait((fn, args))
+            return True
+        except queue.Full:
+            self.dropped_writes += 1
+            return False
+
+    def flush(self):
+        """Wait until every submitted write has run"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def fetch(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        """JSON text and expiry time of a live entry"""
+        with self._read_lock:
+            return self._reader.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+
+    def get(self, namespace: str, key: str) -> Any:
+        row = self.fetch(namespace, key)
+        return json.loads(row[0]) if row else None
+
+    def _resize(self, namespace: str, delta: int) -> int:
+        self._conn.execute(
+            "INSERT INTO kv_sizes (namespace, entries) VALUES (?, ?) "
+            "ON CONFLICT (namespace) DO UPDATE SET entries = entries + excluded.entries",
+            (namespace, delta)
+        )
+        return self._conn.execute("SELECT entries FROM kv_sizes WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    def put(self, namespace: str, key: str, text: str, expires_at: float, maxsize: Optional[int] = None) -> int:
+        """Store JSON text; with ``maxsize``, evict down to it.
+
+        The namespace size is tracked as entries are added and removed, so no
+        write has to count the table. Once it passes ``maxsize``, expired
+        entries are purged first, then the live ones closest to expiry.
+        Returns how many live entries were evicted.
+        """
+        with self._transaction() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, text, expires_at)
+            )
+            if exists:
+                return 0
+            size = self._resize(namespace, 1)
+            if maxsize is None or size <= maxsize:
+                return 0
+            expired = conn.execute(
+                "DELETE FROM kv WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+            ).rowcount
+            evicted = conn.execute(
+                "DELETE FROM kv WHERE rowid IN (SELECT rowid FROM kv WHERE namespace = ? "
+                "ORDER BY expires_at LIMIT ?)", (namespace, max(0, size - expired - maxsize))
+            ).rowcount
+            self._resize(namespace, -(expired + evicted))
+        return evicted
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        self.put(namespace, key, json.dumps(value), time.time() + ttl)
+
+    def claim(self, namespace: str, key: str, value: Any, ttl: float, stale: Any = None) -> Any:
+        """Store ``value`` unless another live value (other than ``stale``) is already there.
+
+        Returns whichever value is stored afterwards, so concurrent claimers
+        all agree on one winner.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            current = json.loads(row[0]) if row and row[1] > now else None
+            if current is None or current == stale:
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), now + ttl)
+                )
+                if row is None:
+                    self._resize(namespace, 1)
+                current = value
+        return current
+
+    def delete(self, namespace: str, key: Optional[str] = None):
+        """Delete one entry, or the whole namespace when ``key`` is None"""
+        with self._transaction() as conn:
+            if key is None:
+                conn.execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM kv_sizes WHERE namespace = ?", (namespace,))
+            else:
+                removed = conn.execute(
+                    "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+                ).rowcount
+                if removed:
+                    self._resize(namespace, -removed)
+
+    def keys(self, namespace: str) -> List[str]:
+        with self._read_lock:
+            return [row[0] for row in self._reader.execute(
+                "SELECT key FROM kv WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+            )]
+
+    def items(self, namespace: str) -> List[Tuple[str, Any]]:
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT key, value FROM kv WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def size(self, namespace: str) -> int:
+        """Entries held in a namespace, including expired ones not yet purged"""
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT entries FROM kv_sizes WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, name: str, amount: float = 1.0, window: Optional[float] = None) -> float:
+        """Atomically add to a counter and return the new value.
+
+        With ``window`` (seconds) the counter restarts in every fixed window,
+        which is what a requests-per-window rate limit needs.
+        """
+        bucket = int(time.time() // window) if window else 0
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO counters (name, window, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (name, window) DO UPDATE SET value = value + excluded.value",
+                (name, bucket, amount)
+            )
+            value = conn.execute(
+                "SELECT value FROM counters WHERE name = ? AND window = ?", (name, bucket)
+            ).fetchone()[0]
+            if window:
+                conn.execute("DELETE FROM counters WHERE name = ? AND window < ?", (name, bucket))
+        return value
+
+    def acquire_lease(self, name: str, ttl: float) -> bool:
+        """Take or renew a named lease; only one process holds it until it lapses"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+                (name, self.owner, now + ttl, now)
+            )
+        return cursor.rowcount > 0
+
+    def acquire_slot(self, prefix: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` leases named ``prefix...`` across all processes.
+
+        Returns the new lease's name, or None while ``limit`` live ones are
+        held. Slots of a process that died lapse after ``ttl``; holders keep
+        theirs alive with ``renew_leases``.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM leases WHERE substr(name, 1, length(?)) = ? AND expires_at <= ?", (prefix, prefix, now)
+            )
+            held = conn.execute(
+                "SELECT COUNT(*) FROM leases WHERE substr(name, 1, length(?)) = ?", (prefix, prefix)
+            ).fetchone()[0]
+            if held >= limit:
+                return None
+            name = f"{prefix}{self.owner}-{next(self._slot_ids)}"
+            conn.execute("INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, self.owner, now + ttl))
+        return name
+
+    def renew_leases(self, names: List[str], ttl: float):
+        """Extend the named leases this process holds"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                [(time.time() + ttl, name, self.owner) for name in names]
+            )
+
+    def count_leases(self, prefix: str) -> int:
+        """Live leases whose name starts with ``prefix``, not counting this process's own"""
+        with self._read_lock:
+            return self._reader.execute(
+                "SELECT COUNT(*) FROM leases WHERE substr(name, 1, length(?)) = ? AND owner != ? AND expires_at > ?",
+                (prefix, prefix, self.owner, time.time())
+            ).fetchone()[0]
+
+    def release_lease(self, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._read_lock:
+            entries = self._reader.execute("SELECT COALESCE(SUM(entries), 0) FROM kv_sizes").fetchone()[0]
+        return {
+            "path": self.path,
+            "shared": self.shared,
+            "entries": entries,
+            "pending_writes": self._writes.qsize(),
+            "dropped_writes": self.dropped_writes
+        }
+
+    def close(self):
+        """Finish queued writes, then close the connections"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join(timeout=5.0)
+            self._reader.close()
+        self._conn.close()
+
+class SharedTTLCache:
+    """Drop-in replacement for TTLCache whose entries live in a SharedStore.
+
+    Keys are tuples of strings and numbers, values anything JSON can encode.
+    Entries read or written here are also held in-process for up to
+    ``local_ttl`` seconds and shared writes go through the store's writer
+    thread, so neither a hit nor a fill waits on SQLite. The cost is that an
+    invalidation in another worker can take ``local_ttl`` to show here.
+    Once ``maxsize`` entries are held the ones closest to expiry are dropped,
+    which approximates LRU without writing on every read. Hit and miss
+    counters are per process.
+    """
+
+    def __init__(self, store: SharedStore, namespace: str, maxsize: int = 512, ttl: float = 30.0,
+                 local_ttl: float = 1.0):
+        self.store = store
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local = TTLCache(maxsize=maxsize, ttl=local_ttl)
+        # discard_matching predicates whose shared delete is still queued
+        self._pending_discards: List[Callable[[Hashable], bool]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key)
+
+    @staticmethod
+    def _decode_key(text: str) -> Hashable:
+        """Inverse of ``_key`` for tuple keys (JSON turns the tuples into lists)"""
+        def freeze(value):
+            return tuple(freeze(v) for v in value) if isinstance(value, list) else value
+        return freeze(json.loads(text))
+
+    def _lookup(self, key: Hashable) -> Any:
+        """JSON text of a live entry, _DISCARDED or _MISSING"""
+        text = self._local.get(key, _MISSING)
+        if text is _MISSING:
+            if any(predicate(key) for predicate in tuple(self._pending_discards)):
+                return _DISCARDED
+            row = self.store.fetch(self.namespace, self._key(key))
+            if row is None:
+                return _MISSING
+            text, expires_at = row
+            self._local.set(key, text, ttl=min(self.local_ttl, expires_at - time.time()))
+        return text
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        text = self._lookup(key)
+        if text is _MISSING or text is _DISCARDED:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(text)
+
+    def __contains__(self, key: Hashable) -> bool:
+        text = self._lookup(key)
+        return text is not _MISSING and text is not _DISCARDED
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        text = json.dumps(value)
+        self._local.set(key, text, ttl=min(self.local_ttl, ttl))
+        self.store.submit(self._put, self._key(key), text, time.time() + ttl)
+
+    def _put(self, key: str, text: str, expires_at: float):
+        self.evictions += self.store.put(self.namespace, key, text, expires_at, maxsize=self.maxsize)
+
+    def discard(self, key: Hashable):
+        self._local.set(key, _DISCARDED)
+        self.store.submit(self.store.delete, self.namespace, self._key(key))
+
+    def discard_matching(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key satisfies ``predicate``.
+
+        The shared keys are scanned on the writer thread; until that is done,
+        lookups here treat matching keys as discarded rather than reading them.
+        """
+        self._local.discard_matching(predicate)
+        self._pending_discards.append(predicate)
+        # Queued behind pending fills, so entries written just before are caught too
+        if not self.store.submit(self._delete_matching, predicate):
+            self._pending_discards.remove(predicate)
+
+    def _delete_matching(self, predicate: Callable[[Hashable], bool]):
+        try:
+            for key in self.store.keys(self.namespace):
+                if predicate(self._decode_key(key)):
+                    self.store.delete(self.namespace, key)
+        finally:
+            self._pending_discards.remove(predicate)
+
+    def clear(self):
+        self._local.clear()
+        self.store.submit(self.store.delete, self.namespace)
+
+    def __len__(self) -> int:
+        return self.store.size(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "shared",
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "local_ttl_s": self.local_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None
+        }
+
+class RateLimiter:
+    """Fixed-window request limit per client, counted in the SharedStore so it holds across workers.
+
+    ``check`` writes to the store; async callers run it with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, store: SharedStore, limit: int, window: float = 60.0, name: str = "rate"):
+        self.store = store
+        self.limit = limit
+        self.window = window
+        self.name = name
+        self.rejected = 0
+
+    def check(self, client: str) -> Optional[float]:
+        """Count one request; returns None if allowed, else seconds until the window resets"""
+        if self.limit <= 0:
+            return None
+        if self.store.incr(f"{self.name}:{client}", window=self.window) <= self.limit:
+            return None
+        self.rejected += 1
+        return self.window - time.time() % self.window
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "window_s": self.window, "rejected": self.rejected}
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one in-flight task.
+
+    The first caller for a key starts ``fn()`` as a task; callers arriving
+    with the same key while it runs await that task instead of starting their
+    own, and every caller gets its result or exception. The task runs under
+    a per-key timeout and is shielded, so a caller that disconnects does not
+    cancel work other callers are waiting on. Only reads should go through
+    here: writes must never be deduplicated.
+    """
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(self._run(key, fn, self.timeout if timeout is None else timeout))
+            # Retrieve the exception even if every caller has gone away
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        try:
+            return await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("Coalesced call timed out after %ss", timeout)
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
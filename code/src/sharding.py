@@ -0,0 +1,104 @@
+"""
+Shared helpers for running the data generators as parallel shards.
+
+A run of ``count`` rows is split into ``shards`` contiguous slices. Each
+shard draws from its own ``random.Random`` seeded from the run seed and the
+shard number, and is given its row offset, so the rows (and the explicit ids
+derived from the offset) depend only on the seed and shard count, never on
+which process ran a shard or in what order. Shards run in a process pool,
+each worker opening its own database connection, and report progress
+through a shared counter that the parent aggregates.
+"""
+
+import time
+import random
+import multiprocessing
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+_progress = None
+
+class Shard(NamedTuple):
+    index: int
+    offset: int  # Position of the shard's first row in the whole run
+    size: int
+    seed: Optional[int]
+
+    def rng(self) -> random.Random:
+        """The shard's own generator; unseeded runs draw from OS entropy"""
+        if self.seed is None:
+            return random.Random()
+        # String seeds are hashed with SHA-512, so shard streams are unrelated
+        return random.Random(f"{self.seed}:{self.index}")
+
+def plan_shards(count: int, shards: int, seed: Optional[int]) -> List[Shard]:
+    """Split ``count`` rows into ``shards`` slices whose sizes differ by at most one"""
+    shards = max(1, min(shards, count)) if count else 1
+    base, extra = divmod(count, shards)
+    plan = []
+    offset = 0
+    for index in range(shards):
+        size = base + (1 if index < extra else 0)
+        plan.append(Shard(index, offset, size, seed))
+        offset += size
+    return plan
+
+def written_id_ranges(first_id: int, shards: Sequence[Shard], inserted: Sequence[int]) -> List[Tuple[int, int]]:
+    """Id ranges actually committed by the shards, merging adjacent ones"""
+    ranges: List[Tuple[int, int]] = []
+    for shard, count in zip(shards, inserted):
+        if not count:
+            continue
+        start = first_id + shard.offset
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], start + count - 1)
+        else:
+            ranges.append((start, start + count - 1))
+    return ranges
+
+def parse_base_date(value: Optional[str]) -> datetime:
+    """``--base-date`` as a datetime; defaults to today at midnight so same-day runs match"""
+    if value:
+        return datetime.strptime(value, '%Y-%m-%d')
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def report_progress(rows: int):
+    """Called by shard workers after each committed batch"""
+    if _progress is not None:
+        with _progress.get_lock():
+            _progress.value += rows
+
+def _init_worker(counter):
+    global _progress
+    _progress = counter
+
+def run_shards(task: Callable, jobs: Sequence, total: int, processes: Optional[int] = None,
+               label: str = "rows", log: Callable[[str], None] = print,
+               interval: float = 5.0) -> list:
+    """Run ``task(job)`` for every job in a process pool and return the results in job order.
+
+    While the pool runs, progress from ``report_progress`` is summed and
+    logged every ``interval`` seconds and at completion. An exception in any
+    shard is re-raised here once the pool has stopped.
+    """
+    context = multiprocessing.get_context()
+    counter = context.Value('q', 0)
+    processes = min(processes or context.cpu_count(), len(jobs)) or 1
+    started = time.perf_counter()
+    next_log = started + interval
+
+    with context.Pool(processes, initializer=_init_worker, initargs=(counter,)) as pool:
+        pending = pool.map_async(task, jobs, chunksize=1)
+        while True:
+            finished = pending.ready()
+            done = counter.value
+            now = time.perf_counter()
+            if finished or now >= next_log:
+                elapsed = now - started
+                log("Progress: %d/%d %s (%.1f%%, %.0f %s/sec, %d shards on %d processes)" % (
+                    done, total, label, 100.0 * done / total if total else 100.0,
+                    done / elapsed if elapsed > 0 else 0, label, len(jobs), processes))
+                next_log = now + interval
+            if finished:
+                return pending.get()
+            pending.wait(0.2)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Load test for the chat backend against local GLPI and Ollama stand-ins.
+
+Starts FakeGLPI and FakeOllama (see standins.py), serves ``main.app`` with
+uvicorn on a local port, then drives ``/chat`` (or ``/chat/stream``) at a fixed
+concurrency with a weighted mix of ticket lookups, ticket creations and free
+chat. Prints one JSON report (p50/p95/p99 latency, requests/sec, error rate,
+per-kind breakdown) so runs can be compared across commits. Runs offline on a
+CPU-only box.
+
+    python bench_chat_load.py --requests 300 --concurrency 16 \\
+        --mix lookup=4,create=1,chat=5 --tokens-per-second 30 --output run.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from standins import COMPONENTS, ISSUES, FakeGLPI, FakeOllama
+
+MESSAGES = {
+    "lookup": [
+        "show me ticket #{id}",
+        "Can you find ticket #{id}? Is it still open?",
+        "get the recent tickets",
+    ],
+    "create": [
+        "Please create an urgent ticket: {component} - {issue}",
+        "open a new ticket, the printer in room {room} is not printing",
+    ],
+    "chat": [
+        "Is the {component} cluster down?",
+        "How do I fix {issue} on {component}?",
+        "Any known problem with {component} right now?",
+        "How do I reset my VPN password?",
+    ],
+}
+
+def parse_mix(spec: str):
+    weights = {}
+    for part in spec.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in MESSAGES:
+            raise argparse.ArgumentTypeError(f"unknown message kind {kind!r}")
+        weights[kind] = float(weight or 1)
+    return weights
+
+def build_requests(count: int, mix, seed: int, tickets: int):
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [
+        (kind, rng.choice(MESSAGES[kind]).format(
+            id=rng.randint(1, tickets),
+            component=rng.choice(COMPONENTS),
+            issue=rng.choice(ISSUES),
+            room=rng.randint(100, 599),
+        ))
+        for kind in kinds
+    ]
+
+def percentile(samples, pct: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 1)
+
+def summarize(latencies):
+    return {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'max': round(max(latencies), 1) if latencies else None,
+        'mean': round(statistics.fmean(latencies), 1) if latencies else None,
+    }
+
+def start_backend(port: int):
+    """Serve main.app with uvicorn in a background thread"""
+    import uvicorn
+    import main
+    server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port,
+                                          log_level='warning', lifespan='on'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+async def drive(base_url: str, requests, concurrency: int, endpoint: str, bypass_cache: bool, timeout: float):
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    results = []
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            try:
+                kind, message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json={'message': message, 'bypass_cache': bypass_cache})
+                if endpoint == '/chat/stream':
+                    ok = response.status_code == 200 and 'event: done' in response.text
+                else:
+                    ok = response.status_code == 200
+                status = response.status_code
+            except httpx.HTTPError as e:
+                ok, status = False, type(e).__name__
+            results.append((kind, ok, status, (time.perf_counter() - start) * 1000))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+def report(results, elapsed: float, config: dict) -> dict:
+    latencies = [ms for _, ok, _, ms in results if ok]
+    statuses = {}
+    for _, _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    by_kind = {}
+    for kind in MESSAGES:
+        rows = [r for r in results if r[0] == kind]
+        if rows:
+            by_kind[kind] = {
+                'requests': len(rows),
+                'errors': sum(1 for r in rows if not r[1]),
+                'latency_ms': summarize([r[3] for r in rows if r[1]]),
+            }
+    return {
+        'config': config,
+        'requests': len(results),
+        'duration_s': round(elapsed, 3),
+        'requests_per_second': round(len(results) / elapsed, 2),
+        'error_rate': round(sum(1 for r in results if not r[1]) / len(results), 4) if results else None,
+        'status_codes': statuses,
+        'latency_ms': summarize(latencies),
+        'by_kind': by_kind,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('lookup=4,create=1,chat=5'))
+    parser.add_argument('--endpoint', choices=['/chat', '/chat/stream'], default='/chat')
+    parser.add_argument('--bypass-cache', action='store_true', help="ask the backend not to reuse cached replies")
+    parser.add_argument('--glpi-latency', type=float, default=0.01, help="seconds per GLPI call")
+    parser.add_argument('--first-token-latency', type=float, default=0.2, help="seconds before Ollama's first token")
+    parser.add_argument('--tokens-per-second', type=float, default=40.0)
+    parser.add_argument('--tokens', type=int, default=40, help="tokens per generated reply")
+    parser.add_argument('--ollama-parallel', type=int, default=2, help="generations Ollama runs at once")
+    parser.add_argument('--llm-concurrency', type=int, default=None, help="sets LLM_MAX_CONCURRENCY")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    glpi = FakeGLPI(latency=args.glpi_latency, seed=args.seed).start()
+    ollama = FakeOllama(first_token_latency=args.first_token_latency,
+                        tokens_per_second=args.tokens_per_second,
+                        tokens=args.tokens, parallel=args.ollama_parallel).start()
+    workdir = tempfile.mkdtemp(prefix='chat-load-')
+    os.environ.update({
+        'GLPI_URL': glpi.url,
+        'GLPI_APP_TOKEN': 'bench',
+        'GLPI_USER_TOKEN': 'bench',
+        'OLLAMA_BASE_URL': ollama.url,
+        'VECTOR_STORE_PATH': os.path.join(workdir, 'vector_store'),
+    })
+    if args.llm_concurrency:
+        os.environ['LLM_MAX_CONCURRENCY'] = str(args.llm_concurrency)
+
+    requests = build_requests(args.requests, args.mix, args.seed, len(glpi.tickets))
+    # The backend logs to stdout (the logging pipeline binds it on import); keep stdout for the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        server, thread = start_backend(args.port)
+        logging.getLogger().setLevel(logging.WARNING)
+        results, elapsed = asyncio.run(drive(
+            f"http://127.0.0.1:{args.port}", requests, args.concurrency,
+            args.endpoint, args.bypass_cache, args.timeout
+        ))
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    config['glpi_calls'] = glpi.calls
+    config['ollama_generations'] = ollama.generations
+    result = report(results, elapsed, config)
+    glpi.stop()
+    ollama.stop()
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
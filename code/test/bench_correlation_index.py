@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Memory and latency benchmark for the change correlation index.
+
+Generates ``--changes`` synthetic changes shaped like generate_changes_new.py
+(component types, 1-3 linked incidents each, dates over the last year), then
+reports:
+
+* full build time and an incremental update of ``--modified`` changes,
+* memory held by the index (tracemalloc, after the input rows are freed)
+  next to a plain dict-of-dicts representation of the same data,
+* lookup latency (p50/p95, µs) for a ticket's linked changes, a component's
+  recent changes, and the combined ``correlate`` used by the chat backend.
+
+    python bench_correlation_index.py --changes 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from correlation_index import ChangeCorrelationIndex
+
+# Component types and scenarios from generate_changes_new.py
+CHANGE_TYPES = {
+    "Azure VM": ["OS upgrade", "Network configuration update", "Storage expansion"],
+    "Azure AKS": ["Kubernetes version upgrade", "Node pool expansion", "Autoscaling implementation"],
+    "Azure SQL": ["Database performance tuning", "Backup policy update", "Query optimization"],
+    "Azure SQL MI": ["Instance sizing update", "Read replica deployment", "Geo-replication setup"],
+    "Azure ASE": ["App Service scaling", "SSL certificate rotation", "Runtime version upgrade"],
+    "GCP VM": ["Instance resize", "OS patching", "Startup script modification"],
+    "GCP GKE": ["Cluster upgrade", "Network policy update", "Workload identity configuration"],
+    "GCP Cloud SQL": ["Instance scaling", "Maintenance window adjustment", "Read replica creation"],
+}
+
+def synthetic_rows(count: int, tickets: int, seed: int):
+    rng = random.Random(seed)
+    components = list(CHANGE_TYPES)
+    changes, links = [], []
+    for change_id in range(1, count + 1):
+        component = rng.choice(components)
+        date = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(1735689600 + rng.randint(0, 365 * 86400)))
+        changes.append({
+            'id': change_id,
+            'name': f"{component} - {rng.choice(CHANGE_TYPES[component])}",
+            'status': rng.randint(1, 8),
+            'date': date,
+            'date_mod': date,
+        })
+        for ticket_id in rng.sample(range(1, tickets + 1), rng.randint(1, 3)):
+            links.append({'id': len(links) + 1, 'changes_id': change_id, 'tickets_id': ticket_id})
+    return changes, links
+
+def retained_bytes(build):
+    """Bytes still allocated after ``build()`` returns, keeping its result alive"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def naive(changes, links):
+    by_id = {c['id']: dict(c) for c in changes}
+    by_ticket = {}
+    for link in links:
+        by_ticket.setdefault(link['tickets_id'], []).append(by_id[link['changes_id']])
+    return by_id, by_ticket
+
+def latency_us(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1e6)
+    ordered = sorted(samples)
+    return {
+        'p50_us': round(statistics.median(samples), 1),
+        'p95_us': round(ordered[int(0.95 * (len(ordered) - 1))], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--changes', type=int, default=100000)
+    parser.add_argument('--tickets', type=int, default=50000, help="incidents the changes link to")
+    parser.add_argument('--modified', type=int, default=100, help="changes re-sent by the incremental update")
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    changes, links = synthetic_rows(args.changes, args.tickets, args.seed)
+    report = {'changes': len(changes), 'links': len(links), 'tickets': args.tickets}
+
+    def build():
+        index = ChangeCorrelationIndex()
+        index.update(changes, links)
+        return index
+
+    start = time.perf_counter()
+    build()
+    report['build_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    index, index_bytes = retained_bytes(build)
+    _, naive_bytes = retained_bytes(lambda: naive(changes, links))
+    report['memory'] = {
+        'index_bytes': index_bytes,
+        'index_bytes_per_change': round(index_bytes / len(changes), 1),
+        'dict_of_dicts_bytes': naive_bytes,
+        'dict_of_dicts_bytes_per_change': round(naive_bytes / len(changes), 1),
+    }
+    report['index'] = index.stats()
+
+    rng = random.Random(args.seed + 1)
+    modified = [dict(c, date_mod='2026-12-31 00:00:00', status=7) for c in rng.sample(changes, args.modified)]
+    start = time.perf_counter()
+    index.update(modified)
+    report['incremental_update_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    ticket_ids = [(rng.randint(1, args.tickets),) for _ in range(args.lookups)]
+    components = [(rng.choice(list(CHANGE_TYPES)),) for _ in range(args.lookups)]
+    named = [(t, f"{rng.choice(list(CHANGE_TYPES))} - Node not ready") for (t,) in ticket_ids]
+    report['lookup'] = {
+        'changes_for_ticket': latency_us(index.changes_for_ticket, ticket_ids),
+        'recent_changes': latency_us(index.recent_changes, components),
+        'correlate': latency_us(index.correlate, named),
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for the async GLPI client.
+
+Runs N ticket lookups against an in-process GLPI stand-in that answers each
+request after a fixed delay, and verifies the calls overlap instead of
+serializing: total wall time must stay close to one delay, not N of them.
+
+    python bench_glpi_async_concurrency.py --calls 20 --delay 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from glpi_async import AsyncGLPI
+
+def make_transport(delay: float) -> httpx.MockTransport:
+    """GLPI stand-in that delays every ticket read"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith('/initSession'):
+            return httpx.Response(200, json={'session_token': 'bench'})
+        if request.url.path.endswith('/killSession'):
+            return httpx.Response(200, json={})
+        await asyncio.sleep(delay)
+        ticket_id = int(request.url.path.rsplit('/', 1)[1])
+        return httpx.Response(200, json={'id': ticket_id, 'name': f'Ticket {ticket_id}', 'status': 1})
+    return httpx.MockTransport(handler)
+
+async def run(calls: int, delay: float) -> dict:
+    http = httpx.AsyncClient(transport=make_transport(delay))
+    client = AsyncGLPI('http://glpi.test/apirest.php', 'app', 'user', http=http)
+    await client.init_session()
+
+    start = time.perf_counter()
+    tickets = await asyncio.gather(*(client.get_ticket_by_id(i) for i in range(1, calls + 1)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    return {
+        'calls': calls,
+        'delay_s': delay,
+        'elapsed_s': round(elapsed, 4),
+        'serialized_s': round(calls * delay, 4),
+        'speedup': round(calls * delay / elapsed, 2),
+        'all_ok': all(t.get('id') == i for i, t in enumerate(tickets, start=1)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.calls, args.delay))
+    print(json.dumps(result, indent=2))
+
+    # Overlapping calls finish in roughly one delay; allow generous scheduling slack
+    if not result['all_ok'] or result['elapsed_s'] > args.delay * 3:
+        print("FAIL: GLPI calls did not overlap", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Bulk ticket creation/update benchmark.
+
+Starts a local HTTP GLPI stand-in that adds a fixed latency to every request
+(plus a small per-item cost), then creates and updates ``--tickets`` tickets:
+
+* one at a time with ``GLPI.create_ticket`` / ``update_ticket``,
+* with ``AsyncGLPI.create_tickets_bulk`` / ``update_tickets_bulk`` (concurrent chunks),
+
+and reports tickets/sec, HTTP calls and per-item result correctness.
+
+    python bench_glpi_bulk.py --tickets 200 --latency 0.02 --chunk-size 50
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from glpi_api import GLPI
+from glpi_async import AsyncGLPI
+
+class StandIn:
+    """Counts calls and assigns ticket ids; items named "reject" fail like a GLPI 207 item"""
+
+    def __init__(self, latency: float, per_item: float):
+        self.latency = latency
+        self.per_item = per_item
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def handle(self, method: str, path: str, body):
+        with self._lock:
+            self.calls += 1
+        if path.endswith('/initSession'):
+            return 200, {'session_token': 'bench'}
+        if path.endswith('/killSession'):
+            return 200, {}
+        payload = body['input']
+        items = payload if isinstance(payload, list) else [payload]
+        time.sleep(self.latency + self.per_item * len(items))
+
+        results = []
+        for item in items:
+            rejected = item.get('name') == 'reject'
+            if method == 'POST':
+                results.append({'id': False if rejected else next(self._ids),
+                                'message': 'Rejected' if rejected else ''})
+            else:
+                ticket_id = item.get('id') or path.rsplit('/', 1)[1]
+                results.append({str(ticket_id): not rejected, 'message': 'Rejected' if rejected else ''})
+        if not isinstance(payload, list):
+            return 201, results[0]
+        return (207 if any(item.get('name') == 'reject' for item in items) else 201), results
+
+def serve(stand_in: StandIn) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _dispatch(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            code, result = stand_in.handle(self.command, self.path.split('?')[0], body)
+            data = json.dumps(result).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PUT = _dispatch
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def tickets(count: int):
+    items = [{'name': f'Azure AKS - Node not ready #{i}', 'content': 'Alert', 'priority': 3}
+             for i in range(count)]
+    # One bad item shows that errors are reported per item, not per batch
+    items[count // 2]['name'] = 'reject'
+    return items
+
+def measure(stand_in: StandIn, fn) -> dict:
+    calls_before = stand_in.calls
+    start = time.perf_counter()
+    results = fn()
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'tickets_per_s': round(len(results) / elapsed, 1),
+        'http_calls': stand_in.calls - calls_before,
+        'ok': sum(1 for ok in results if ok),
+        'failed': sum(1 for ok in results if not ok),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every GLPI call")
+    parser.add_argument('--per-item', type=float, default=0.0005, help="seconds added per ticket in a call")
+    parser.add_argument('--chunk-size', type=int, default=50)
+    args = parser.parse_args()
+
+    stand_in = StandIn(args.latency, args.per_item)
+    server = serve(stand_in)
+    url = f'http://127.0.0.1:{server.server_port}/apirest.php'
+    items = tickets(args.tickets)
+    report = {'tickets': args.tickets, 'latency_s': args.latency, 'chunk_size': args.chunk_size}
+
+    client = GLPI(url, 'app', 'user')
+    client.init_session()
+    report['create_one_at_a_time'] = measure(stand_in, lambda: [
+        bool(client.create_ticket(item).get('id')) for item in items
+    ])
+    updates = [dict(item, id=i + 1, status=2) for i, item in enumerate(items)]
+    report['update_one_at_a_time'] = measure(stand_in, lambda: [
+        bool(client.update_ticket(u['id'], u).get(str(u['id']))) for u in updates
+    ])
+    client.close()
+
+    async def run_bulk(action: str, payload):
+        async_client = AsyncGLPI(url, 'app', 'user')
+        await async_client.init_session()
+        if action == 'create':
+            results = await async_client.create_tickets_bulk(payload, args.chunk_size)
+        else:
+            results = await async_client.update_tickets_bulk(payload, args.chunk_size)
+        await async_client.close()
+        return [r['ok'] for r in results]
+
+    for action, payload in (('create', items), ('update', updates)):
+        report[f'{action}_bulk'] = measure(stand_in, lambda: asyncio.run(run_bulk(action, payload)))
+        # Subtract the init/kill session calls
+        report[f'{action}_bulk']['http_calls'] -= 2
+    server.shutdown()
+
+    for action in ('create', 'update'):
+        single = report[f'{action}_one_at_a_time']['tickets_per_s']
+        report[f'{action}_speedup'] = round(report[f'{action}_bulk']['tickets_per_s'] / single, 1)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Incident sampling cost of generate_changes_new.fetch_incidents as glpi_tickets grows.
+
+Fills a scratch ``glpi_tickets`` table in its own database (``--database``,
+dropped and recreated) with generate_incidents rows, ``--request-share`` of
+them requests rather than incidents, and at every ``--sizes`` step times:
+
+* ``order_by_rand``: the previous query, six columns including ``content``,
+  ``ORDER BY RAND(seed) LIMIT``
+* ``range``: fetch_incidents' random primary-key probes
+* ``reservoir``: fetch_incidents' streaming pass on a server-side cursor
+
+Needs a MySQL/MariaDB server. DB_HOST, DB_USER and DB_PASSWORD are read as
+by the generators; the user needs CREATE and DROP on the scratch database.
+
+    python bench_incident_sampling.py --sizes 10000,100000,1000000 --limit 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import MySQLdb
+
+from generate_changes_new import db_config, fetch_incidents
+from generate_incidents import INCIDENT_COLUMNS, batched, insert_multirow, iter_incidents
+
+TABLE_DDL = """
+CREATE TABLE glpi_tickets (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT,
+    name VARCHAR(255) DEFAULT NULL,
+    content LONGTEXT,
+    date TIMESTAMP NULL DEFAULT NULL,
+    date_creation TIMESTAMP NULL DEFAULT NULL,
+    date_mod TIMESTAMP NULL DEFAULT NULL,
+    priority INT NOT NULL DEFAULT 1,
+    urgency INT NOT NULL DEFAULT 1,
+    impact INT NOT NULL DEFAULT 1,
+    status INT NOT NULL DEFAULT 1,
+    entities_id INT UNSIGNED NOT NULL DEFAULT 0,
+    type INT NOT NULL DEFAULT 1,
+    itilcategories_id INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (id),
+    KEY type (type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+def order_by_rand(connection, limit, seed):
+    """fetch_incidents before the change"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT id, name, content, date, entities_id, priority FROM glpi_tickets "
+            "WHERE type = 1 ORDER BY RAND(%s) LIMIT %s", (seed, limit))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+METHODS = {
+    'order_by_rand': order_by_rand,
+    'range': lambda connection, limit, seed: fetch_incidents(connection, limit, seed, method='range'),
+    'reservoir': lambda connection, limit, seed: fetch_incidents(connection, limit, seed, method='reservoir'),
+}
+
+def grow_table(connection, rows, rng, base_date, request_share, batch_size):
+    """Append ``rows`` tickets; the ``type`` column marks ``request_share`` of them as requests"""
+    type_index = INCIDENT_COLUMNS.index('type')
+    tickets = (
+        row[:type_index] + (2 if rng.random() < request_share else 1,) + row[type_index + 1:]
+        for row in iter_incidents(rows, rng, base_date)
+    )
+    cursor = connection.cursor()
+    try:
+        for batch in batched(tickets, batch_size):
+            insert_multirow(cursor, batch)
+            connection.commit()
+    finally:
+        cursor.close()
+
+def ticket_counts(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(type = 1), 0) FROM glpi_tickets")
+        tickets, incidents = cursor.fetchone()
+        return int(tickets), int(incidents)
+    finally:
+        cursor.close()
+
+def measure(method, connection, limit, seed, repeat):
+    samples = []
+    incidents = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        incidents = METHODS[method](connection, limit, seed)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'ms': {'median': round(statistics.median(samples), 1), 'min': round(min(samples), 1)},
+        'incidents': len(incidents),
+        'distinct': len({incident[0] for incident in incidents}),
+        'columns': len(incidents[0]) if incidents else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help="ticket counts to measure at, ascending")
+    parser.add_argument('--limit', type=int, default=1000, help="incidents to sample (fetch_incidents' default)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--request-share', type=float, default=0.2,
+                        help="fraction of tickets that are requests (type 2), which sampling must skip")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--database', default='glpi_sampling_bench', help="scratch database, dropped and recreated")
+    parser.add_argument('--methods', default=','.join(METHODS))
+    args = parser.parse_args()
+    logging.getLogger('generate_changes_new').setLevel(logging.WARNING)
+
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    methods = [method.strip() for method in args.methods.split(',')]
+    config = {key: value for key, value in db_config.items() if key != 'database'}
+    connection = MySQLdb.connect(**config)
+    cursor = connection.cursor()
+    cursor.execute("DROP DATABASE IF EXISTS `{0}`".format(args.database))
+    cursor.execute("CREATE DATABASE `{0}`".format(args.database))
+    connection.select_db(args.database)
+    cursor.execute(TABLE_DDL)
+    cursor.close()
+
+    rng = random.Random(args.seed)
+    base_date = datetime(2026, 1, 1)
+    runs = []
+    loaded = 0
+    try:
+        for size in sizes:
+            started = time.perf_counter()
+            grow_table(connection, size - loaded, rng, base_date, args.request_share, args.batch_size)
+            loaded = size
+            tickets, incidents = ticket_counts(connection)
+            run = {'tickets': tickets, 'incidents': incidents,
+                   'load_s': round(time.perf_counter() - started, 1)}
+            for method in methods:
+                run[method] = measure(method, connection, args.limit, args.seed, args.repeat)
+            if 'order_by_rand' in run and 'range' in run:
+                run['range_speedup'] = round(
+                    run['order_by_rand']['ms']['median'] / max(run['range']['ms']['median'], 0.01), 1)
+            runs.append(run)
+            print(json.dumps(run), file=sys.stderr)
+    finally:
+        cursor = connection.cursor()
+        cursor.execute("DROP DATABASE IF EXISTS `{0}`".format(args.database))
+        cursor.close()
+        connection.close()
+    print(json.dumps({'config': vars(args), 'runs': runs}, indent=2))
+
+if __name__ == "__main__":
+    main()
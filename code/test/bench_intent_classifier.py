@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the single-pass intent classifier.
+
+Builds a corpus of support-chat messages shaped like the ones in
+server_debug.log (cloud component alerts, ticket lookups, creation requests,
+free chat) and times the compiled classifier against the original chain of
+``message.lower()`` / ``any(word in ...)`` scans from main.py and glpi_api.py,
+counting the messages where the two disagree. test_intent_classifier.py
+covers the intended differences.
+
+    python bench_intent_classifier.py --messages 20000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from intent_classifier import IntentClassifier
+
+COMPONENTS = [
+    "Azure AKS", "Azure VM", "Azure SQL MI", "Azure ASE",
+    "GCP GKE", "GCP Compute Engine", "GCP Cloud SQL",
+]
+ISSUES = [
+    "Node not ready", "SSL certificate expired", "High CPU utilization",
+    "Replication lag", "Load balancer misconfiguration", "Backup failure",
+    "Control plane unresponsive", "Network latency spike",
+]
+TEMPLATES = [
+    "show me ticket #{id}",
+    "Can you find the ticket #{id} about {component}?",
+    "What is the status of ticket #{id}? The {component} problem is still there",
+    "Please create an urgent ticket: {component} - {issue}",
+    "Open a new high priority ticket, {issue} on {component} in room {room}",
+    "create a low priority ticket, the printer in room {room} is not printing",
+    "My monitor keeps flickering, can you open a ticket?",
+    "wifi connection drops every few minutes, new issue please",
+    "get me the recent tickets for {component}",
+    "search tickets related to {issue}",
+    "Is the {component} cluster down?",
+    "Any known issue with {component} right now?",
+    "Thanks, that solved it!",
+    "How do I reset my VPN password?",
+]
+
+def build_corpus(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            id=rng.randint(1, 50000),
+            component=rng.choice(COMPONENTS),
+            issue=rng.choice(ISSUES),
+            room=rng.randint(100, 599),
+        )
+        for _ in range(count)
+    ]
+
+def legacy_classify(message: str):
+    """The keyword scans main.py and glpi_api.py ran before the classifier"""
+    is_ticket = any(word in message.lower() for word in ["ticket", "issue", "problem"])
+    intent = None
+    priority = 3
+    ticket_id = None
+    if any(word in message.lower() for word in ["create", "new", "open"]):
+        intent = "create"
+        if "high priority" in message.lower() or "urgent" in message.lower():
+            priority = 4
+        elif "low priority" in message.lower():
+            priority = 2
+    elif any(word in message.lower() for word in ["show", "get", "find", "search"]):
+        intent = "show"
+        if "ticket #" in message.lower() or "#" in message:
+            ticket_match = re.search(r'#(\d+)', message)
+            if ticket_match:
+                ticket_id = int(ticket_match.group(1))
+    location = None
+    if "room" in message.lower():
+        room_match = re.search(r'room\s+(\d+)', message.lower())
+        if room_match:
+            location = int(room_match.group(1))
+    category = 0
+    if any(word in message.lower() for word in ["printer", "printing", "scanner"]):
+        category = 1
+    elif any(word in message.lower() for word in ["monitor", "screen", "display"]):
+        category = 2
+    elif any(word in message.lower() for word in ["network", "internet", "wifi", "connection"]):
+        category = 3
+    return is_ticket, intent, priority, category, location, ticket_id
+
+def as_legacy(classifier: IntentClassifier, message: str):
+    """The classifier's result in legacy_classify's shape (priority and ticket id only under their intents)"""
+    result = classifier.classify(message)
+    return (
+        result.is_ticket_query,
+        result.intent,
+        result.priority if result.intent == "create" else 3,
+        result.category_id,
+        result.location,
+        result.ticket_id if result.intent == "show" else None,
+    )
+
+def time_it(fn, corpus, repeat: int) -> float:
+    """Best-of-N seconds for one pass over the corpus"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in corpus:
+            fn(message)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    classifier = IntentClassifier()
+
+    mismatches = sum(as_legacy(classifier, message) != legacy_classify(message) for message in corpus)
+    legacy_s = time_it(legacy_classify, corpus, args.repeat)
+    compiled_s = time_it(classifier.classify, corpus, args.repeat)
+
+    print(json.dumps({
+        'messages': len(corpus),
+        'legacy_us_per_message': round(legacy_s / len(corpus) * 1e6, 3),
+        'classifier_us_per_message': round(compiled_s / len(corpus) * 1e6, 3),
+        'speedup': round(legacy_s / compiled_s, 2),
+        'legacy_mismatches': mismatches,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark for the knowledge base index.
+
+Builds the index from knowledge_base_backup.sql, then reports:
+
+* build time and incremental re-index time for one modified article,
+* query latency (p50/p95) for single queries and for a batch,
+* recall@1 and recall@3, using each article's title and the first sentence
+  of its answer as queries that should retrieve that article,
+* search latency against a synthetic index of ``--scale`` chunks.
+
+    python bench_kb_retrieval.py --scale 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from kb_index import KBIndex, clean_text, read_kb_dump
+
+DUMP_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'knowledge_base_backup.sql')
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def latency_ms(index: KBIndex, queries, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            index.search([query])
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+    }
+
+def batch_ms(index: KBIndex, queries, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search(queries)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+def recall(index: KBIndex, labelled) -> dict:
+    results = index.search([query for query, _ in labelled], k=3, min_score=0.0)
+    at1 = sum(1 for hits, (_, item_id) in zip(results, labelled)
+              if hits and hits[0][1]['item_id'] == item_id)
+    at3 = sum(1 for hits, (_, item_id) in zip(results, labelled)
+              if item_id in [chunk['item_id'] for _, chunk in hits])
+    return {
+        'queries': len(labelled),
+        'recall_at_1': round(at1 / len(labelled), 3),
+        'recall_at_3': round(at3 / len(labelled), 3),
+    }
+
+def labelled_queries(items):
+    """(query, expected article id) pairs from titles and answer openings"""
+    by_title, by_answer = [], []
+    for item in items:
+        item_id = int(item['id'])
+        by_title.append((clean_text(item['name']), item_id))
+        answer = clean_text(item.get('answer', ''))
+        first_sentence = answer.split('. ')[0][:200]
+        if first_sentence:
+            by_answer.append((first_sentence, item_id))
+    return by_title, by_answer
+
+def synthetic_items(count: int, seed: int, vocabulary):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            'id': 100000 + i,
+            'name': " ".join(rng.choices(vocabulary, k=6)),
+            'answer': " ".join(rng.choices(vocabulary, k=80)),
+            'date_mod': '2025-01-01 00:00:00',
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dump', default=DUMP_PATH)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--scale', type=int, default=20000, help="synthetic articles for the scale test")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    items = read_kb_dump(args.dump)
+    by_title, by_answer = labelled_queries(items)
+    queries = [query for query, _ in by_title]
+    report = {'articles': len(items)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = KBIndex(directory)
+        start = time.perf_counter()
+        index.update(items)
+        report['build_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        report['index'] = index.stats()
+
+        modified = dict(items[0], date_mod='9999-12-31 23:59:59')
+        start = time.perf_counter()
+        index.update([modified])
+        report['incremental_update_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+        report['single_query'] = latency_ms(index, queries, args.repeat)
+        report['batch_query'] = {
+            'queries': len(queries),
+            'total_ms': batch_ms(index, queries, args.repeat),
+        }
+        report['recall_title_queries'] = recall(index, by_title)
+        report['recall_answer_queries'] = recall(index, by_answer)
+
+    vocabulary = sorted({word for query in queries for word in query.lower().split()})
+    with tempfile.TemporaryDirectory() as directory:
+        index = KBIndex(directory)
+        start = time.perf_counter()
+        index.update(synthetic_items(args.scale, args.seed, vocabulary))
+        build_s = time.perf_counter() - start
+        report['scale'] = {
+            'chunks': index.stats()['chunks'],
+            'build_s': round(build_s, 2),
+            'single_query': latency_ms(index, queries, max(1, args.repeat // 10)),
+        }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-request logging cost on the calling thread, before and after the queue pipeline.
+
+Replays the records one ticket-creating ``/chat`` request used to emit:
+``--glpi-calls`` httpx request lines, the ticket payload and GLPI's reply
+logged twice each with eager f-strings, the stream summary, and one stdout
+write and flush per generated token (LangChain's StreamingStdOutCallbackHandler).
+
+* ``before``: ``logging.basicConfig`` writing on the caller's thread.
+* ``after``: ``log_pipeline.setup_logging`` (JSON records, httpx sampled,
+  payloads redacted) with the records main.py and glpi_async.py now emit.
+
+The caller-thread cost is what the event loop pays per request; ``drain_s``
+is how long the listener thread needed afterwards to write everything.
+
+    python bench_logging.py --requests 5000 --tokens 40
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+from log_pipeline import setup_logging
+
+TICKET = {'input': {
+    'name': "Azure AKS - Node not ready after upgrade",
+    'content': "Pods on node pool np-2 are stuck in ContainerCreating since the 1.29 upgrade. " * 4,
+    'priority': 3, 'urgency': 3, 'impact': 3, 'type': 1, 'itilcategories_id': 12, 'locations_id': 4,
+}}
+RESULT = {'id': 48213, 'message': "Item successfully added: Azure AKS - Node not ready after upgrade (48213)"}
+STATS = {'time_to_first_token_ms': 212.4, 'tokens': 40, 'tokens_per_second': 38.2, 'total_ms': 1261.9}
+
+def reset_logging():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+def request_before(tokens: int, glpi_calls: int, token_stream):
+    httpx_log, api_log, main_log = (logging.getLogger(n) for n in ('httpx', 'glpi_async', 'main'))
+    for call in range(glpi_calls):
+        httpx_log.info(f"HTTP Request: GET http://glpi/apirest.php/Ticket/{call} \"HTTP/1.1 200 OK\"")
+    for _ in range(2):
+        api_log.info(f"Creating ticket with data: {TICKET}")
+        api_log.info(f"Create ticket result: {RESULT}")
+    for _ in range(tokens):
+        token_stream.write("token ")
+        token_stream.flush()
+    main_log.info(f"Streamed conv-1: {STATS}")
+
+def request_after(tokens: int, glpi_calls: int, token_stream):
+    httpx_log, api_log, main_log = (logging.getLogger(n) for n in ('httpx', 'glpi_async', 'main'))
+    for call in range(glpi_calls):
+        httpx_log.info('HTTP Request: %s %s "%s %d %s"', "GET", f"http://glpi/apirest.php/Ticket/{call}",
+                       "HTTP/1.1", 200, "OK")
+    api_log.debug("Creating ticket", extra={"payload": TICKET})
+    api_log.info("Created ticket %s", RESULT.get('id'))
+    main_log.info("Streamed %s: %s", "conv-1", STATS)
+
+def measure(label: str, configure, request, args, log_path: str):
+    reset_logging()
+    with open(log_path, 'w') as log_file:
+        handler = configure(log_file)
+        samples = []
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            request(args.tokens, args.glpi_calls, log_file)
+            samples.append((time.perf_counter() - start) * 1e6)
+        caller_s = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        stats = None
+        listener = getattr(handler, 'listener', None)
+        if listener is not None:
+            listener.stop()
+            stats = handler.stats()
+        drain_s = time.perf_counter() - drain_started
+        reset_logging()
+    ordered = sorted(samples)
+    result = {
+        'mode': label,
+        'per_request_us': {
+            'p50': round(statistics.median(samples), 1),
+            'p95': round(ordered[int(0.95 * (len(ordered) - 1))], 1),
+            'mean': round(statistics.mean(samples), 1),
+        },
+        'caller_s': round(caller_s, 3),
+        'drain_s': round(drain_s, 3),
+        'bytes_written': os.path.getsize(log_path),
+    }
+    if stats is not None:
+        result['queue'] = stats
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--tokens', type=int, default=40, help="generated tokens per request")
+    parser.add_argument('--glpi-calls', type=int, default=3, help="GLPI calls per request")
+    parser.add_argument('--sample', default='httpx=0.1', help="LOG_SAMPLE for the pipeline")
+    parser.add_argument('--queue-size', type=int, default=100000,
+                        help="LOG_QUEUE_SIZE; large enough that this burst drops nothing")
+    args = parser.parse_args()
+
+    def configure_before(stream):
+        logging.basicConfig(level=logging.INFO, stream=stream, force=True)
+        return logging.getLogger().handlers[0]
+
+    def configure_after(stream):
+        os.environ['LOG_QUEUE_SIZE'] = str(args.queue_size)
+        return setup_logging(level='INFO', json_format=True, sample=args.sample, redact=True, stream=stream)
+
+    workdir = tempfile.mkdtemp(prefix='bench-logging-')
+    before = measure('before', configure_before, request_before, args, os.path.join(workdir, 'before.log'))
+    after = measure('after', configure_after, request_after, args, os.path.join(workdir, 'after.log'))
+    print(json.dumps({
+        'config': vars(args),
+        'runs': [before, after],
+        'caller_speedup': round(before['per_request_us']['mean'] / after['per_request_us']['mean'], 1),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
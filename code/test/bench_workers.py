@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling of the production serving mode from 1 to N workers.
+
+Starts FakeGLPI and FakeOllama (see standins.py), then for each worker count
+runs ``gunicorn -c gunicorn.conf.py main:app`` (``uvicorn --workers`` if
+gunicorn is not installed) with a fresh shared-state file, drives ``/chat``
+with the same request mix as bench_chat_load.py and records requests/sec
+and latency. The stand-ins default to near-zero latency so the backend's own
+CPU work is what limits throughput; scaling stops at the number of cores.
+
+    python bench_workers.py --workers 1,2,4 --requests 600 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_chat_load import build_requests, drive, parse_mix, report
+from standins import FakeGLPI, FakeOllama
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+def server_command(workers: int, port: int):
+    if shutil.which('gunicorn'):
+        return ['gunicorn', '-c', 'gunicorn.conf.py', 'main:app']
+    return [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+
+def wait_until_ready(base_url: str, workers: int, timeout: float = 60.0):
+    """Poll /health until every worker has answered at least once"""
+    seen = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            seen.add(httpx.get(f"{base_url}/health", timeout=5).json()['worker_pid'])
+            if len(seen) >= workers:
+                return
+        except (httpx.HTTPError, ValueError, KeyError):
+            time.sleep(0.2)
+    raise RuntimeError(f"only {len(seen)} of {workers} workers answered within {timeout}s")
+
+def run(workers: int, args, env: dict, requests, glpi: FakeGLPI):
+    sessions_before = glpi.sessions_opened
+    workdir = tempfile.mkdtemp(prefix=f'workers-{workers}-')
+    env = dict(env,
+               WEB_CONCURRENCY=str(workers),
+               HOST='127.0.0.1',
+               PORT=str(args.port),
+               PID_FILE=os.path.join(workdir, 'server.pid'),
+               SHARED_STATE_PATH=os.path.join(workdir, 'shared_state.db'),
+               CONVERSATION_DB_PATH=os.path.join(workdir, 'conversations.db'),
+               VECTOR_STORE_PATH=os.path.join(workdir, 'vector_store'),
+               PYTHONWARNINGS='ignore')
+    with open(os.path.join(workdir, 'server.log'), 'w') as log:
+        server = subprocess.Popen(server_command(workers, args.port), cwd=API_DIR, env=env,
+                                  stdout=log, stderr=subprocess.STDOUT)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            wait_until_ready(base_url, workers)
+            results, elapsed = asyncio.run(drive(base_url, requests, args.concurrency,
+                                                 '/chat', args.bypass_cache, args.timeout))
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+    summary = report(results, elapsed, {})
+    return {
+        'workers': workers,
+        'requests_per_second': summary['requests_per_second'],
+        'error_rate': summary['error_rate'],
+        'latency_ms': summary['latency_ms'],
+        # One shared GLPI session for all workers, not one per worker
+        'glpi_sessions_opened': glpi.sessions_opened - sessions_before,
+        'glpi_sessions_left_open': len(glpi._sessions),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', default=f"1,{os.cpu_count() or 1}",
+                        help="comma-separated worker counts to compare")
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('lookup=4,chat=6'))
+    parser.add_argument('--bypass-cache', action='store_true')
+    parser.add_argument('--glpi-latency', type=float, default=0.0)
+    parser.add_argument('--first-token-latency', type=float, default=0.0)
+    parser.add_argument('--tokens-per-second', type=float, default=10000.0)
+    parser.add_argument('--tokens', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    glpi = FakeGLPI(latency=args.glpi_latency, seed=args.seed).start()
+    ollama = FakeOllama(first_token_latency=args.first_token_latency,
+                        tokens_per_second=args.tokens_per_second,
+                        tokens=args.tokens, parallel=1024).start()
+    env = dict(os.environ,
+               GLPI_URL=glpi.url,
+               GLPI_APP_TOKEN='bench',
+               GLPI_USER_TOKEN='bench',
+               OLLAMA_BASE_URL=ollama.url,
+               LLM_MAX_CONCURRENCY='64',
+               LLM_MAX_QUEUE='1024')
+    requests = build_requests(args.requests, args.mix, args.seed, len(glpi.tickets))
+
+    runs = [run(int(n), args, env, requests, glpi) for n in args.workers.split(',')]
+    baseline = runs[0]['requests_per_second']
+    for result in runs:
+        result['speedup'] = round(result['requests_per_second'] / baseline, 2) if baseline else None
+    glpi_calls = glpi.calls
+    glpi.stop()
+    ollama.stop()
+
+    output = json.dumps({
+        'server': 'gunicorn' if shutil.which('gunicorn') else 'uvicorn',
+        'cpu_count': os.cpu_count(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'mix')},
+        'glpi_calls': glpi_calls,
+        'runs': runs,
+    }, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+In-process stand-ins for the GLPI REST API and the Ollama server.
+
+Both are plain ``http.server`` servers on 127.0.0.1 with configurable latency,
+so the backend can be benchmarked offline on a machine without GLPI, Ollama
+or a GPU:
+
+    glpi = FakeGLPI(latency=0.01).start()
+    ollama = FakeOllama(first_token_latency=0.2, tokens_per_second=20).start()
+    os.environ['GLPI_URL'] = glpi.url
+    os.environ['OLLAMA_BASE_URL'] = ollama.url
+"""
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STATUSES = [1, 2, 3, 4, 5, 6]
+COMPONENTS = ["Azure AKS", "Azure VM", "Azure SQL MI", "GCP GKE", "GCP Compute Engine"]
+ISSUES = ["Node not ready", "SSL certificate expired", "High CPU utilization",
+          "Replication lag", "Backup failure"]
+SCENARIOS = ["OS patching", "Node pool expansion", "SSL certificate rotation",
+             "Backup policy update", "Instance resize"]
+
+class _Server:
+    """Runs a handler class on an ephemeral port in a daemon thread"""
+
+    def _handler(self):
+        raise NotImplementedError
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def port(self) -> int:
+        return self.server.server_port
+
+def _make_handler(dispatch):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            dispatch(self, body)
+
+        do_GET = do_POST = do_PUT = _handle
+
+        def send_json(self, code: int, payload, headers=None):
+            data = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+    return Handler
+
+class FakeGLPI(_Server):
+    """GLPI REST stand-in: sessions, ticket list/search/get/create/update, changes and
+    their ticket links, ITIL categories and KB items.
+
+    Every API call sleeps ``latency`` seconds. Tickets are generated from
+    ``seed`` so runs are comparable.
+    """
+
+    def __init__(self, latency: float = 0.01, tickets: int = 500, seed: int = 42):
+        self.latency = latency
+        self.calls = 0
+        self.sessions_opened = 0
+        self._lock = threading.Lock()
+        self._next_id = itertools.count(tickets + 1)
+        self._sessions = set()
+        rng = random.Random(seed)
+        self.tickets = {
+            i: {
+                'id': i,
+                'name': f"{rng.choice(COMPONENTS)} - {rng.choice(ISSUES)}",
+                'content': "Automated alert from monitoring",
+                'status': rng.choice(STATUSES),
+                'priority': rng.randint(1, 5),
+                'date_mod': f"2025-03-{1 + i % 28:02d} {i % 24:02d}:00:00",
+            }
+            for i in range(1, tickets + 1)
+        }
+        # Every third ticket is linked to a change on the ticket's component
+        self.changes = {}
+        self.change_links = []
+        for ticket_id in range(3, tickets + 1, 3):
+            change_id = ticket_id // 3
+            component = self.tickets[ticket_id]['name'].split(' - ')[0]
+            self.changes[change_id] = {
+                'id': change_id,
+                'name': f"{component} - {rng.choice(SCENARIOS)}",
+                'status': rng.choice([4, 6, 7]),
+                'date': f"2025-02-{1 + change_id % 28:02d} {change_id % 24:02d}:00:00",
+                'date_mod': f"2025-02-{1 + change_id % 28:02d} {change_id % 24:02d}:00:00",
+            }
+            self.change_links.append({'id': change_id, 'changes_id': change_id, 'tickets_id': ticket_id})
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/apirest.php"
+
+    def _handler(self):
+        return _make_handler(self._dispatch)
+
+    def _range(self, query, total):
+        start, end = 0, 49
+        if 'range' in query:
+            start, end = (int(x) for x in query['range'][0].split('-'))
+        return start, min(end, total - 1)
+
+    def _dispatch(self, handler, body):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        url = urlsplit(handler.path)
+        path = url.path.split('/apirest.php/', 1)[-1]
+        query = parse_qs(url.query)
+
+        if path == 'initSession':
+            with self._lock:
+                self.sessions_opened += 1
+                token = f"session-{self.sessions_opened}"
+            self._sessions.add(token)
+            return handler.send_json(200, {'session_token': token})
+        if handler.headers.get('Session-Token') not in self._sessions:
+            return handler.send_json(401, ["ERROR_SESSION_TOKEN_INVALID", "session_token seems invalid"])
+        if path == 'killSession':
+            self._sessions.discard(handler.headers.get('Session-Token'))
+            return handler.send_json(200, {})
+
+        if path in ('Ticket', 'search/Ticket') and handler.command == 'GET':
+            rows = sorted(self.tickets.values(), key=lambda t: t['date_mod'], reverse=True)
+            start, end = self._range(query, len(rows))
+            if start >= len(rows):
+                return handler.send_json(400, ["ERROR_RANGE_EXCEED_TOTAL", "Range exceeds total"])
+            page = rows[start:end + 1]
+            headers = {'Content-Range': f"{start}-{end}/{len(rows)}"}
+            if path == 'Ticket':
+                return handler.send_json(200, page, headers)
+            data = [{'2': t['id'], '1': t['name'], '12': t['status']} for t in page]
+            return handler.send_json(200, {'totalcount': len(rows), 'count': len(data), 'data': data}, headers)
+
+        match = re.fullmatch(r'Ticket/(\d+)/Change_Ticket', path)
+        if match:
+            ticket_id = int(match.group(1))
+            return handler.send_json(200, [
+                dict(link, changes_id=self.changes[link['changes_id']]['name'])
+                for link in self.change_links if link['tickets_id'] == ticket_id
+            ])
+
+        if path in ('Change', 'Change_Ticket'):
+            if path == 'Change':
+                rows = sorted(self.changes.values(), key=lambda c: c['date_mod'], reverse=True)
+            else:
+                rows = sorted(self.change_links, key=lambda l: l['id'], reverse=True)
+            start, end = self._range(query, len(rows))
+            if start >= len(rows):
+                return handler.send_json(400, ["ERROR_RANGE_EXCEED_TOTAL", "Range exceeds total"])
+            return handler.send_json(200, rows[start:end + 1], {'Content-Range': f"{start}-{end}/{len(rows)}"})
+
+        match = re.fullmatch(r'Ticket/(\d+)', path)
+        if match and handler.command == 'GET':
+            ticket = self.tickets.get(int(match.group(1)))
+            if ticket is None:
+                return handler.send_json(404, ["ERROR_ITEM_NOT_FOUND", "Item not found"])
+            return handler.send_json(200, ticket)
+
+        if path == 'Ticket' and handler.command == 'POST':
+            items = body['input'] if isinstance(body['input'], list) else [body['input']]
+            created = []
+            with self._lock:
+                for item in items:
+                    ticket_id = next(self._next_id)
+                    self.tickets[ticket_id] = dict(item, id=ticket_id, status=1,
+                                                   date_mod=time.strftime('%Y-%m-%d %H:%M:%S'))
+                    created.append({'id': ticket_id, 'message': ''})
+            return handler.send_json(201, created if isinstance(body['input'], list) else created[0])
+
+        if path.startswith('Ticket') and handler.command == 'PUT':
+            items = body['input'] if isinstance(body['input'], list) else [dict(body['input'], id=path.rsplit('/', 1)[-1])]
+            results = []
+            for item in items:
+                ticket = self.tickets.get(int(item['id']))
+                if ticket is not None:
+                    ticket.update(item, id=ticket['id'])
+                results.append({str(item['id']): ticket is not None, 'message': ''})
+            return handler.send_json(200, results)
+
+        if path == 'ITILCategory':
+            return handler.send_json(200, [
+                {'id': 11, 'name': 'Printers & Scanners', 'completename': 'Hardware > Printers & Scanners'},
+                {'id': 12, 'name': 'Monitors & Displays', 'completename': 'Hardware > Monitors & Displays'},
+                {'id': 13, 'name': 'Network', 'completename': 'Infrastructure > Network'},
+            ])
+        if path == 'KnowbaseItem':
+            return handler.send_json(200, [])
+        return handler.send_json(404, ["ERROR_RESOURCE_NOT_FOUND_NOR_COMMONDBTM", path])
+
+class FakeOllama(_Server):
+    """Ollama stand-in for /api/generate (streamed NDJSON) and /api/ps.
+
+    A generation waits ``first_token_latency`` seconds, then emits
+    ``tokens`` tokens at ``tokens_per_second``. At most ``parallel``
+    generations run at once, like OLLAMA_NUM_PARALLEL on a CPU-only box.
+    """
+
+    def __init__(self, first_token_latency: float = 0.2, tokens_per_second: float = 20.0,
+                 tokens: int = 40, parallel: int = 2):
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.generations = 0
+        self._slots = threading.Semaphore(parallel)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _handler(self):
+        return _make_handler(self._dispatch)
+
+    def _dispatch(self, handler, body):
+        if handler.path == '/api/ps':
+            return handler.send_json(200, {'models': [{'name': 'mistral:latest', 'model': 'mistral:latest'}]})
+        if handler.path != '/api/generate':
+            return handler.send_json(404, {'error': 'not found'})
+
+        count = (body.get('options') or {}).get('num_predict') or self.tokens
+        count = min(count, self.tokens)
+        with self._slots:
+            self.generations += 1
+            if body.get('stream') is False:
+                time.sleep(self.first_token_latency + count / self.tokens_per_second)
+                return handler.send_json(200, {'model': body.get('model'), 'done': True, 'eval_count': count,
+                                               'response': "".join(f" tok{i}" for i in range(count))})
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/x-ndjson')
+            handler.send_header('Transfer-Encoding', 'chunked')
+            handler.end_headers()
+            time.sleep(self.first_token_latency)
+            for i in range(count):
+                self._chunk(handler, {'model': body.get('model'), 'response': f" tok{i}", 'done': False})
+                time.sleep(1.0 / self.tokens_per_second)
+            self._chunk(handler, {'model': body.get('model'), 'response': '', 'done': True, 'eval_count': count})
+            handler.wfile.write(b'0\r\n\r\n')
+
+    @staticmethod
+    def _chunk(handler, payload):
+        line = json.dumps(payload).encode() + b'\n'
+        handler.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        handler.wfile.flush()
@@ -0,0 +1,138 @@
+"""
+Session sharing and re-authentication of the async GLPI client.
+
+Runs AsyncGLPI and AsyncGLPISessionManager against an httpx MockTransport
+that counts initSession calls and can expire the current session token.
+
+    python -m pytest code/test/test_glpi_async_session.py
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'llm-backend', 'api'))
+
+import glpi_session
+from glpi_async import AsyncGLPI
+from glpi_session import AsyncGLPISessionManager
+from shared_state import SharedStore
+
+URL = 'http://glpi.test/apirest.php'
+
+class FakeSessions:
+    """GLPI stand-in: hands out numbered session tokens and rejects killed or expired ones"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.sessions_opened = 0
+        self.killed = []
+        self.valid = set()
+        self.tokens_seen = set()
+        self._tokens = itertools.count(1)
+
+    def expire(self):
+        self.valid.clear()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        await asyncio.sleep(self.delay)
+        if path.endswith('/initSession'):
+            self.sessions_opened += 1
+            token = f'session-{next(self._tokens)}'
+            self.valid.add(token)
+            return httpx.Response(200, json={'session_token': token})
+        token = request.headers.get('Session-Token')
+        if path.endswith('/killSession'):
+            self.killed.append(token)
+            self.valid.discard(token)
+            return httpx.Response(200, json={})
+        if token not in self.valid:
+            return httpx.Response(401, json=['ERROR_SESSION_TOKEN_INVALID', 'session_token seems invalid'])
+        self.tokens_seen.add(token)
+        ticket_id = int(path.rsplit('/', 1)[1])
+        return httpx.Response(200, json={'id': ticket_id, 'name': f'Ticket {ticket_id}', 'status': 1})
+
+    def client(self, **kwargs) -> AsyncGLPI:
+        http = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return AsyncGLPI(URL, 'app', 'user', http=http, **kwargs)
+
+def manager(glpi: FakeSessions, monkeypatch, **kwargs) -> AsyncGLPISessionManager:
+    """Session manager whose clients talk to ``glpi``"""
+    def make_client(url, apptoken, usertoken, **client_kwargs):
+        http = httpx.AsyncClient(transport=httpx.MockTransport(glpi.handler))
+        return AsyncGLPI(url, apptoken, usertoken, http=http, **client_kwargs)
+    monkeypatch.setattr(glpi_session, 'AsyncGLPI', make_client)
+    config = {'url': URL, 'apptoken': 'app', 'usertoken': 'user'}
+    return AsyncGLPISessionManager(config, **kwargs)
+
+def test_concurrent_requests_share_one_session(monkeypatch):
+    glpi = FakeSessions()
+    sessions = manager(glpi, monkeypatch)
+
+    async def lookup(ticket_id):
+        client = await sessions.get_client()
+        return await client.get_ticket_by_id(ticket_id)
+
+    async def run():
+        tickets = await asyncio.gather(*(lookup(i) for i in range(1, 21)))
+        await sessions.close()
+        return tickets
+
+    tickets = asyncio.run(run())
+    assert [t['id'] for t in tickets] == list(range(1, 21))
+    assert glpi.sessions_opened == 1
+    assert glpi.tokens_seen == {'session-1'}
+    assert glpi.killed == ['session-1']
+
+def test_expired_session_reauthenticates_once():
+    glpi = FakeSessions()
+    client = glpi.client()
+
+    async def run():
+        await client.init_session()
+        glpi.expire()
+        tickets = await asyncio.gather(*(client.get_ticket_by_id(i) for i in range(1, 21)))
+        await client.close()
+        return tickets
+
+    tickets = asyncio.run(run())
+    assert [t['id'] for t in tickets] == list(range(1, 21))
+    # One initial session plus a single re-authentication for all 20 rejected calls
+    assert glpi.sessions_opened == 2
+    assert glpi.tokens_seen == {'session-2'}
+
+def test_workers_reuse_the_shared_session(tmp_path):
+    glpi = FakeSessions()
+    path = str(tmp_path / 'shared.db')
+    stores = [SharedStore(path) for _ in range(3)]
+    clients = [glpi.client(store=store) for store in stores]
+
+    async def run():
+        await clients[0].init_session()
+        await asyncio.gather(*(client.init_session() for client in clients[1:]))
+        opened_by_first = glpi.sessions_opened
+        glpi.expire()
+        # Every worker hits the expired token at once; they may each log in,
+        # but all settle on the one token published first and kill the rest
+        tickets = await asyncio.gather(*(
+            client.get_ticket_by_id(i) for i, client in enumerate(clients, start=1)
+        ))
+        tokens = {client.session_token for client in clients}
+        for client in clients:
+            await client.close(keep_session=True)
+        return opened_by_first, tickets, tokens
+
+    try:
+        opened_by_first, tickets, tokens = asyncio.run(run())
+    finally:
+        for store in stores:
+            store.close()
+    assert opened_by_first == 1
+    assert [t['id'] for t in tickets] == [1, 2, 3]
+    assert len(tokens) == 1
+    assert glpi.valid == tokens
+    assert set(glpi.killed) == {f'session-{n}' for n in range(2, glpi.sessions_opened + 1)} - tokens
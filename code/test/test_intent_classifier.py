@@ -0,0 +1,72 @@
+"""
+Parity of the single-pass intent classifier with the legacy keyword scans.
+
+The legacy scans live in bench_intent_classifier.legacy_classify. Legacy
+only set ``priority`` for create intents and ``ticket_id`` for show intents,
+so those fields are compared under the same condition; every other
+difference is one of those documented on IntentClassifier.
+
+    python -m pytest code/test/test_intent_classifier.py
+"""
+
+import pytest
+
+from bench_intent_classifier import as_legacy as bench_as_legacy, build_corpus, legacy_classify
+from intent_classifier import IntentClassifier
+
+classifier = IntentClassifier()
+
+def as_legacy(message: str):
+    return bench_as_legacy(classifier, message)
+
+def test_corpus_matches_legacy():
+    mismatches = [
+        message for message in build_corpus(2000, seed=42)
+        if as_legacy(message) != legacy_classify(message)
+    ]
+    assert mismatches == []
+
+@pytest.mark.parametrize("message", [
+    "the networking switch on floor 2 is down",
+    "Please create a ticket urgently, the printers are jammed",
+    "open tickets about the displays in Room 214",
+    "search problems with the internet connection",
+    "create a low priority ticket for the screen",
+    "Create a HIGH PRIORITY issue: wifi keeps dropping",
+    "show me ticket #15 and #16",
+    "room 12 printer, new ticket please",
+    "How do I reset my VPN password?",
+])
+def test_word_endings_match_legacy(message):
+    assert as_legacy(message) == legacy_classify(message)
+
+def test_word_endings_still_match():
+    assert classifier.classify("networking is slow").category == "network"
+    assert classifier.classify("create a ticket urgently").priority == 4
+    assert classifier.classify("open tickets").is_ticket_query
+
+@pytest.mark.parametrize("message, legacy_intent", [
+    ("Please renew my licence", "create"),
+    ("I forget my password", "show"),
+    ("reopen the request", "create"),
+    ("the target server", "show"),
+])
+def test_no_mid_word_intent(message, legacy_intent):
+    assert legacy_classify(message)[1] == legacy_intent
+    assert classifier.classify(message).intent is None
+
+def test_no_mid_word_category():
+    assert legacy_classify("my touchscreen is broken")[3] == 2
+    assert classifier.classify("my touchscreen is broken").category is None
+
+def test_ticket_id_without_show_word():
+    message = "What is the status of ticket #12?"
+    assert legacy_classify(message)[5] is None
+    result = classifier.classify(message)
+    assert result.intent is None
+    assert result.ticket_id == 12
+
+def test_priority_without_create_word():
+    message = "urgent: the printer ticket"
+    assert legacy_classify(message)[2] == 3
+    assert classifier.classify(message).priority == 4